@@ -7,6 +7,9 @@ import json
 import logging
 from typing import List, Dict
 from models import CostItem, ChatResponse
+from executors import run_blocking
+from timing import span
+from metrics import observe_call
 
 # Configure Logging
 logger = logging.getLogger(__name__)
@@ -107,19 +110,23 @@ async def analyze_image_with_gemini(image_bytes: bytes, mime_type: str) -> Dict:
 
     try:
         model = get_model()
-        responses = model.generate_content(
-            [image_part, prompt, SYSTEM_INSTRUCTION],
-            generation_config=generation_config,
-            stream=False,
-        )
+        with span("gemini"), observe_call("gemini", "analyze_image"):
+            responses = await run_blocking(
+                "gemini",
+                model.generate_content,
+                [image_part, prompt, SYSTEM_INSTRUCTION],
+                generation_config=generation_config,
+                stream=False,
+            )
 
-        text_response = responses.text.strip()
-        if text_response.startswith("```json"):
-            text_response = text_response[7:]
-        if text_response.endswith("```"):
-            text_response = text_response[:-3]
+        with span("gemini_parse"):
+            text_response = responses.text.strip()
+            if text_response.startswith("```json"):
+                text_response = text_response[7:]
+            if text_response.endswith("```"):
+                text_response = text_response[:-3]
 
-        data = json.loads(text_response)
+            data = json.loads(text_response)
 
         # Handle different response formats
         if isinstance(data, dict):
@@ -283,11 +290,14 @@ Return a JSON object with this structure:
 
     try:
         model = get_model()
-        responses = model.generate_content(
-            [prompt],
-            generation_config=generation_config,
-            stream=False,
-        )
+        with observe_call("gemini", "explain"):
+            responses = await run_blocking(
+                "gemini",
+                model.generate_content,
+                [prompt],
+                generation_config=generation_config,
+                stream=False,
+            )
 
         text_response = responses.text.strip()
         if text_response.startswith("```json"):
@@ -362,11 +372,14 @@ async def chat_with_gemini(message: str, current_items: List[CostItem]) -> ChatR
 
     try:
         model = get_model()
-        responses = model.generate_content(
-            [prompt, SYSTEM_INSTRUCTION],
-            generation_config=generation_config,
-            stream=False,
-        )
+        with observe_call("gemini", "chat"):
+            responses = await run_blocking(
+                "gemini",
+                model.generate_content,
+                [prompt, SYSTEM_INSTRUCTION],
+                generation_config=generation_config,
+                stream=False,
+            )
         
         text_response = responses.text.strip()
         if text_response.startswith("```json"):
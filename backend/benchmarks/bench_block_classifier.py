@@ -0,0 +1,108 @@
+"""
+Block Classifier Benchmark
+==========================
+Compares the precompiled text block classifier used by
+parse_rooms_with_spatial_matching against the previous approach (re.match
+over each room pattern in turn, then up to six area regexes).
+
+Both classifiers are first checked for identical output on the whole corpus.
+
+Usage:
+    python benchmarks/bench_block_classifier.py [--blocks 5000] [--repeat 5]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_service import (  # noqa: E402
+    ROOM_PATTERNS, AREA_PATTERNS, COMBINED_ROOM_AREA_PATTERN, DIMENSION_PATTERN,
+    BLOCK_COMBINED, BLOCK_ROOM, BLOCK_AREA, BLOCK_DIMENSION, classify_text_block,
+)
+
+
+def legacy_classify(text: str):
+    """The per-block logic as it was before the patterns were precompiled."""
+    text_normalized = text.replace(',', '.')
+    combined_match = re.match(COMBINED_ROOM_AREA_PATTERN, text_normalized, re.IGNORECASE)
+    if combined_match:
+        area_val = float(combined_match.group(2).replace(',', '.').replace('/', '.'))
+        if 1.0 <= area_val <= 100:
+            return BLOCK_COMBINED, combined_match.group(1).strip(), area_val
+    for pattern in ROOM_PATTERNS:
+        if re.match(pattern, text, re.IGNORECASE):
+            return BLOCK_ROOM, text, None
+    if re.search(DIMENSION_PATTERN, text):
+        return BLOCK_DIMENSION, None, None
+    for _, pattern, flags in AREA_PATTERNS:
+        area_match = re.match(pattern, text_normalized, flags)
+        if area_match:
+            return BLOCK_AREA, None, float(area_match.group(1).replace(',', '.').replace('/', '.'))
+    return None, None, None
+
+
+ROOM_LABELS = [
+    "SOV 1", "SOV2", "SOVRUM 3", "EV. SOV", "VARDAGSRUM", "KÖK / MATPLATS", "KÖK/VARDAGSRUM",
+    "WC/D 1", "WCD2", "WC / BAD", "DUSCH", "TVÄTT / GROVENTRÉ", "ENTRÉ", "HALL", "KLK 2",
+    "KLÄDKAMMARE", "GARAGE/FÖRRÅD", "FÖRRÅD", "TEKNIK", "ALTAN", "UTEPLATS", "ROOM",
+]
+NOISE = [
+    "BOA", "BTA", "BIYTA", "PLANT", "RYGG", "M²", "TAK", "11X15F", "10X21", "9X21", "3000",
+    "FASAD MOT SÖDER", "SEKTION A-A", "1:100", "GVF", "INV", "Ö", "+0.00", "A1",
+]
+
+
+def make_corpus(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        roll = rng.random()
+        area = f"{rng.uniform(1, 60):.{rng.choice([1, 2])}f}".replace(".", rng.choice([".", ",", "/"]))
+        if roll < 0.15:
+            corpus.append(rng.choice(ROOM_LABELS))
+        elif roll < 0.40:
+            corpus.append(area + rng.choice(["", " M²", "M²", " M", "M", " M2", " M 2"]))
+        elif roll < 0.50:
+            corpus.append(f"{rng.choice(ROOM_LABELS)} {area.replace('/', '.')} M²")
+        elif roll < 0.55:
+            corpus.append(f"{rng.randint(10, 99)} M²")
+        else:
+            corpus.append(rng.choice(NOISE))
+    return corpus
+
+
+def measure(classify, corpus, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in corpus:
+            classify(text)
+        best = min(best, time.perf_counter() - started)
+    return len(corpus) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.blocks)
+    mismatches = [t for t in corpus if legacy_classify(t) != classify_text_block(t)]
+    if mismatches:
+        raise SystemExit(f"Classifiers disagree on {len(mismatches)} blocks, e.g. {mismatches[:5]}")
+
+    before = measure(legacy_classify, corpus, args.repeat)
+    after = measure(classify_text_block, corpus, args.repeat)
+    print(f"blocks:      {len(corpus)}")
+    print(f"legacy:      {before:,.0f} blocks/s")
+    print(f"precompiled: {after:,.0f} blocks/s")
+    print(f"speedup:     {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Logging Middleware Benchmark
+============================
+Per-request overhead of the pure ASGI StructuredLoggingMiddleware (JSON
+lines through a queue handler) against the previous BaseHTTPMiddleware
+version (str(dict) lines through a synchronous stream handler), on the real
+/health and /projects routes.
+
+Requests are driven straight through the ASGI interface (no sockets or HTTP
+client), so the numbers are the framework + middleware cost per request. Log
+output goes to /dev/null in both setups.
+
+Usage:
+    python benchmarks/bench_logging_middleware.py [--requests 5000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import contextlib
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("API_KEY", "bench-key")
+
+DEVNULL = open(os.devnull, "w")
+
+# The queue listener binds to sys.stdout when main configures logging
+with contextlib.redirect_stdout(DEVNULL):
+    import main  # noqa: E402
+from middleware import StructuredLoggingMiddleware  # noqa: E402
+
+logger = logging.getLogger("api")
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """StructuredLoggingMiddleware as it was before the pure ASGI rewrite."""
+
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid.uuid4())
+        start_time = time.time()
+        request.state.request_id = request_id
+        response = await call_next(request)
+        process_time = (time.time() - start_time) * 1000
+        log_data = {
+            "request_id": request_id,
+            "method": request.method,
+            "path": request.url.path,
+            "status_code": response.status_code,
+            "process_time_ms": round(process_time, 2),
+            "client_ip": request.client.host if request.client else None
+        }
+        if response.status_code >= 500:
+            logger.error(str(log_data))
+        elif response.status_code >= 400:
+            logger.warning(str(log_data))
+        else:
+            logger.info(str(log_data))
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+def build_app(middleware_class=None) -> FastAPI:
+    app = FastAPI()
+    app.router.routes.extend(route for route in main.app.routes if getattr(route, "path", None) in ("/health", "/projects"))
+    if middleware_class is not None:
+        app.add_middleware(middleware_class)
+    return app
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"x-api-key", os.environ["API_KEY"].encode())],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    status = 0
+    requested = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()  # Like a server: the client "disconnects" once the response is sent
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            done.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, path: str, requests: int, repeat: int) -> float:
+    """Best-of-repeat microseconds per request."""
+    assert await call(app, path) == 200
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(requests):
+            await call(app, path)
+        best = min(best, time.perf_counter() - started)
+    return best / requests * 1e6
+
+
+@contextlib.contextmanager
+def legacy_log_handler():
+    """The old logging.basicConfig setup: a synchronous stream handler on the root logger."""
+    root = logging.getLogger()
+    saved = root.handlers
+    root.handlers = [logging.StreamHandler(DEVNULL)]
+    try:
+        yield
+    finally:
+        root.handlers = saved
+
+
+async def run(requests: int, repeat: int) -> None:
+    bare, legacy, current = build_app(), build_app(LegacyLoggingMiddleware), build_app(StructuredLoggingMiddleware)
+    print(f"{'route':<10} {'no middleware':>14} {'legacy':>10} {'pure ASGI':>10} {'overhead saved':>15}")
+    for path in ("/health", "/projects"):
+        baseline = await measure(bare, path, requests, repeat)
+        with legacy_log_handler():
+            before = await measure(legacy, path, requests, repeat)
+        after = await measure(current, path, requests, repeat)
+        saved = (before - after) / (before - baseline) if before > baseline else 0.0
+        print(f"{path:<10} {baseline:>12.1f}us {before:>8.1f}us {after:>8.1f}us {saved:>14.0%}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.repeat))
+
+
+if __name__ == "__main__":
+    main_cli()
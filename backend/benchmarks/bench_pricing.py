@@ -0,0 +1,130 @@
+"""
+Pricing Benchmark
+=================
+Per-call CPU time and allocations of the table-driven pricing engine against
+the previous hand-written calculate_pricing, on the rooms and summary areas
+of every recorded sample plan.
+
+The baseline is not kept in the tree: it is loaded from ocr_service.py at a
+pinned git revision (the mainline base the pricing engine was built on),
+taking only calculate_pricing and the module-level names it uses. The old pipeline built
+CostItem models and then model_dump()ed them, so that is what "legacy"
+measures; "price_items" is what the pipeline does now, and
+"calculate_pricing" is the validated-model path for callers that need it.
+
+Usage:
+    python benchmarks/bench_pricing.py [--repeat 200] [--baseline REVISION]
+"""
+import os
+import ast
+import sys
+import time
+import logging
+import argparse
+import subprocess
+import tracemalloc
+from typing import Callable
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "tests"))
+
+from helpers import OCR_FIXTURES, ocr_result  # noqa: E402
+from ocr_service import parse_rooms_with_spatial_matching, parse_summary_areas  # noqa: E402
+from pricing_engine import calculate_pricing, price_items  # noqa: E402
+
+# Mainline revision whose ocr_service.py prices estimates with the hand-written calculate_pricing
+BASELINE_REVISION = "2f69071a30e71f919a33e55675619b930c1b8bd4"
+BASELINE_PATH = "backend/ocr_service.py"
+# Imports the baseline may keep; everything else in the old module (Document AI, caches) is left out
+BASELINE_IMPORTS = ("typing", "math", "re", "logging", "models", "standards.pricing_references_2025")
+
+
+def load_baseline(revision: str = BASELINE_REVISION) -> Callable:
+    """calculate_pricing as it was at revision, with only the top-level definitions it needs."""
+    source = subprocess.run(
+        ["git", "show", f"{revision}:{BASELINE_PATH}"], cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    tree = ast.parse(source)
+
+    definitions = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            definitions[node.name] = node
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    definitions[target.id] = node
+
+    needed, pending = set(), ["calculate_pricing"]
+    while pending:
+        name = pending.pop()
+        if name in needed or name not in definitions:
+            continue
+        needed.add(name)
+        pending.extend(n.id for n in ast.walk(definitions[name]) if isinstance(n, ast.Name))
+
+    kept = [
+        node for node in tree.body
+        if (isinstance(node, ast.Import) and all(alias.name in BASELINE_IMPORTS for alias in node.names))
+        or (isinstance(node, ast.ImportFrom) and node.module in BASELINE_IMPORTS)
+        or any(definitions.get(name) is node for name in needed)
+    ]
+    namespace = {"__name__": "legacy_pricing"}
+    exec(compile(ast.Module(body=kept, type_ignores=[]), f"{revision[:12]}:{BASELINE_PATH}", "exec"), namespace)
+    return namespace["calculate_pricing"]
+
+
+def legacy_pipeline(legacy_calculate_pricing: Callable) -> Callable:
+    return lambda rooms, summary: [item.model_dump() for item in legacy_calculate_pricing(rooms, summary)]
+
+
+def best_time(fn, cases, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for rooms, summary in cases:
+            fn(rooms, summary)
+        best = min(best, time.perf_counter() - started)
+    return best / len(cases)
+
+
+def allocations(fn, cases) -> float:
+    """Average KiB allocated per call (tracemalloc peak)."""
+    total = 0
+    for rooms, summary in cases:
+        tracemalloc.start()
+        fn(rooms, summary)
+        total += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return total / len(cases) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--baseline", default=BASELINE_REVISION, help="git revision of the hand-written pricing")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    implementations = {
+        "legacy": legacy_pipeline(load_baseline(args.baseline)),
+        "price_items": price_items,
+        "calculate_pricing": calculate_pricing,
+    }
+
+    cases = []
+    for fixture in OCR_FIXTURES.values():
+        full_text, text_blocks = ocr_result(fixture)
+        cases.append((parse_rooms_with_spatial_matching(text_blocks), parse_summary_areas(full_text)))
+
+    reference = [implementations["legacy"](*case) for case in cases]
+    assert [price_items(*case) for case in cases] == reference, "price_items differs from the legacy output"
+
+    print(f"{'implementation':<18} {'per call':>10} {'peak alloc':>12}")
+    for name, fn in implementations.items():
+        seconds = best_time(fn, cases, args.repeat)
+        print(f"{name:<18} {seconds * 1e6:>8.0f}us {allocations(fn, cases):>9.1f}KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Room Matching Benchmark
+=======================
+Compares greedy (closest pair first) and optimal (linear sum assignment)
+room/area matching on the recorded OCR fixtures of the sample plans.
+
+Accuracy is the share of printed (room, area) pairs reproduced per plan
+(tests/fixtures/expected_rooms.json). --jitter moves every label by a random
+offset of up to that many page widths, to see how each mode degrades when
+labels sit further from their areas than on the clean plans.
+
+Usage:
+    python benchmarks/bench_room_matching.py [--repeat 20] [--jitter 0.01] [--seed 1]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "tests"))
+
+from helpers import EXPECTED_ROOMS, OCR_FIXTURES, ocr_result  # noqa: E402
+from ocr_service import MATCHING_MODES, parse_rooms_with_spatial_matching  # noqa: E402
+
+
+def jitter_blocks(text_blocks, amount: float, rng: random.Random):
+    if not amount:
+        return text_blocks
+    return [
+        {**block, "x": block["x"] + rng.uniform(-amount, amount), "y": block["y"] + rng.uniform(-amount, amount)}
+        for block in text_blocks
+    ]
+
+
+def score(rooms, expected) -> int:
+    """Number of expected (name, area) pairs present in the result."""
+    found = Counter((room["name"], room["area"]) for room in rooms)
+    return sum((found & Counter(map(tuple, expected))).values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    rng = random.Random(args.seed)
+    plans = {plan: jitter_blocks(ocr_result(fixture)[1], args.jitter, rng) for plan, fixture in OCR_FIXTURES.items()}
+    total = sum(len(EXPECTED_ROOMS[plan]) for plan in plans)
+
+    print(f"{'plan':<10}" + "".join(f"{mode:>16}" for mode in MATCHING_MODES))
+    summary = {mode: [0, 0.0] for mode in MATCHING_MODES}
+    for plan, text_blocks in plans.items():
+        row = f"{plan:<10}"
+        for mode in MATCHING_MODES:
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                rooms = parse_rooms_with_spatial_matching(text_blocks, matching=mode)
+                best = min(best, time.perf_counter() - started)
+            correct = score(rooms, EXPECTED_ROOMS[plan])
+            summary[mode][0] += correct
+            summary[mode][1] += best
+            row += f"{correct:>4}/{len(EXPECTED_ROOMS[plan]):<3}{best * 1000:>6.2f}ms"
+        print(row)
+
+    for mode, (correct, seconds) in summary.items():
+        print(f"{mode:<8} accuracy {correct}/{total} ({correct / total:.1%}), {seconds * 1000:.1f}ms total")
+
+
+if __name__ == "__main__":
+    main()
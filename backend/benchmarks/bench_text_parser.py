@@ -0,0 +1,292 @@
+"""
+Text Room Parser Benchmark
+==========================
+Compares parse_rooms_from_text against the previous three-pass parser, which
+kept summary exclusion zones as a set of character offsets and compared every
+room match with every area match in each pass.
+
+Both parsers are first checked for identical output on synthetic OCR texts
+of every size measured.
+
+Usage:
+    python benchmarks/bench_text_parser.py [--sizes 100,1000,10000] [--repeat 3]
+"""
+import os
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_service import TEXT_ROOM_KEYWORDS, classify_room, is_biarea, parse_rooms_from_text  # noqa: E402
+
+
+ROOM_LABELS = [
+    "SOVRUM 1", "SOV 2", "SOV3", "SOV", "EV. SOV", "EV SOVRUM", "KÖK/VARDAGSRUM", "KÖK / MATPLATS", "KÖKVARDAGSRUM",
+    "MATPLATS/VARDAGSRUM", "V.RUM", "VARDAGSRUM", "KÖK", "MATPLATS", "ALLRUM", "Room", "GROVENTRÉ/TVÄTT",
+    "TVÄTT / GROVENTRE", "GROVENTRÉ", "TVÄTTSTUGA", "TVÄTT", "GROVKÖK", "ENTRÉ", "ENTRE", "OVER ENTRE", "HALL",
+    "VINDFÅNG", "WC/BAD", "WC/D 1", "WC2", "BAD", "BADRUM", "DUSCH", "KLK", "KLK 2", "KLÄDKAMMARE", "FÖRRÅD",
+    "GARAGE/FÖRRÅD", "GARAGE", "CARPORT", "TEKNIK", "PANNRUM", "ALTAN", "UTEPLATS", "TERRASS", "VERANDA", "BALKONG",
+]
+NOISE = ["11x13", "10x21", "G", "KAMIN INGÅR EJ", "9090", "INV. 8.40", "DOLD BALK", "1:100", "ST", "VP", "SEKTION A-A", "+0.00"]
+SUMMARY = ["BOYTA", "BIYTA", "BTA", "BYGGYTA"]
+
+
+def make_area(rng):
+    value = rng.choice([rng.uniform(1, 60), rng.uniform(0.1, 1), rng.uniform(100, 400)]) if rng.random() < 0.1 else rng.uniform(1, 60)
+    number = f"{value:.1f}".replace(".", rng.choice([".", ","]))
+    return number + rng.choice([" m²", "m²", " m2", " m", " m³", ""])
+
+
+def make_plan_text(rng, tokens):
+    """Synthetic OCR text: room labels, areas, noise and summary lines in a shuffled order."""
+    parts = []
+    for _ in range(tokens):
+        roll = rng.random()
+        if roll < 0.3:
+            parts.append(rng.choice(ROOM_LABELS))
+        elif roll < 0.6:
+            parts.append(make_area(rng))
+        elif roll < 0.7:
+            parts.append(f"{rng.choice(ROOM_LABELS)} {make_area(rng)}")
+        elif roll < 0.75:
+            parts.append(f"{rng.choice(SUMMARY)}: {rng.uniform(20, 250):.1f}m²")
+        else:
+            parts.append(rng.choice(NOISE))
+    return "".join(part + rng.choice(["\n", "\n", " ", "  "]) for part in parts)
+
+
+def legacy_parse_rooms_from_text(text: str) -> List[Dict]:
+    """parse_rooms_from_text as it was before the linear-time rewrite."""
+    rooms = []
+    seen_rooms = set()  # Deduplicate by (name, area) combination
+
+    # Pre-processing: Find summary label positions to exclude their areas
+    # Summary areas like "BIYTA: 34.0m²" should not be matched to rooms
+    summary_pattern = r'(BOYTA|BIYTA|BTA|BYGGYTA)\s*:\s*'
+    summary_exclusion_zones = set()
+    for m in re.finditer(summary_pattern, text, re.IGNORECASE):
+        # Mark 50 chars after summary label as exclusion zone
+        for i in range(m.start(), min(m.end() + 30, len(text))):
+            summary_exclusion_zones.add(i)
+
+    room_keywords = TEXT_ROOM_KEYWORDS
+
+    # Phase 1: Find all room names with their positions
+    room_name_pattern = '(' + '|'.join(room_keywords) + ')'
+    room_matches = list(re.finditer(room_name_pattern, text, re.IGNORECASE))
+
+    # Phase 2: Find all areas with their positions, EXCLUDING summary areas
+    # Match areas like "8.9 m²", "18.8 m²", "5.2 m³", "2.9 m" (OCR sometimes misreads ² or omits it)
+    area_pattern = r'(\d{1,3}[.,]\d)\s*m[²³2]?(?=\s|$|[^\w])'
+    all_area_matches = list(re.finditer(area_pattern, text, re.IGNORECASE))
+
+    # Filter out areas in summary exclusion zones
+    area_matches = []
+    for m in all_area_matches:
+        if m.start() not in summary_exclusion_zones:
+            area_matches.append(m)
+
+    # Phase 3: Three-pass matching strategy
+    # Pass 1: STRICT - area immediately following room (within 20 chars)
+    # Pass 2: PROXIMITY - closest area within reasonable distance
+    # Pass 3: FALLBACK - remaining rooms get remaining areas by order
+
+    used_rooms = set()
+    used_areas = set()
+
+    # Room size validation ranges (typical Swedish floor plans)
+    # These help avoid obviously wrong matches - ranges are permissive
+    ROOM_SIZE_HINTS = {
+        "living": (8, 60),     # VARDAGSRUM, ALLRUM, MATPLATS - 8-60 m² (ALLRUM can be ~10-12)
+        "bedroom": (5, 25),    # SOV typically 5-25 m² (master can be larger)
+        "kitchen": (6, 35),    # KÖK typically 6-35 m² (open kitchens larger)
+        "bathroom": (2, 12),   # WC/BAD typically 2-12 m²
+        "laundry": (2, 15),    # TVÄTT typically 2-15 m²
+        "entry": (2, 20),      # ENTRÉ typically 2-20 m² (large entries exist)
+        "closet": (1, 10),     # KLK typically 1-10 m² (walk-ins can be larger)
+        "storage": (3, 40),    # FÖRRÅD typically 3-40 m² (variable)
+        "garage": (15, 60),    # GARAGE typically 15-60 m²
+    }
+
+    # Helper function to validate and extract area
+    def get_valid_area(area_match):
+        area_str = area_match.group(1)
+        area_val = float(area_str.replace(',', '.'))
+        if 1.0 <= area_val <= 100:  # Valid room area range
+            return area_val
+        return None
+
+    def is_plausible_size(category: str, area: float) -> bool:
+        """Check if area is plausible for the room category."""
+        if category in ROOM_SIZE_HINTS:
+            min_size, max_size = ROOM_SIZE_HINTS[category]
+            return min_size <= area <= max_size
+        return True  # No hint, accept any size
+
+    # Pass 1: Strict immediate matching (within 20 chars)
+    # Only match if area is plausible for the room type
+    for room_idx, room_match in enumerate(room_matches):
+        room_name = room_match.group(1).strip().upper()
+        room_name = ' '.join(room_name.split())  # Clean whitespace
+        room_end = room_match.end()
+        category = classify_room(room_name)
+
+        for area_idx, area_match in enumerate(area_matches):
+            if area_idx in used_areas:
+                continue
+
+            distance = area_match.start() - room_end
+            if 0 <= distance <= 20:  # Strict: within 20 chars after room
+                area_val = get_valid_area(area_match)
+                if area_val is None:
+                    continue
+
+                # Skip if area is implausible for this room type
+                if not is_plausible_size(category, area_val):
+                    continue
+
+                room_key = (room_name, round(area_val, 1))
+
+                if room_key not in seen_rooms:
+                    seen_rooms.add(room_key)
+                    rooms.append({
+                        "name": room_name,
+                        "area": area_val,
+                        "category": category,
+                        "is_biarea": is_biarea(category),
+                    })
+                    used_rooms.add(room_idx)
+                    used_areas.add(area_idx)
+                break
+
+    # Pass 2: Proximity matching - find closest plausible area within 50 chars
+    for room_idx, room_match in enumerate(room_matches):
+        if room_idx in used_rooms:
+            continue
+
+        room_name = room_match.group(1).strip().upper()
+        room_name = ' '.join(room_name.split())
+        room_end = room_match.end()
+        category = classify_room(room_name)
+
+        # Find closest unused area that is plausible for this room type
+        best_area_idx = None
+        best_distance = float('inf')
+        best_area_val = None
+
+        for area_idx, area_match in enumerate(area_matches):
+            if area_idx in used_areas:
+                continue
+
+            # Allow area before or after room, but prefer after
+            distance = area_match.start() - room_end
+            abs_distance = abs(distance)
+
+            # Only consider areas within 50 chars (reduced from 80 for precision)
+            if abs_distance <= 50:
+                area_val = get_valid_area(area_match)
+                if area_val is None:
+                    continue
+
+                # Skip if area is implausible for this room type
+                if not is_plausible_size(category, area_val):
+                    continue
+
+                # Prefer areas AFTER the room name (positive distance)
+                # Add penalty for areas before the room
+                effective_distance = abs_distance if distance >= 0 else abs_distance + 20
+
+                if effective_distance < best_distance:
+                    best_distance = effective_distance
+                    best_area_idx = area_idx
+                    best_area_val = area_val
+
+        if best_area_idx is not None:
+            room_key = (room_name, round(best_area_val, 1))
+
+            if room_key not in seen_rooms:
+                seen_rooms.add(room_key)
+                rooms.append({
+                    "name": room_name,
+                    "area": best_area_val,
+                    "category": category,
+                    "is_biarea": is_biarea(category),
+                })
+                used_rooms.add(room_idx)
+                used_areas.add(best_area_idx)
+
+    # Pass 3: Fallback - match remaining rooms to plausible remaining areas
+    unmatched_rooms = [(idx, m) for idx, m in enumerate(room_matches) if idx not in used_rooms]
+    unmatched_areas = [(idx, m) for idx, m in enumerate(area_matches) if idx not in used_areas]
+
+    valid_unmatched_areas = []
+    for area_idx, area_match in unmatched_areas:
+        area_val = get_valid_area(area_match)
+        if area_val is not None:
+            valid_unmatched_areas.append((area_idx, area_match, area_val))
+
+    # For each unmatched room, try to find a plausible area
+    for room_idx, room_match in unmatched_rooms:
+        room_name = room_match.group(1).strip().upper()
+        room_name = ' '.join(room_name.split())
+        category = classify_room(room_name)
+
+        # Find first plausible unused area
+        for i, (area_idx, area_match, area_val) in enumerate(valid_unmatched_areas):
+            if is_plausible_size(category, area_val):
+                room_key = (room_name, round(area_val, 1))
+
+                if room_key not in seen_rooms:
+                    seen_rooms.add(room_key)
+                    rooms.append({
+                        "name": room_name,
+                        "area": area_val,
+                        "category": category,
+                        "is_biarea": is_biarea(category),
+                    })
+                    valid_unmatched_areas.pop(i)
+                    break
+
+    return rooms
+
+
+def measure(parse, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated token counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    rng = random.Random(args.seed)
+    for _ in range(200):
+        text = make_plan_text(rng, rng.randint(5, 200))
+        if legacy_parse_rooms_from_text(text) != parse_rooms_from_text(text):
+            raise SystemExit(f"Parsers disagree on:\n{text}")
+
+    print(f"{'tokens':>8} {'chars':>9} {'legacy':>11} {'linear':>11} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        text = make_plan_text(rng, size)
+        if legacy_parse_rooms_from_text(text) != parse_rooms_from_text(text):
+            raise SystemExit(f"Parsers disagree on the {size}-token text")
+        before = measure(legacy_parse_rooms_from_text, text, args.repeat)
+        after = measure(parse_rooms_from_text, text, args.repeat)
+        print(f"{size:>8} {len(text):>9} {before * 1000:>9.1f}ms {after * 1000:>9.1f}ms {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
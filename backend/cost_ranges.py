@@ -0,0 +1,157 @@
+"""
+Cost Ranges Module
+==================
+Monte Carlo P10/P50/P90 ranges for a deterministic estimate.
+
+Every PriceReference carries a market range around its point value. Each
+simulated quote draws, per line item, a unit price factor from a triangular
+distribution over (market_range_low, value, market_range_high) / value and
+applies it to that line's total, so JB Villan prices keep their discount and
+only the market spread is sampled. Flooring lines use the flooring reference
+for their room category; lines without a reference stay at their point price.
+
+Optionally, area uncertainty (a relative σ, e.g. 0.03 for ±3% OCR/scale
+error) draws one normal area factor per sample, shared by all lines: m²
+quantities scale with it and metre quantities with its square root.
+
+Site overhead and contingency are recomputed as shares of each sampled
+subtotal. Draws are vectorized over all line items and batched over samples
+(SIMULATION_BATCH rows at a time) to bound memory.
+
+Configuration (environment):
+- SIMULATION_SAMPLES:     default sample count (default: 100000)
+- SIMULATION_MAX_SAMPLES: most samples per request (default: 500000)
+"""
+import os
+import logging
+import functools
+from typing import Dict, List, Optional, Tuple
+
+from pricing_engine import PriceBook, current_price_book, price_items
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    _numpy_available = True
+except ImportError as e:
+    logger.warning(f"NumPy not available, cost range simulation disabled: {e}")
+    _numpy_available = False
+
+SIMULATION_SAMPLES = int(os.environ.get("SIMULATION_SAMPLES", "100000"))
+SIMULATION_MAX_SAMPLES = int(os.environ.get("SIMULATION_MAX_SAMPLES", "500000"))
+SIMULATION_BATCH = 25000
+PERCENTILES = (10, 50, 90)
+
+# Flooring lines carry no price source; their range comes from the category's flooring type
+# (price reference names, looked up in the price book)
+FLOORING_REFERENCES = {
+    "bedroom": "FLOORING_PARQUET_PER_M2",
+    "living": "FLOORING_PARQUET_PER_M2",
+    "closet": "FLOORING_PARQUET_PER_M2",
+    "kitchen": "FLOORING_TILE_PER_M2",
+    "bathroom": "FLOORING_TILE_PER_M2",
+    "laundry": "FLOORING_TILE_PER_M2",
+    "entry": "FLOORING_TILE_PER_M2",
+    "storage": "FLOORING_BASIC_PER_M2",
+    "utility": "FLOORING_BASIC_PER_M2",
+    "garage": "FLOORING_GARAGE_PER_M2",
+}
+# Quantity exponent on the sampled area factor, by unit
+AREA_EXPONENTS = {"m²": 1.0, "m": 0.5}
+
+
+def relative_range(price_ref) -> Optional[Tuple[float, float]]:
+    """(low, high) market range as factors of the reference value, widened to include 1."""
+    if price_ref is None or not price_ref.value:
+        return None
+    low, high = price_ref.market_range_low, price_ref.market_range_high
+    if low is None or high is None:
+        return None
+    low, high = min(low / price_ref.value, 1.0), max(high / price_ref.value, 1.0)
+    return (low, high) if high > low else None
+
+
+@functools.lru_cache(maxsize=8)
+def _book_ranges(book: PriceBook) -> Tuple[Dict, Dict]:
+    """(ranges by line id, ranges by flooring category), once per price book."""
+    line_ranges = {
+        line.id: relative_range(line.price_source) for line in book.lines.values() if line.price_source is not None
+    }
+    flooring_ranges = {category: relative_range(book.references[name]) for category, name in FLOORING_REFERENCES.items()}
+    return line_ranges, flooring_ranges
+
+
+def _item_range(item: Dict, book: Optional[PriceBook] = None) -> Optional[Tuple[float, float]]:
+    line_ranges, flooring_ranges = _book_ranges(book or current_price_book())
+    if item["id"] in line_ranges:
+        return line_ranges[item["id"]]
+    if item["id"].startswith("interior-floor-") and item["quantityBreakdown"]:
+        return flooring_ranges.get(item["quantityBreakdown"]["items"][0]["category"])
+    return None
+
+
+def _bands(values: "np.ndarray", point: float) -> Dict[str, float]:
+    p10, p50, p90 = np.percentile(values, PERCENTILES)
+    return {"p10": round(p10), "p50": round(p50), "p90": round(p90), "mean": round(values.mean()), "point": round(point)}
+
+
+def simulate_cost_range(
+    rooms: List[Dict],
+    summary: Dict[str, float],
+    samples: int = SIMULATION_SAMPLES,
+    area_uncertainty: float = 0.0,
+    seed: Optional[int] = None,
+    book: Optional[PriceBook] = None,
+) -> Dict:
+    """
+    P10/P50/P90 of the project total and of each phase over `samples` simulated quotes.
+
+    Returns {"samples", "total": bands, "phases": {phase: bands}}, where bands
+    are {"p10", "p50", "p90", "mean", "point"} in SEK ("point" is the
+    deterministic estimate).
+    """
+    book = book or current_price_book()
+    items = price_items(rooms, summary, book)
+    markups = {markup.id: markup for markup in book.markups}
+    lines = [item for item in items if item["id"] not in markups]
+    markup_share = sum(markup.efficiency["jb_villan"] for markup in markups.values())
+
+    totals = np.array([item["totalCost"] for item in lines])
+    ranges = [_item_range(item, book) for item in lines]
+    uncertain = np.array([r is not None for r in ranges], dtype=bool)
+    low = np.array([r[0] for r in ranges if r is not None])
+    high = np.array([r[1] for r in ranges if r is not None])
+    area_exponent = np.array([AREA_EXPONENTS.get(item["unit"], 0.0) for item in lines])
+
+    phases = list(dict.fromkeys(item["phase"] for item in items))
+    phase_matrix = np.zeros((len(lines), len(phases)))
+    phase_matrix[np.arange(len(lines)), [phases.index(item["phase"]) for item in lines]] = 1.0
+    markup_phase = phases.index("admin")
+
+    rng = np.random.default_rng(seed)
+    project_totals = np.empty(samples)
+    phase_totals = np.empty((samples, len(phases)))
+    for start in range(0, samples, SIMULATION_BATCH):
+        size = min(SIMULATION_BATCH, samples - start)
+        factors = np.ones((size, len(lines)))
+        if uncertain.any():
+            factors[:, uncertain] = rng.triangular(low, 1.0, high, size=(size, len(low)))
+        if area_uncertainty > 0:
+            area = np.clip(rng.normal(1.0, area_uncertainty, size), 0.5, 1.5)
+            factors *= area[:, None] ** area_exponent
+        by_phase = (factors * totals) @ phase_matrix
+        subtotal = by_phase.sum(axis=1)
+        by_phase[:, markup_phase] += subtotal * markup_share
+        phase_totals[start:start + size] = by_phase
+        project_totals[start:start + size] = subtotal * (1 + markup_share)
+
+    point_by_phase = {phase: 0.0 for phase in phases}
+    for item in items:
+        point_by_phase[item["phase"]] += item["totalCost"]
+    return {
+        "samples": samples,
+        "areaUncertainty": area_uncertainty,
+        "total": _bands(project_totals, sum(point_by_phase.values())),
+        "phases": {phase: _bands(phase_totals[:, idx], point_by_phase[phase]) for idx, phase in enumerate(phases)},
+    }
@@ -51,11 +51,13 @@ echo ""
 
 # Deploy with explicit project flag (belt and suspenders)
 # IMPORTANT: --set-env-vars REPLACES ALL env vars, so ALL required vars must be listed here
+# --no-cpu-throttling keeps CPU allocated between requests: analysis jobs (jobs.py) run after the response
 gcloud run deploy $SERVICE \
   --source . \
   --region $REGION \
   --project $PROJECT \
   --allow-unauthenticated \
+  --no-cpu-throttling \
   --set-env-vars="GOOGLE_CLOUD_PROJECT=$PROJECT,DOCUMENTAI_PROCESSOR_ID=$DOCUMENTAI_PROCESSOR_ID,DOCUMENTAI_LOCATION=$DOCUMENTAI_LOCATION,API_KEY=$API_KEY"
 
 echo ""
@@ -0,0 +1,141 @@
+"""
+Executor Module
+===============
+Bounded thread pools for blocking calls to external AI/OCR services.
+
+The Document AI and Vertex AI SDKs are synchronous. Calling them directly from
+an `async def` route blocks the event loop, so one slow OCR call stalls every
+other request (including /health). Each backend gets its own pool, which both
+keeps the loop free and caps concurrent outbound calls per service.
+
+Configuration (environment):
+- EXECUTOR_DOCUMENTAI_WORKERS: concurrent Document AI calls (default: 8)
+- EXECUTOR_GEMINI_WORKERS:     concurrent Gemini calls (default: 4)
+- EXECUTOR_DEFAULT_WORKERS:    size for any other backend (default: 4)
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get("EXECUTOR_DEFAULT_WORKERS", "4"))
+
+BACKEND_WORKERS = {
+    "documentai": int(os.environ.get("EXECUTOR_DOCUMENTAI_WORKERS", "8")),
+    "gemini": int(os.environ.get("EXECUTOR_GEMINI_WORKERS", "4")),
+}
+
+
+class BackendExecutor:
+    """
+    Thread pool dedicated to one outbound backend.
+
+    Tracks queue depth (submitted but not yet started), active calls and
+    queue wait time so saturation is visible before latency degrades.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-call")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _invoke(self, submitted_at: float, fn: Callable[[], Any]) -> Any:
+        started_at = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.total_wait_ms += (started_at - submitted_at) * 1000
+        ok = False
+        try:
+            result = fn()
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.total_run_ms += (time.perf_counter() - started_at) * 1000
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on this backend's pool and await the result."""
+        loop = asyncio.get_running_loop()
+        # Carry contextvars (e.g. request IDs) into the worker thread, like asyncio.to_thread
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, fn, *args, **kwargs)
+
+        with self._lock:
+            self.queued += 1
+            if self.queued > self.max_queue_depth:
+                self.max_queue_depth = self.queued
+        return await loop.run_in_executor(self._pool, self._invoke, time.perf_counter(), call)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_ms": round(self.total_wait_ms / finished, 2) if finished else 0.0,
+                "avg_run_ms": round(self.total_run_ms / finished, 2) if finished else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executors: Dict[str, BackendExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(backend: str) -> BackendExecutor:
+    """Return the executor for a backend, creating it on first use."""
+    executor = _executors.get(backend)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(backend)
+            if executor is None:
+                workers = BACKEND_WORKERS.get(backend, DEFAULT_WORKERS)
+                executor = BackendExecutor(backend, workers)
+                _executors[backend] = executor
+                logger.info(f"Created '{backend}' executor with {workers} workers")
+    return executor
+
+
+async def run_blocking(backend: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call on the named backend's bounded pool."""
+    return await get_executor(backend).run(fn, *args, **kwargs)
+
+
+def get_executor_stats() -> Dict[str, Dict]:
+    """Queue depth and throughput counters for every backend executor."""
+    return {name: executor.stats() for name, executor in list(_executors.items())}
+
+
+def shutdown_executors() -> None:
+    """Stop all pools (called on application shutdown)."""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
@@ -0,0 +1,160 @@
+"""
+Fake Document AI Processor
+==========================
+Local stand-in for DocumentProcessorServiceAsyncClient used by tests and
+offline development.
+
+Responses are built from recorded OCR fixtures (full text + text blocks) and
+returned as real `documentai.Document` protos, so the same block extraction
+code runs as in production. Fixtures are looked up by the SHA-256 of the
+uploaded bytes.
+
+Fixture format (one JSON file per sample plan):
+    {
+        "source": "01.jpg",
+        "sha256": "<hex digest of the file bytes>",
+        "mime_type": "image/jpeg",
+        "text": "<full OCR text>",
+        "blocks": [{"text": "SOV 1", "x": 0.31, "y": 0.42, "level": "line", ...}, ...]
+    }
+
+Usage:
+    from fake_documentai import FakeDocumentProcessor
+    from ocr_service import set_documentai_async_client
+    set_documentai_async_client(FakeDocumentProcessor.from_fixture_dir("tests/fixtures/ocr"))
+
+Setting DOCUMENTAI_FAKE_FIXTURES=<dir> installs the fake at startup.
+"""
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud import documentai_v1 as documentai
+
+logger = logging.getLogger(__name__)
+
+# Half-size of the box drawn around blocks recorded without extents
+_DEFAULT_HALF_BOX = 0.005
+
+
+def _layout(text_start: int, text_end: int, block: Dict) -> "documentai.Document.Page.Layout":
+    x, y = block["x"], block["y"]
+    x_min = block.get("x_min", x - _DEFAULT_HALF_BOX)
+    x_max = block.get("x_max", x + _DEFAULT_HALF_BOX)
+    y_min = block.get("y_min", y - _DEFAULT_HALF_BOX)
+    y_max = block.get("y_max", y + _DEFAULT_HALF_BOX)
+    return documentai.Document.Page.Layout(
+        text_anchor=documentai.Document.TextAnchor(
+            text_segments=[documentai.Document.TextAnchor.TextSegment(start_index=text_start, end_index=text_end)]
+        ),
+        bounding_poly=documentai.BoundingPoly(
+            normalized_vertices=[
+                documentai.NormalizedVertex(x=x_min, y=y_min),
+                documentai.NormalizedVertex(x=x_max, y=y_min),
+                documentai.NormalizedVertex(x=x_max, y=y_max),
+                documentai.NormalizedVertex(x=x_min, y=y_max),
+            ]
+        ),
+    )
+
+
+def build_document(text: str, blocks: List[Dict]) -> "documentai.Document":
+    """
+    Build a single-page Document whose lines/tokens reproduce the given blocks.
+
+    Each block's text anchor points at an occurrence of its text in the full
+    text. Blocks whose text does not occur are appended after the recorded text.
+    """
+    full_text = text
+    lines, tokens = [], []
+    cursors = {"line": 0, "token": 0}
+
+    for block in blocks:
+        level = block.get("level", "token")
+        block_text = block["text"]
+        start = full_text.find(block_text, cursors.get(level, 0))
+        if start < 0:
+            start = full_text.find(block_text)
+        if start < 0:
+            full_text += "\n" + block_text
+            start = len(full_text) - len(block_text)
+        end = start + len(block_text)
+        cursors[level] = end
+
+        layout = _layout(start, end, block)
+        if level == "line":
+            lines.append(documentai.Document.Page.Line(layout=layout))
+        else:
+            tokens.append(documentai.Document.Page.Token(layout=layout))
+
+    page = documentai.Document.Page(page_number=1, lines=lines, tokens=tokens)
+    return documentai.Document(text=full_text, pages=[page])
+
+
+class FakeDocumentProcessor:
+    """
+    Async fake exposing `process_document(request=..., timeout=...)`.
+
+    Args:
+        fixtures: {sha256: {"text": ..., "blocks": [...]}}
+        default:  fixture returned for unknown content (None -> empty document)
+        delay:    seconds to sleep per call, to simulate OCR latency; calls
+                  with a shorter timeout fail with DeadlineExceeded after it,
+                  like the real service
+        error:    exception raised by every call, to simulate outages
+    """
+
+    def __init__(
+        self,
+        fixtures: Optional[Dict[str, Dict]] = None,
+        default: Optional[Dict] = None,
+        delay: float = 0.0,
+        error: Optional[Exception] = None,
+    ):
+        self.fixtures = fixtures or {}
+        self.default = default
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    @classmethod
+    def from_fixture_dir(cls, directory: str, **kwargs) -> "FakeDocumentProcessor":
+        fixtures = {}
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                fixture = json.load(f)
+            fixtures[fixture["sha256"]] = fixture
+        logger.info(f"Loaded {len(fixtures)} fake Document AI fixtures from {directory}")
+        return cls(fixtures=fixtures, **kwargs)
+
+    def add_fixture(self, content: bytes, text: str, blocks: List[Dict]) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        self.fixtures[digest] = {"text": text, "blocks": blocks}
+        return digest
+
+    async def process_document(self, request=None, timeout=None, **kwargs):
+        self.calls += 1
+        try:
+            if self.delay and timeout is not None and timeout < self.delay:
+                await asyncio.sleep(timeout)
+                raise google_exceptions.DeadlineExceeded(f"Deadline of {timeout}s exceeded")
+            if self.delay:
+                await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+
+        digest = hashlib.sha256(request.raw_document.content).hexdigest()
+        fixture = self.fixtures.get(digest, self.default)
+        if fixture is None:
+            return documentai.ProcessResponse(document=documentai.Document(text=""))
+        return documentai.ProcessResponse(document=build_document(fixture["text"], fixture["blocks"]))
@@ -0,0 +1,285 @@
+"""
+Analysis Jobs Module
+====================
+Background floor plan analysis with polling.
+
+POST /analyze/jobs enqueues the upload and returns a job ID immediately; a
+small pool of asyncio workers runs the OCR -> parse -> pricing pipeline and
+records each stage. Job records (including the final result) live in
+Firestore, or in process memory when Firestore is unavailable.
+
+Configuration (environment):
+- JOB_WORKERS:         concurrent background analyses (default: 2). Workers run
+                       after the response is sent, so on Cloud Run the service
+                       needs CPU always allocated (--no-cpu-throttling, set by
+                       deploy.sh); with request-based billing they stall between requests
+- JOB_QUEUE_MAX:       queued uploads before new jobs are rejected (default: 50)
+- JOB_TTL_DAYS:        retention, written as `expireAt` for a Firestore TTL policy (default: 7)
+- JOB_MEMORY_MAX:      jobs kept by the in-memory store (default: 500)
+"""
+import os
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from executors import run_blocking
+from timing import detach_request_timings
+from metrics import observe_call
+from logging_config import request_id_var
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "50"))
+JOB_TTL_DAYS = int(os.environ.get("JOB_TTL_DAYS", "7"))
+JOB_MEMORY_MAX = int(os.environ.get("JOB_MEMORY_MAX", "500"))
+JOBS_COLLECTION = "analysis_jobs"
+BATCH_WRITE_LIMIT = 500  # Firestore's cap on writes per batch
+
+# Job lifecycle
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _result_failure(result: Dict) -> Optional[str]:
+    """Why an analysis that returned is still a failed job (an error, or no text or rooms), or None."""
+    if result.get("error"):
+        return str(result["error"])
+    if not result.get("rooms"):
+        return "No rooms found in the floor plan"
+    return None
+
+
+# --- Stores ---
+
+class InMemoryJobStore:
+    """Process-local job store for offline/dev mode. Oldest jobs are evicted first."""
+    name = "memory"
+
+    def __init__(self, max_jobs: int = JOB_MEMORY_MAX):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def update(self, job_id: str, fields: Dict) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_by_project(self, project_id: str) -> List[Dict]:
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job.get("projectId") == project_id]
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def delete_by_project(self, project_id: str) -> List[Dict]:
+        """Delete a project's jobs; returns the deleted records."""
+        with self._lock:
+            deleted = [self._jobs.pop(job_id) for job_id, job in list(self._jobs.items()) if job.get("projectId") == project_id]
+        return deleted
+
+    def references_content(self, content_hash: str, mime_type: str) -> bool:
+        """Whether any stored job analyzed this upload (same bytes and type)."""
+        with self._lock:
+            return any(job.get("contentHash") == content_hash and job.get("mimeType") == mime_type for job in self._jobs.values())
+
+
+class FirestoreJobStore:
+    """Job records in the `analysis_jobs` collection, shared across instances."""
+    name = "firestore"
+
+    def __init__(self, db):
+        self.client = db
+        self.collection = db.collection(JOBS_COLLECTION)
+
+    def create(self, job: Dict) -> None:
+        record = dict(job)
+        record["expireAt"] = datetime.now(timezone.utc) + timedelta(days=JOB_TTL_DAYS)
+        self.collection.document(job["id"]).set(record)
+
+    def update(self, job_id: str, fields: Dict) -> None:
+        self.collection.document(job_id).update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        doc = self.collection.document(job_id).get()
+        if not doc.exists:
+            return None
+        job = doc.to_dict()
+        job.pop("expireAt", None)
+        return job
+
+    def list_by_project(self, project_id: str) -> List[Dict]:
+        docs = self.collection.where("projectId", "==", project_id).stream()
+        return [doc.to_dict() for doc in docs]
+
+    def delete(self, job_id: str) -> None:
+        self.collection.document(job_id).delete()
+
+    def delete_by_project(self, project_id: str) -> List[Dict]:
+        """Delete a project's jobs in batched commits; returns the deleted records."""
+        docs = list(self.collection.where("projectId", "==", project_id).stream())
+        for start in range(0, len(docs), BATCH_WRITE_LIMIT):
+            batch = self.client.batch()
+            for doc in docs[start:start + BATCH_WRITE_LIMIT]:
+                batch.delete(doc.reference)
+            batch.commit()
+        return [doc.to_dict() for doc in docs]
+
+    def references_content(self, content_hash: str, mime_type: str) -> bool:
+        """Whether any stored job analyzed this upload (same bytes and type)."""
+        query = self.collection.where("contentHash", "==", content_hash).where("mimeType", "==", mime_type)
+        return any(True for _ in query.limit(1).stream())
+
+
+# --- Queue ---
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more uploads."""
+
+
+# Runs one analysis: (contents, mime_type, content_hash, on_stage) -> result dict
+AnalyzeFn = Callable[[bytes, str, Optional[str], Callable[[str], Awaitable[None]]], Awaitable[Dict]]
+
+
+class JobQueue:
+    """
+    Bounded asyncio queue drained by JOB_WORKERS worker tasks.
+
+    Workers are started lazily on the running event loop at first submit, so
+    the queue works the same under gunicorn and in tests.
+    """
+
+    def __init__(self, store, analyze: AnalyzeFn, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX):
+        self.store = store
+        self.analyze = analyze
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks and not all(t.done() for t in self._tasks):
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} analysis job workers (store: {self.store.name})")
+
+    async def _store(self, method: str, *args: Any) -> Any:
+        # Firestore calls are blocking; keep them off the event loop
+        with observe_call(self.store.name, f"job_{method}"):
+            return await run_blocking("firestore", getattr(self.store, method), *args)
+
+    async def submit(
+        self,
+        contents: bytes,
+        mime_type: str,
+        filename: Optional[str],
+        content_hash: Optional[str] = None,
+        project_id: Optional[str] = None,
+    ) -> Dict:
+        """Record a queued job and enqueue its upload. Raises QueueFullError when saturated."""
+        self._ensure_started()
+        if self._queue.full():
+            raise QueueFullError(f"{self._queue.qsize()} jobs already queued")
+
+        now = _now()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": STATUS_QUEUED,
+            "stage": STATUS_QUEUED,
+            "stages": [{"stage": STATUS_QUEUED, "at": now}],
+            "filename": filename,
+            "mimeType": mime_type,
+            "contentHash": content_hash,
+            "projectId": project_id,
+            "createdAt": now,
+            "updatedAt": now,
+            "result": None,
+            "error": None,
+        }
+        await self._store("create", job)
+        try:
+            self._queue.put_nowait((job, contents))
+        except asyncio.QueueFull:
+            # Filled up by concurrent submits while the record was being written
+            await self._store("update", job["id"], {"status": STATUS_FAILED, "stage": STATUS_FAILED, "error": "queue full"})
+            raise QueueFullError(f"{self._queue.qsize()} jobs already queued")
+        return job
+
+    async def _worker(self, worker_id: int) -> None:
+        # Workers are spawned from whichever request submitted first; don't report into its timings
+        detach_request_timings()
+        while True:
+            job, contents = await self._queue.get()
+            try:
+                await self._run(job, contents)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} failed to record job {job['id']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict, contents: bytes) -> None:
+        # Logs from the analysis carry the job ID in place of a request ID
+        request_id_var.set(f"job-{job['id']}")
+        stages = list(job["stages"])
+
+        async def record_stage(stage: str, **fields: Any) -> None:
+            now = _now()
+            stages.append({"stage": stage, "at": now})
+            await self._store("update", job["id"], {"stage": stage, "stages": list(stages), "updatedAt": now, **fields})
+
+        await record_stage("started", status=STATUS_RUNNING)
+        try:
+            result = await self.analyze(contents, job["mimeType"], job["contentHash"], record_stage)
+        except Exception as e:
+            logger.error(f"Analysis job {job['id']} failed: {type(e).__name__}: {e}")
+            await record_stage(STATUS_FAILED, status=STATUS_FAILED, error=f"{type(e).__name__}: analysis failed")
+            return
+        failure = _result_failure(result)
+        if failure is not None:
+            logger.warning(f"Analysis job {job['id']} found nothing to price: {failure}")
+            await record_stage(STATUS_FAILED, status=STATUS_FAILED, error=failure)
+            return
+        await record_stage(STATUS_COMPLETED, status=STATUS_COMPLETED, result=result)
+        logger.info(f"Analysis job {job['id']} completed")
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self._store("get", job_id)
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._queue = None
+        self._loop = None
@@ -0,0 +1,123 @@
+"""
+Logging Configuration Module
+============================
+JSON logs written off the request path, tagged with the current request ID.
+
+configure_logging() replaces the root handlers with a QueueHandler: callers
+only enqueue the record, and a background QueueListener thread formats it as
+one JSON object per line on stdout (the shape Cloud Logging parses: `severity`,
+`message`, plus structured fields).
+
+The request ID lives in a contextvar set by StructuredLoggingMiddleware. It
+follows the request into every coroutine and into executor threads
+(run_blocking copies the context), so OCR and AI module logs carry the same
+request_id as the access log line.
+
+Configuration (environment):
+- LOG_FORMAT: "json" (default) or "text" for local development
+- LOG_LEVEL:  root log level (default: INFO)
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import contextvars
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Optional
+
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def get_request_id() -> Optional[str]:
+    """ID of the request being handled in this context, if any."""
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request ID, in the caller's context before the record is queued."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record. Extra fields (logger.info(..., extra={...})) become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps extra fields and exc_info for the listener's formatter."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default prepare() pre-formats the message and drops exc_info; the JSON
+        # formatter needs both, so only resolve args and exception text here
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging() -> None:
+    """Route all logging through a non-blocking queue to a JSON (or text) stdout handler."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        output.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(request_id)s:%(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    handler = _ContextQueueHandler(queue.SimpleQueue())
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
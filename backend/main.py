@@ -6,36 +6,92 @@ import sys
 import logging
 import traceback
 import uuid
-from datetime import datetime, timedelta
+import asyncio
+import io
+import json
+import time
+import zipfile
+import zlib
+from datetime import datetime, timedelta, timezone
 
 # Add current directory to path to ensure local imports work in all environments
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from typing import List
-from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Depends
-from fastapi.responses import JSONResponse
+from functools import lru_cache
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Response, Depends, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from google.cloud import firestore
 from ai_service import analyze_image_with_gemini, chat_with_gemini, generate_narrative_explanation, _vertex_available
-from ocr_service import analyze_floor_plan_deterministic, _documentai_available
+from ocr_service import (
+    analyze_floor_plan_deterministic, get_documentai_pool_stats, documentai_async_ready, _documentai_available,
+    MATCHING_MODES, ROOM_MATCHING,
+)
 from models import CostItem, Project, ChatResponse
 from security import get_api_key
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter, create_model
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from middleware import StructuredLoggingMiddleware
-
-# Configure Logging
-logging.basicConfig(level=logging.INFO)
+from middleware import StructuredLoggingMiddleware, BodySizeLimitMiddleware, MetricsMiddleware
+from executors import run_blocking, get_executor_stats, shutdown_executors
+from jobs import JobQueue, FirestoreJobStore, InMemoryJobStore, QueueFullError
+from ocr_cache import get_ocr_cache, hash_content
+from uploads import read_upload, sniff_content_type
+from logging_config import configure_logging
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, RATE_LIMITED, record_cache_lookup, render_metrics
+from scenarios import ScenarioError, build_parameter_matrix, price_scenarios, _numpy_available
+from cost_ranges import SIMULATION_MAX_SAMPLES, SIMULATION_SAMPLES, simulate_cost_range
+from repricing import OVERRIDE_FIELDS, PriceBookMismatchError, PricingModel, RepricingError, book_for_version
+from price_book import PriceBookError, build_loader_from_env
+from pricing_engine import current_price_book
+from timing import span
+from pagination import PROJECT_PAGE_MAX, PROJECT_PAGE_SIZE, PaginationError, decode_page_token, parse_fields
+from repository import FIRESTORE_PROJECT, build_repository_from_env, create_client
+from read_cache import ReadCache, cached_json_response
+from project_deletion import delete_project_data
+
+# Configure Logging (JSON lines through a background queue listener)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # --- Rate Limiter ---
 limiter = Limiter(key_func=get_remote_address)
 
-app = FastAPI(title="KGVilla API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup: load the price book and start polling for new ones. Shutdown:
+    stop polling, the job workers, the repository's channel and the
+    outbound pools, in that order (jobs still use the pools while stopping).
+    """
+    try:
+        price_books.reload()
+    except Exception:
+        pass  # Logged by the loader; the built-in prices stay active
+    price_books.start_polling()
+    try:
+        yield
+    finally:
+        price_books.stop_polling()
+        await job_queue.shutdown()
+        if repository is not None:
+            await repository.close()
+        shutdown_executors()
+
+
+app = FastAPI(title="KGVilla API", version="1.0.0", lifespan=lifespan)
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+
+def rate_limit_exceeded(request: Request, exc: RateLimitExceeded):
+    RATE_LIMITED.inc(getattr(request.scope.get("route"), "path", request.url.path))
+    return _rate_limit_exceeded_handler(request, exc)
+
+
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded)
 app.add_middleware(StructuredLoggingMiddleware)
 
 # --- Configuration ---
@@ -43,17 +99,48 @@ ALLOWED_ORIGINS_STR = os.environ.get("ALLOWED_ORIGINS", "http://localhost:3000,h
 ALLOWED_ORIGINS = [origin.strip() for origin in ALLOWED_ORIGINS_STR.split(",")]
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MULTIPART_OVERHEAD = 64 * 1024  # Boundaries, part headers and form fields around the file
 ALLOWED_CONTENT_TYPES = {"application/pdf", "image/png", "image/jpeg", "image/webp"}
 
+# Batch analysis
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "30"))
+BATCH_MAX_PARALLEL = int(os.environ.get("BATCH_MAX_PARALLEL", "8"))
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+EXTENSION_CONTENT_TYPES = {
+    ".pdf": "application/pdf",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+}
+BATCH_MAX_BODY_SIZE = int(os.environ.get("BATCH_MAX_BODY_SIZE", str(100 * 1024 * 1024)))
+
+# --- Request Body Limits ---
+# Enforced while the body streams in, before multipart parsing spools it
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "/analyze": MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/analyze/jobs": MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/debug-ocr": MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/analyze/batch": BATCH_MAX_BODY_SIZE,
+    },
+)
+
 # --- CORS ---
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "X-API-Key", "Authorization"],
+    allow_headers=["Content-Type", "X-API-Key", "Authorization", "If-None-Match"],
+    expose_headers=["X-OCR-Cache", "Server-Timing", "X-Next-Page-Token", "ETag"],
 )
 
+# --- Metrics ---
+# Outermost, so 413s from the body limit and CORS preflights are counted too
+app.add_middleware(MetricsMiddleware)
+
 # --- Global Exception Handler ---
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -84,15 +171,42 @@ async def global_exception_handler(request: Request, exc: Exception):
 _firestore_available = False
 db = None
 try:
-    # Use explicit project ID if possible
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT", "kgvilla")
-    db = firestore.Client(project=project_id)
+    # Sync client for the job store and price book source (they run in worker threads)
+    db = create_client()
     _firestore_available = True
-    logger.info(f"Firestore initialized for project {project_id}")
+    logger.info(f"Firestore initialized for project {FIRESTORE_PROJECT}")
 except Exception as e:
     logger.error(f"Firestore failed: {e}")
     _firestore_available = False
 
+# Project, item and health routes use the async repository; None means offline mode
+repository = build_repository_from_env()
+
+# Serialized GET /projects/{id} and /projects/{id}/items bodies, invalidated by the writes below
+read_cache = ReadCache()
+_COST_ITEMS = TypeAdapter(List[CostItem])
+_PROJECTS = TypeAdapter(List[Project])
+
+
+@lru_cache(maxsize=64)
+def _project_fields_adapter(fields: Tuple[str, ...]) -> TypeAdapter:
+    """Validator for projects listed with ?fields=: just those fields, typed as in Project."""
+    model = create_model("ProjectFields", **{name: (Project.model_fields[name].annotation, Project.model_fields[name]) for name in fields})
+    return TypeAdapter(List[model])
+
+# --- Analysis Jobs ---
+async def _run_analysis_job(contents: bytes, mime_type: str, content_hash: str, on_stage):
+    return await analyze_floor_plan_deterministic(contents, mime_type, content_hash, on_stage=on_stage)
+
+job_queue = JobQueue(
+    FirestoreJobStore(db) if _firestore_available and db else InMemoryJobStore(),
+    _run_analysis_job,
+)
+
+# --- Price Book ---
+# Loaded and polled from lifespan()
+price_books = build_loader_from_env(db if _firestore_available else None)
+
 # --- Models ---
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=10000, description="User message")
@@ -103,6 +217,63 @@ class ExplainRequest(BaseModel):
     context: dict = Field(default={}, description="Floor plan context (room, dimensions, boa, biarea)")
     language: str = Field(default="en", description="Language for explanation (en or sv)")
 
+class PricingRoom(BaseModel):
+    name: str = Field(..., max_length=100)
+    area: float = Field(..., ge=0, le=10000, description="Net area in m²")
+    category: str = Field(..., max_length=50)
+
+class ScenarioRequest(BaseModel):
+    rooms: List[PricingRoom] = Field(..., max_length=200, description="Rooms as returned by /analyze")
+    summary: Dict[str, float] = Field(default={}, description="Summary areas (boyta, byggyta, bta) as returned by /analyze")
+    scenarios: List[Dict[str, float]] = Field(default=[], max_length=1000, description="Explicit parameter sets, e.g. {\"roof_slope_factor\": 1.15}")
+    sweep: Dict[str, List[float]] = Field(default={}, description="Values per parameter; every combination is priced")
+    includeItems: bool = Field(default=True, description="Include the scenarios × items totals matrix")
+
+class CostRangeRequest(BaseModel):
+    rooms: List[PricingRoom] = Field(..., max_length=200, description="Rooms as returned by /analyze")
+    summary: Dict[str, float] = Field(default={}, description="Summary areas (boyta, byggyta, bta) as returned by /analyze")
+    samples: int = Field(default=SIMULATION_SAMPLES, ge=1000, le=SIMULATION_MAX_SAMPLES, description="Simulated quotes")
+    areaUncertainty: float = Field(default=0.0, ge=0, le=0.3, description="Relative σ of the measured areas, e.g. 0.03")
+    seed: Optional[int] = Field(default=None, description="Fix for reproducible ranges")
+
+class ItemOverride(BaseModel):
+    id: str = Field(..., max_length=200)
+    customQuantity: Optional[float] = Field(default=None, ge=0, description="null clears the override")
+    customUnitPrice: Optional[float] = Field(default=None, ge=0, description="null clears the override")
+
+class PricingPlan(BaseModel):
+    rooms: List[PricingRoom] = Field(..., max_length=200, description="Rooms as returned by /analyze")
+    summary: Dict[str, float] = Field(default={}, description="Summary areas (boyta, byggyta, bta) as returned by /analyze")
+
+class RepriceRequest(BaseModel):
+    changes: List[ItemOverride] = Field(default=[], max_length=500, description="Quantity / unit price overrides; omitted fields are left as they are")
+    inputs: Dict[str, float] = Field(default={}, description="Plan inputs to change: byggyta, boyta, bta")
+    plan: Optional[PricingPlan] = Field(default=None, description="Plan the saved items were priced from; stored for later input edits")
+
+# --- Helpers ---
+DISCONNECT_POLL_SECONDS = 0.5
+
+async def run_until_disconnect(request: Request, coro):
+    """
+    Await coro, cancelling it if the HTTP client goes away.
+
+    Long OCR calls are otherwise completed (and billed) for clients that have
+    already given up. Returns None if the client disconnected.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling {request.url.path}")
+                task.cancel()
+                return None
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
 # --- Routes ---
 @app.get("/")
 def read_root():
@@ -111,10 +282,11 @@ def read_root():
         "service": "KGVilla Backend",
         "version": "1.0.0",
         "checks": {
-            "firestore": "connected" if _firestore_available else "disconnected",
+            "firestore": "connected" if repository is not None else "disconnected",
             "document_ai": "connected" if _documentai_available else "disconnected",
             "vertex_ai": "connected" if _vertex_available else "disconnected (fallback)"
-        }
+        },
+        "executors": get_executor_stats()
     }
     return status
 
@@ -129,7 +301,9 @@ async def health_check():
     
     now = datetime.utcnow()
     if _cached_health_response and _last_health_check and (now - _last_health_check) < HEALTH_CHECK_TTL:
+        record_cache_lookup("health", hit=True)
         return _cached_health_response
+    record_cache_lookup("health", hit=False)
 
     health = {
         "status": "healthy",
@@ -141,9 +315,9 @@ async def health_check():
     
     # Check Firestore
     try:
-        if _firestore_available and db:
+        if repository is not None:
             # Perform actual read
-            list(db.collection("projects").limit(1).stream())
+            await repository.ping()
             health["checks"]["firestore"] = "ok"
         else:
             health["checks"]["firestore"] = "not_configured"
@@ -152,6 +326,9 @@ async def health_check():
         health["checks"]["firestore"] = f"error: {type(e).__name__}"
         logger.error(f"Health check failed (Firestore): {e}")
 
+    # Document AI client pool (reports reconnects; no OCR call is made here)
+    health["checks"]["document_ai"] = get_documentai_pool_stats() if _documentai_available else "not_configured"
+
     # Check Vertex AI
     if _vertex_available:
         health["checks"]["vertex_ai"] = "ok"
@@ -168,119 +345,464 @@ async def health_check():
     
     return response
 
-@app.get("/projects", response_model=List[Project])
-def list_projects(api_key: str = Depends(get_api_key)):
-    if not _firestore_available or not db:
-        return []
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint (unauthenticated, like /health)."""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/price-book")
+def get_price_book(api_key: str = Depends(get_api_key)):
+    """Version and checksum of the active price book, and where it was loaded from."""
+    return price_books.status()
+
+@app.post("/price-book/reload")
+@limiter.limit("10/minute")
+def reload_price_book(request: Request, api_key: str = Depends(get_api_key)):
+    """Load the price book source now and activate it if it changed; a bad document keeps the active book."""
     try:
-        docs = db.collection("projects").stream()
-        return [Project(**doc.to_dict()) for doc in docs]
-    except Exception as e:
-        # Global handler will catch and log this
-        raise e
+        reloaded = price_books.reload()
+    except PriceBookError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Price book source unavailable: {e}")
+    return {"reloaded": reloaded, **price_books.status()}
+
+@app.get("/projects")
+async def list_projects(
+    limit: Optional[int] = Query(None, ge=1, le=PROJECT_PAGE_MAX),
+    page_token: Optional[str] = Query(None, alias="pageToken"),
+    fields: Optional[str] = None,
+    api_key: str = Depends(get_api_key),
+):
+    """
+    Projects, most recently updated first. Without ?limit= or ?pageToken=,
+    every project. With them, one page (default PROJECT_PAGE_SIZE): the
+    X-Next-Page-Token response header, passed back as ?pageToken=, fetches
+    the next page; it is absent on the last page. ?fields=name,location reads
+    only those fields (plus id and updatedAt).
+    """
+    try:
+        projection = parse_fields(fields, Project.model_fields)
+        if page_token:
+            decode_page_token(page_token)
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if repository is None:
+        return []
+
+    if limit is None and not page_token:
+        # Unpaged callers (the dashboard) get the whole list, read a page at a time
+        projects, next_token = [], None
+        while True:
+            page, next_token = await repository.list_projects(PROJECT_PAGE_MAX, next_token, projection)
+            projects.extend(page)
+            if next_token is None:
+                break
+    else:
+        projects, next_token = await repository.list_projects(limit or PROJECT_PAGE_SIZE, page_token, projection)
+
+    adapter = _PROJECTS if projection is None else _project_fields_adapter(tuple(projection))
+    body = adapter.dump_json(adapter.validate_python(projects))
+    headers = {"X-Next-Page-Token": next_token} if next_token else None
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/projects")
-def create_update_project(project: Project, api_key: str = Depends(get_api_key)):
-    if not _firestore_available or not db:
+async def create_update_project(project: Project, api_key: str = Depends(get_api_key)):
+    if repository is None:
         # In dev/offline mode, we might want to return success to let frontend proceed?
         # But frontend handles offline. Let's return 503 to indicate backend storage failed.
         raise HTTPException(status_code=503, detail="Firestore unavailable")
     
-    db.collection("projects").document(project.id).set(project.model_dump())
+    project.updatedAt = datetime.now(timezone.utc)
+    await repository.save_project(project.model_dump())
+    read_cache.invalidate(("project", project.id))
     return {"status": "success", "id": project.id}
 
 @app.get("/projects/{project_id}", response_model=Project)
-def get_project(project_id: str, api_key: str = Depends(get_api_key)):
-    if not _firestore_available or not db:
+async def get_project(project_id: str, request: Request, api_key: str = Depends(get_api_key)):
+    """The project, with an ETag; If-None-Match with the current ETag gets a 304."""
+    if repository is None:
         # Mock fallback for resilience
         return Project(id=project_id, name="Offline Project", location="Local")
-    
-    doc = db.collection("projects").document(project_id).get()
-    if not doc.exists:
-        raise HTTPException(status_code=404, detail="Project not found")
-    return Project(**doc.to_dict())
+
+    async def load() -> bytes:
+        data = await repository.get_project(project_id)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        return Project(**data).model_dump_json().encode("utf-8")
+
+    entry = await read_cache.get_or_load(("project", project_id), load)
+    return cached_json_response(entry, request.headers.get("If-None-Match"))
 
 @app.delete("/projects/{project_id}")
-def delete_project(project_id: str, api_key: str = Depends(get_api_key)):
-    if not _firestore_available or not db:
+async def delete_project(project_id: str, api_key: str = Depends(get_api_key)):
+    """Delete the project with its items, subcollections, analysis jobs and OCR cache entries."""
+    if repository is None:
         return {"status": "mock_deleted"}
     
-    db.collection("projects").document(project_id).delete()
-    db.collection("cost_data").document(project_id).delete()
-    logger.info(f"Deleted project: {project_id}")
-    return {"status": "success", "id": project_id}
+    deleted = await delete_project_data(project_id, repository, job_queue.store, get_ocr_cache())
+    read_cache.invalidate(("project", project_id), ("items", project_id))
+    return {"status": "success", "id": project_id, "deleted": deleted}
 
 @app.post("/projects/{project_id}/items")
-def save_project_items(project_id: str, items: List[CostItem], api_key: str = Depends(get_api_key)):
-    if not _firestore_available or not db:
+async def save_project_items(
+    project_id: str,
+    items: List[CostItem],
+    price_book_version: Optional[str] = Query(None, alias="priceBookVersion"),
+    api_key: str = Depends(get_api_key),
+):
+    """
+    Store the project's items, writing only those added, changed or removed
+    since the last save. ?priceBookVersion= names the book that priced them
+    (the analysis result's); default: the active book.
+    """
+    if repository is None:
         return {"status": "mock_saved"}
     
-    data = {"items": [item.model_dump() for item in items]}
-    db.collection("cost_data").document(project_id).set(data)
-    return {"status": "success", "count": len(items)}
+    data = {"items": [item.model_dump() for item in items], "priceBookVersion": price_book_version or current_price_book().version}
+    written = await repository.save_items(project_id, data)
+    read_cache.invalidate(("items", project_id))
+    return {"status": "success", "count": len(items), "written": written}
 
 @app.get("/projects/{project_id}/items", response_model=List[CostItem])
-def get_project_items(project_id: str, api_key: str = Depends(get_api_key)):
-    if not _firestore_available or not db:
+async def get_project_items(project_id: str, request: Request, api_key: str = Depends(get_api_key)):
+    """The project's items, with an ETag; If-None-Match with the current ETag gets a 304."""
+    if repository is None:
         return []
-    
+
+    async def load() -> bytes:
+        data = await repository.get_items(project_id) or {}
+        return _COST_ITEMS.dump_json(_COST_ITEMS.validate_python(data.get("items", [])))
+
     try:
-        doc = db.collection("cost_data").document(project_id).get()
-        if not doc.exists:
-            return []
-        data = doc.to_dict()
-        return [CostItem(**item) for item in data.get("items", [])]
+        entry = await read_cache.get_or_load(("items", project_id), load)
     except Exception as e:
         logger.error(f"Get items failed: {e}")
         return []
+    return cached_json_response(entry, request.headers.get("If-None-Match"))
+
+@app.patch("/projects/{project_id}/items")
+async def reprice_project_items(project_id: str, body: RepriceRequest, api_key: str = Depends(get_api_key)):
+    """
+    Apply quantity / unit price overrides and plan input edits to the saved
+    items, repricing only what depends on them with the price book that
+    priced them (409 if that book is no longer active). Returns the delta:
+    changed or added items, removed ids and the new totals.
+    """
+    if repository is None:
+        raise HTTPException(status_code=503, detail="Firestore unavailable")
+
+    overrides = {
+        change.id: {name: getattr(change, name) for name in OVERRIDE_FIELDS if name in change.model_fields_set}
+        for change in body.changes
+    }
+    result = {}
+
+    def reprice(data: Optional[Dict]) -> Dict:
+        # Runs inside the repository's transaction (again, if it retries), on the stored items
+        if data is None:
+            raise HTTPException(status_code=404, detail="Project items not found")
+        book = book_for_version(data.get("priceBookVersion"))
+        plan = body.plan.model_dump() if body.plan else data.get("plan")
+        if plan:
+            model = PricingModel(data.get("items", []), plan["rooms"], plan["summary"], book)
+        else:
+            model = PricingModel(data.get("items", []), book=book)
+        with span("repricing"):
+            result["delta"] = model.apply(overrides, body.inputs)
+        result["version"] = book.version
+        # A full save (POST) replaces the document and with it the plan, which may no longer match
+        stored = {"items": model.items, "priceBookVersion": book.version}
+        if plan:
+            stored["plan"] = {"rooms": model.rooms, "summary": model.summary}
+        return stored
+
+    try:
+        await repository.update_items(project_id, reprice)
+    except PriceBookMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RepricingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    read_cache.invalidate(("items", project_id))
+    delta = result["delta"]
+    logger.info(f"Repriced project {project_id}: {len(delta['items'])} changed, {len(delta['removed'])} removed")
+    return {"projectId": project_id, "priceBookVersion": result["version"], **delta}
+
+@app.post("/projects/{project_id}/scenarios")
+@limiter.limit("30/minute")
+def price_project_scenarios(request: Request, project_id: str, body: ScenarioRequest, api_key: str = Depends(get_api_key)):
+    """
+    What-if pricing for a project's rooms under many parameter scenarios
+    (roof pitch, foundation price, overhead/contingency rates, wall thickness).
+    Row 0 of every matrix is the standard estimate.
+    """
+    if not _numpy_available:
+        raise HTTPException(status_code=503, detail="Scenario pricing unavailable (NumPy not installed)")
+    book = current_price_book()
+    try:
+        parameters = build_parameter_matrix(body.scenarios, body.sweep, book)
+    except ScenarioError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rooms = [room.model_dump() for room in body.rooms]
+    with span("scenarios"):
+        result = price_scenarios(rooms, body.summary, parameters, book)
+    logger.info(f"Priced {len(parameters)} scenarios for project {project_id}")
+    return {"projectId": project_id, "priceBookVersion": book.version, **result.to_dict(include_items=body.includeItems)}
+
+@app.post("/projects/{project_id}/cost-range")
+@limiter.limit("30/minute")
+def estimate_project_cost_range(request: Request, project_id: str, body: CostRangeRequest, api_key: str = Depends(get_api_key)):
+    """
+    Monte Carlo P10/P50/P90 for the project total and each phase, sampling
+    unit prices within their documented market ranges.
+    """
+    if not _numpy_available:
+        raise HTTPException(status_code=503, detail="Cost range simulation unavailable (NumPy not installed)")
+    book = current_price_book()
+    rooms = [room.model_dump() for room in body.rooms]
+    with span("simulation"):
+        result = simulate_cost_range(rooms, body.summary, body.samples, body.areaUncertainty, body.seed, book)
+    return {"projectId": project_id, "priceBookVersion": book.version, **result}
 
 @app.post("/analyze")
 @limiter.limit("20/minute")
-async def analyze_drawing(request: Request, file: UploadFile = File(...), api_key: str = Depends(get_api_key)):
-    # 1. Validate Content Type
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
+async def analyze_drawing(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    matching: str = ROOM_MATCHING,
+    api_key: str = Depends(get_api_key),
+):
+    validate_matching_mode(matching)
+
+    # 1. Read in chunks: enforces the size cap, hashes and sniffs the real file type
+    upload = await read_upload(file, MAX_FILE_SIZE, ALLOWED_CONTENT_TYPES)
+
+    logger.info(f"Analyzing file: {file.filename} ({upload.size} bytes, {upload.content_type})")
+
+    # 2. Process - Use Document AI (deterministic) if available, else Gemini (fallback)
+    if _documentai_available or documentai_async_ready():
+        logger.info("Using Document AI OCR for deterministic analysis")
+        result = await run_until_disconnect(
+            request,
+            analyze_floor_plan_deterministic(upload.contents, upload.content_type, upload.content_hash, matching=matching),
+        )
+        if result is None:
+            return Response(status_code=499)  # Client closed request
+        response.headers["X-OCR-Cache"] = result.get("ocrCache", "BYPASS")
+    else:
+        logger.info("Document AI not available, falling back to Gemini")
+        result = await analyze_image_with_gemini(upload.contents, upload.content_type)
+
+    return result
+
+
+def validate_matching_mode(matching: str) -> None:
+    """Reject unknown room matching modes (query parameter `matching`)."""
+    if matching not in MATCHING_MODES:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid file type: {file.content_type}. Allowed: {', '.join(ALLOWED_CONTENT_TYPES)}"
+            detail=f"Invalid matching mode: {matching}. Allowed: {', '.join(MATCHING_MODES)}"
         )
 
-    # 2. Read content
-    contents = await file.read()
 
-    # 3. Validate Size
-    if len(contents) > MAX_FILE_SIZE:
+def expand_zip_upload(filename: str, contents: bytes, max_files: int) -> List[dict]:
+    """
+    Unpack a zip of floor plans into batch entries.
+
+    The member list is checked before anything is decompressed: more than
+    max_files eligible members, or more than BATCH_MAX_BODY_SIZE uncompressed
+    in total, is rejected with 413. Members with unsupported extensions are
+    skipped; oversized, encrypted or unreadable members are reported as errors.
+    """
+    with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not os.path.basename(info.filename).startswith(".")
+            and os.path.splitext(info.filename)[1].lower() in EXTENSION_CONTENT_TYPES
+        ]
+        if len(members) > max_files:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Too many files in {filename} ({len(members)}). Max per batch: {BATCH_MAX_FILES}"
+            )
+        total_size = sum(info.file_size for info in members if info.file_size <= MAX_FILE_SIZE)
+        if total_size > BATCH_MAX_BODY_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{filename} expands to {total_size // (1024 * 1024)}MB. Max per batch: {BATCH_MAX_BODY_SIZE // (1024 * 1024)}MB"
+            )
+
+        entries = []
+        for info in members:
+            name = f"{filename}/{info.filename}"
+            if info.file_size > MAX_FILE_SIZE:
+                entries.append({"filename": name, "error": "File too large. Max size: 10MB"})
+                continue
+            try:
+                member = archive.read(info)
+            except (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error) as e:
+                # Encrypted members, unsupported compression methods, corrupt data
+                logger.warning(f"Cannot read zip member {name}: {type(e).__name__}: {e}")
+                entries.append({"filename": name, "error": "Unreadable zip member (encrypted, unsupported compression or corrupt)"})
+                continue
+            content_type = sniff_content_type(member[:16])
+            if content_type not in ALLOWED_CONTENT_TYPES:
+                entries.append({"filename": name, "error": f"Invalid file type: {content_type or 'unknown'}"})
+                continue
+            entries.append({"filename": name, "content_type": content_type, "contents": member, "hash": hash_content(member)})
+    return entries
+
+
+@app.post("/analyze/batch")
+@limiter.limit("5/minute")
+async def analyze_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    parallelism: int = BATCH_MAX_PARALLEL,
+    matching: str = ROOM_MATCHING,
+    api_key: str = Depends(get_api_key),
+):
+    """
+    Analyze many floor plans (files and/or zips of files) in one request.
+
+    Files are analyzed concurrently (at most `parallelism` at a time, capped by
+    BATCH_MAX_PARALLEL) and results are streamed back as newline-delimited JSON
+    in completion order, one line per file, followed by a summary line.
+    `matching` selects the room/area matching mode for every file.
+    """
+    validate_matching_mode(matching)
+    if not (_documentai_available or documentai_async_ready()):
+        raise HTTPException(status_code=503, detail="Document AI unavailable for batch analysis")
+
+    # 1. Collect entries, validating each file independently (types are sniffed, not trusted)
+    entries = []
+    for file in files:
+        upload = await read_upload(file, BATCH_MAX_BODY_SIZE)
+        if upload.content_type in ZIP_CONTENT_TYPES:
+            try:
+                entries.extend(expand_zip_upload(file.filename, upload.contents, BATCH_MAX_FILES - len(entries)))
+            except zipfile.BadZipFile:
+                entries.append({"filename": file.filename, "error": "Invalid zip archive"})
+        elif upload.content_type not in ALLOWED_CONTENT_TYPES:
+            entries.append({"filename": file.filename, "error": f"Invalid file type: {upload.content_type or 'unknown'}"})
+        elif upload.size > MAX_FILE_SIZE:
+            entries.append({"filename": file.filename, "error": "File too large. Max size: 10MB"})
+        else:
+            entries.append({
+                "filename": file.filename,
+                "content_type": upload.content_type,
+                "contents": upload.contents,
+                "hash": upload.content_hash,
+            })
+
+    if len(entries) > BATCH_MAX_FILES:
         raise HTTPException(
             status_code=413,
-            detail=f"File too large ({len(contents)} bytes). Max size: 10MB"
+            detail=f"Too many files ({len(entries)}). Max per batch: {BATCH_MAX_FILES}"
         )
 
-    logger.info(f"Analyzing file: {file.filename} ({len(contents)} bytes)")
+    limit = max(1, min(parallelism, BATCH_MAX_PARALLEL))
+    semaphore = asyncio.Semaphore(limit)
+    logger.info(f"Batch analysis of {len(entries)} files (parallelism {limit})")
+
+    # Identical files (same content hash) in one batch are analyzed once
+    analyses = {}
+
+    async def run_analysis(entry: dict) -> dict:
+        async with semaphore:
+            return await analyze_floor_plan_deterministic(entry["contents"], entry["content_type"], entry["hash"], matching=matching)
+
+    async def analyze_entry(index: int, entry: dict) -> dict:
+        line = {"index": index, "filename": entry["filename"]}
+        if "error" in entry:
+            return {**line, "status": "error", "error": entry["error"]}
+        key = (entry["hash"], entry["content_type"])
+        if key not in analyses:
+            analyses[key] = asyncio.ensure_future(run_analysis(entry))
+        started = time.perf_counter()
+        try:
+            result = await asyncio.shield(analyses[key])
+        except Exception as e:
+            logger.error(f"Batch item {entry['filename']} failed: {type(e).__name__}: {e}")
+            return {**line, "status": "error", "error": "Analysis failed"}
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        return {**line, "status": "ok", "elapsedMs": elapsed_ms, "result": result}
+
+    async def stream_results():
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(analyze_entry(i, entry)) for i, entry in enumerate(entries)]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                if line["status"] != "ok":
+                    failed += 1
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "done": True,
+                "count": len(entries),
+                "failed": failed,
+                "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+            }) + "\n"
+        finally:
+            # Client went away mid-stream: stop any analyses still running
+            for task in tasks + list(analyses.values()):
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.post("/analyze/jobs", status_code=202)
+@limiter.limit("20/minute")
+async def create_analysis_job(
+    request: Request,
+    file: UploadFile = File(...),
+    projectId: str = Form(None),
+    api_key: str = Depends(get_api_key),
+):
+    """
+    Queue a floor plan for background analysis.
 
-    # 4. Process - Use Document AI (deterministic) if available, else Gemini (fallback)
-    if _documentai_available:
-        logger.info("Using Document AI OCR for deterministic analysis")
-        result = await analyze_floor_plan_deterministic(contents, file.content_type)
-    else:
-        logger.info("Document AI not available, falling back to Gemini")
-        result = await analyze_image_with_gemini(contents, file.content_type)
+    Returns a job ID immediately; poll GET /analyze/jobs/{job_id} for progress
+    (queued -> started -> ocr_done -> rooms_parsed -> priced -> completed).
+    """
+    if not (_documentai_available or documentai_async_ready()):
+        raise HTTPException(status_code=503, detail="Document AI unavailable for background analysis")
+    upload = await read_upload(file, MAX_FILE_SIZE, ALLOWED_CONTENT_TYPES)
+
+    try:
+        job = await job_queue.submit(upload.contents, upload.content_type, file.filename, upload.content_hash, projectId)
+    except QueueFullError as e:
+        logger.warning(f"Analysis job rejected: {e}")
+        raise HTTPException(status_code=503, detail="Analysis queue is full, retry shortly")
+
+    logger.info(f"Queued analysis job {job['id']} for {file.filename}")
+    return {"jobId": job["id"], "status": job["status"], "statusUrl": f"/analyze/jobs/{job['id']}"}
 
-    return result
+
+@app.get("/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: str, api_key: str = Depends(get_api_key)):
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 @app.post("/debug-ocr")
 @limiter.limit("10/minute")
-async def debug_ocr(request: Request, file: UploadFile = File(...), api_key: str = Depends(get_api_key)):
+async def debug_ocr(request: Request, response: Response, file: UploadFile = File(...), api_key: str = Depends(get_api_key)):
     """Debug endpoint to see raw OCR text blocks from Document AI."""
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
-        raise HTTPException(status_code=400, detail=f"Invalid file type")
-
-    contents = await file.read()
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail="File too large")
+    upload = await read_upload(file, MAX_FILE_SIZE, ALLOWED_CONTENT_TYPES)
 
-    # Get raw text blocks
-    from ocr_service import extract_text_with_bounding_boxes
-    full_text, text_blocks = extract_text_with_bounding_boxes(contents, file.content_type)
+    # Get raw text blocks (repeat uploads are served from the OCR cache)
+    from ocr_service import extract_text_with_bounding_boxes_cached
+    full_text, text_blocks, ocr_cache_status = await run_blocking(
+        "documentai", extract_text_with_bounding_boxes_cached, upload.contents, upload.content_type, upload.content_hash
+    )
+    response.headers["X-OCR-Cache"] = ocr_cache_status
 
     # Filter to show potential area values (anything with numbers)
     import re
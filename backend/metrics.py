@@ -0,0 +1,207 @@
+"""
+Metrics Module
+==============
+Prometheus metrics for the API, served in text format on GET /metrics.
+
+Covers per-route request latency and counts, in-flight requests, pipeline
+stage durations (see timing.py), outbound call latency and errors for
+Document AI, Gemini and Firestore, cache hits/misses and rate-limit
+rejections.
+
+The collector is sharded per thread: each thread updates only its own
+shard, so recording a sample takes no lock (the GIL makes the dict/list
+updates safe). A scrape sums the shards. Locks are taken only when a
+thread records its first sample for a metric. Values are per process;
+with several gunicorn workers, each worker reports its own series.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+# Latency bucket upper bounds in seconds (+Inf implied)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """Base for a labelled metric whose samples live in per-thread shards."""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def _snapshots(self) -> List[Dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]  # dict.copy() is atomic under the GIL
+
+    def _labels(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests or errors."""
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(labels)} {value}" for labels, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. in-flight requests. inc/dec may happen on different threads."""
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations (seconds by default)."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            # Per-bucket (non-cumulative) counts, +Inf bucket, then the sum
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def values(self) -> Dict[Tuple[str, ...], List]:
+        """{labels: [cumulative bucket counts..., total count, sum]}"""
+        merged: Dict[Tuple[str, ...], List] = {}
+        for shard in self._snapshots():
+            for labels, counts in shard.items():
+                counts = list(counts)
+                total = merged.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+                for idx, value in enumerate(counts):
+                    total[idx] += value
+        for total in merged.values():
+            for idx in range(1, len(self.buckets) + 1):
+                total[idx] += total[idx - 1]
+        return merged
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels, counts in sorted(self.values().items()):
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._labels(labels, le)} {counts[-2]}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {counts[-2]}")
+        return lines
+
+
+class Registry:
+    """Metrics in registration order."""
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "kgvilla_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+HTTP_LATENCY = registry.register(Histogram(
+    "kgvilla_http_request_duration_seconds", "HTTP request latency until the response body is sent.", ("method", "route")))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "kgvilla_http_requests_in_flight", "HTTP requests currently being handled."))
+STAGE_DURATION = registry.register(Histogram(
+    "kgvilla_stage_duration_seconds", "Duration of analysis pipeline stages.", ("stage",)))
+EXTERNAL_LATENCY = registry.register(Histogram(
+    "kgvilla_external_call_duration_seconds", "Outbound call latency (Document AI, Gemini, Firestore).", ("service", "operation")))
+EXTERNAL_ERRORS = registry.register(Counter(
+    "kgvilla_external_call_errors_total", "Outbound calls that raised.", ("service", "operation")))
+CACHE_REQUESTS = registry.register(Counter(
+    "kgvilla_cache_requests_total", "Cache lookups by result (hit ratio = hit / all).", ("cache", "result")))
+RATE_LIMITED = registry.register(Counter(
+    "kgvilla_rate_limited_total", "Requests rejected by the rate limiter.", ("route",)))
+
+
+@contextmanager
+def observe_call(service: str, operation: str) -> Iterator[None]:
+    """Time an outbound call; count it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_ERRORS.inc(service, operation)
+        raise
+    finally:
+        EXTERNAL_LATENCY.observe(time.perf_counter() - started, service, operation)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def render_metrics() -> str:
+    return registry.render()
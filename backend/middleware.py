@@ -1,41 +1,165 @@
 import time
 import uuid
 import logging
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
+from typing import Dict
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from timing import start_request_timings
+from metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+from logging_config import request_id_var
 
 logger = logging.getLogger("api")
 
-class StructuredLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+
+class StructuredLoggingMiddleware:
+    """
+    Pure ASGI access logging with request IDs.
+
+    Assigns each request an ID (request.state.request_id, the X-Request-ID
+    response header and the request_id contextvar picked up by every log
+    record), starts stage timing for the Server-Timing header, and writes one
+    structured access log line when the response has been sent in full.
+    Unlike BaseHTTPMiddleware it runs the app in the same task and passes the
+    response stream through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         request_id = str(uuid.uuid4())
-        start_time = time.time()
-        
-        # Add request ID to request state for access in endpoints
-        request.state.request_id = request_id
-        
-        response = await call_next(request)
-        
-        process_time = (time.time() - start_time) * 1000
-        
-        log_data = {
-            "request_id": request_id,
-            "method": request.method,
-            "path": request.url.path,
-            "status_code": response.status_code,
-            "process_time_ms": round(process_time, 2),
-            "client_ip": request.client.host if request.client else None
-        }
-        
-        # Log level based on status
-        if response.status_code >= 500:
-            logger.error(str(log_data))
-        elif response.status_code >= 400:
-            logger.warning(str(log_data))
-        else:
-            logger.info(str(log_data))
-            
-        # Add Request-ID header to response
-        response.headers["X-Request-ID"] = request_id
-        
-        return response
+        # Starlette's request.state reads from scope["state"]
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = request_id_var.set(request_id)
+
+        # Pipeline stages (timing.span) run in this context and report here
+        timings = start_request_timings()
+        start_time = time.perf_counter()
+        status_code = 500  # If the app raises before starting a response
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", request_id)
+                # Stages finished before the response started (a streamed body's later stages go to /metrics only)
+                if timings is not None and timings.spans:
+                    headers.append("Server-Timing", timings.server_timing_header())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            process_time = (time.perf_counter() - start_time) * 1000
+            client = scope.get("client")
+            log_data = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status_code,
+                "process_time_ms": round(process_time, 2),
+                "client_ip": client[0] if client else None,
+            }
+            if timings is not None and timings.spans:
+                log_data["timings_ms"] = timings.as_dict()
+
+            # Log level based on status
+            message = f"{scope['method']} {scope['path']} {status_code} {log_data['process_time_ms']}ms"
+            if status_code >= 500:
+                logger.error(message, extra=log_data)
+            elif status_code >= 400:
+                logger.warning(message, extra=log_data)
+            else:
+                logger.info(message, extra=log_data)
+            request_id_var.reset(token)
+
+
+class RequestBodyTooLarge(HTTPException):
+    """Raised while reading a request body that exceeds its route's limit."""
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body too large. Max size: {limit // (1024 * 1024)}MB")
+
+
+class BodySizeLimitMiddleware:
+    """
+    Pure ASGI middleware capping request body size per path.
+
+    Requests with a Content-Length over the limit are rejected before any body
+    is read. Chunked or mislabelled bodies are counted as they arrive and
+    aborted with 413 as soon as the limit is crossed, so an oversized upload is
+    never spooled in full.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": RequestBodyTooLarge(limit).detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside request.form(); FastAPI passes HTTPExceptions through as-is
+                    raise RequestBodyTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request count, latency and in-flight requests.
+
+    Requests are labelled with the matched route template (e.g.
+    /projects/{project_id}), read back from the scope after routing, so path
+    parameters never create new series. Latency runs until the last body
+    chunk is sent, so streamed responses are measured in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # If the app raises before starting a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_LATENCY.observe(time.perf_counter() - started, scope["method"], route)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
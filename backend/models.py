@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional, Union, Literal
 
@@ -137,3 +138,4 @@ class Project(BaseModel):
     totalArea: Optional[float] = None
     boa: Optional[float] = None       # Living area (BOA)
     biarea: Optional[float] = None    # Secondary area (Biarea)
+    updatedAt: Optional[datetime] = None  # Set by the server on save; orders GET /projects
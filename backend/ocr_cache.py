@@ -0,0 +1,304 @@
+"""
+OCR Cache Module
+================
+Content-addressed cache for Document AI results.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus the MIME type and
+processor ID, so re-uploading the same floor plan never triggers a second OCR
+round trip. The cache is tiered:
+
+1. An in-process LRU bounded by approximate payload size (always on)
+2. An optional persistent tier on local disk or in Firestore
+
+Configuration (environment):
+- OCR_CACHE_ENABLED:    "false" disables caching entirely (default: true)
+- OCR_CACHE_MAX_BYTES:  memory tier budget in bytes (default: 64MB)
+- OCR_CACHE_BACKEND:    persistent tier: "none", "disk" or "firestore" (default: none)
+- OCR_CACHE_DIR:        directory for the disk tier
+- OCR_CACHE_COLLECTION: Firestore collection for the firestore tier
+"""
+import os
+import json
+import zlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional
+
+from metrics import observe_call, record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# (full_text, text_blocks) as returned by extract_text_with_bounding_boxes
+OCRResult = Tuple[str, List[Dict]]
+
+OCR_CACHE_ENABLED = os.environ.get("OCR_CACHE_ENABLED", "true").lower() != "false"
+OCR_CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+OCR_CACHE_BACKEND = os.environ.get("OCR_CACHE_BACKEND", "none").lower()
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", "/tmp/kgvilla-ocr-cache")
+OCR_CACHE_COLLECTION = os.environ.get("OCR_CACHE_COLLECTION", "ocr_cache")
+
+# Rough per-block overhead of a text block dict (keys, floats, dict header)
+_BLOCK_OVERHEAD_BYTES = 400
+
+
+def hash_content(content: bytes) -> str:
+    """SHA-256 hex digest of the uploaded file bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def make_cache_key(content_hash: str, mime_type: str, processor_id: Optional[str]) -> str:
+    """
+    Build the cache key for an OCR result.
+
+    The same bytes processed by a different processor (or declared with a
+    different MIME type) can produce different output, so both are part of the key.
+    """
+    raw = f"{content_hash}:{mime_type}:{processor_id or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def estimate_size(result: OCRResult) -> int:
+    """Approximate in-memory footprint of an OCR result in bytes."""
+    full_text, text_blocks = result
+    size = len(full_text.encode("utf-8"))
+    for block in text_blocks:
+        size += len(block.get("text", "")) + _BLOCK_OVERHEAD_BYTES
+    return size
+
+
+def _serialize(result: OCRResult) -> bytes:
+    full_text, text_blocks = result
+    payload = json.dumps({"text": full_text, "blocks": text_blocks}, ensure_ascii=False)
+    return zlib.compress(payload.encode("utf-8"))
+
+
+def _deserialize(blob: bytes) -> OCRResult:
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    return payload["text"], payload["blocks"]
+
+
+# --- Backends ---
+
+class OCRCacheBackend:
+    """Interface for a cache tier. Implementations must be thread-safe."""
+    name = "base"
+
+    def get(self, key: str) -> Optional[OCRResult]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: OCRResult) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryLRUBackend(OCRCacheBackend):
+    """In-process LRU evicting least recently used entries once max_bytes is exceeded."""
+    name = "memory"
+
+    def __init__(self, max_bytes: int = OCR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[OCRResult, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[OCRResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: OCRResult) -> None:
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logger.info(f"OCR result ({size} bytes) exceeds memory cache budget, not cached")
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskBackend(OCRCacheBackend):
+    """Stores each entry as a compressed JSON file named after its key."""
+    name = "disk"
+
+    def __init__(self, directory: str = OCR_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.z")
+
+    def get(self, key: str) -> Optional[OCRResult]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return _deserialize(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"OCR disk cache read failed for {key[:12]}: {e}")
+            return None
+
+    def set(self, key: str, value: OCRResult) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_serialize(value))
+            os.replace(tmp_path, path)  # Atomic - readers never see partial files
+        except Exception as e:
+            logger.warning(f"OCR disk cache write failed for {key[:12]}: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class FirestoreBackend(OCRCacheBackend):
+    """
+    Stores entries in a Firestore collection shared by all instances.
+
+    Payloads are zlib-compressed to stay well below the 1MB document limit.
+    """
+    name = "firestore"
+
+    def __init__(self, collection: str = OCR_CACHE_COLLECTION, client=None):
+        if client is None:
+            from google.cloud import firestore
+            client = firestore.Client(project=os.environ.get("GOOGLE_CLOUD_PROJECT", "kgvilla"))
+        self.collection = client.collection(collection)
+
+    def get(self, key: str) -> Optional[OCRResult]:
+        try:
+            with observe_call("firestore", "ocr_cache_get"):
+                doc = self.collection.document(key).get()
+            if not doc.exists:
+                return None
+            return _deserialize(doc.to_dict()["payload"])
+        except Exception as e:
+            logger.warning(f"OCR Firestore cache read failed for {key[:12]}: {e}")
+            return None
+
+    def set(self, key: str, value: OCRResult) -> None:
+        try:
+            with observe_call("firestore", "ocr_cache_set"):
+                self.collection.document(key).set({"payload": _serialize(value)})
+        except Exception as e:
+            logger.warning(f"OCR Firestore cache write failed for {key[:12]}: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            with observe_call("firestore", "ocr_cache_delete"):
+                self.collection.document(key).delete()
+        except Exception as e:
+            logger.warning(f"OCR Firestore cache delete failed for {key[:12]}: {e}")
+
+
+# --- Tiered Cache ---
+
+class OCRCache:
+    """
+    Read-through over an ordered list of tiers (fastest first).
+
+    A hit in a slower tier is promoted into every faster tier.
+    """
+
+    def __init__(self, tiers: List[OCRCacheBackend]):
+        self.tiers = tiers
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def is_memory_only(self) -> bool:
+        """True when no tier does blocking I/O."""
+        return all(isinstance(tier, MemoryLRUBackend) for tier in self.tiers)
+
+    def get(self, key: str) -> Optional[OCRResult]:
+        for idx, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:idx]:
+                    faster.set(key, value)
+                with self._stats_lock:
+                    self.hits += 1
+                record_cache_lookup("ocr", hit=True)
+                return value
+        with self._stats_lock:
+            self.misses += 1
+        record_cache_lookup("ocr", hit=False)
+        return None
+
+    def set(self, key: str, value: OCRResult) -> None:
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def delete(self, key: str) -> None:
+        for tier in self.tiers:
+            tier.delete(key)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "tiers": [tier.name for tier in self.tiers],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def build_cache_from_env() -> Optional[OCRCache]:
+    """Create the OCR cache described by the OCR_CACHE_* environment variables."""
+    if not OCR_CACHE_ENABLED:
+        return None
+
+    tiers: List[OCRCacheBackend] = [MemoryLRUBackend(OCR_CACHE_MAX_BYTES)]
+    try:
+        if OCR_CACHE_BACKEND == "disk":
+            tiers.append(DiskBackend(OCR_CACHE_DIR))
+        elif OCR_CACHE_BACKEND == "firestore":
+            tiers.append(FirestoreBackend(OCR_CACHE_COLLECTION))
+    except Exception as e:
+        logger.warning(f"OCR cache backend '{OCR_CACHE_BACKEND}' unavailable, using memory only: {e}")
+
+    logger.info(f"OCR cache enabled with tiers: {[t.name for t in tiers]}")
+    return OCRCache(tiers)
+
+
+# Singleton Cache Instance
+_cache = None
+_cache_initialized = False
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """Return the process-wide OCR cache, or None if caching is disabled."""
+    global _cache, _cache_initialized
+    if not _cache_initialized:
+        with _cache_lock:
+            if not _cache_initialized:
+                _cache = build_cache_from_env()
+                _cache_initialized = True
+    return _cache
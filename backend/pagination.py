@@ -0,0 +1,162 @@
+"""
+Pagination Module
+=================
+Cursor pagination for Firestore listings.
+
+Pages are ordered by updatedAt (newest first), then by document ID, and each
+page starts after the last document of the previous one. The cursor goes to
+the client as an opaque token (URL-safe base64 of that sort key), so a page
+costs `limit` document reads however many documents exist. Offsets would be
+billed for every skipped document.
+
+List views can ask for a subset of fields; only those are read (a Firestore
+projection), plus id and updatedAt, which the cursor needs.
+
+Firestore leaves documents without updatedAt out of an ordered query, so
+documents saved before the field existed are stamped with their Firestore
+update time. The repository does this on the first listing in each process,
+unless a marker in the `migrations` collection says it already ran. It can
+also be run by hand:
+
+    python pagination.py --backfill projects
+
+Configuration (environment):
+- PROJECT_PAGE_SIZE: page size of GET /projects?pageToken= without ?limit= (default: 50)
+- PROJECT_PAGE_MAX:  largest page a client may ask for (default: 200)
+"""
+import os
+import sys
+import json
+import base64
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROJECT_PAGE_SIZE = int(os.environ.get("PROJECT_PAGE_SIZE", "50"))
+PROJECT_PAGE_MAX = int(os.environ.get("PROJECT_PAGE_MAX", "200"))
+
+ORDER_FIELD = "updatedAt"
+CURSOR_FIELDS = ("id", ORDER_FIELD)
+BATCH_WRITE_LIMIT = 500  # Firestore's cap on writes per batch
+MIGRATIONS_COLLECTION = "migrations"
+
+
+class PaginationError(ValueError):
+    """A page token this API did not issue, or an unknown field in the projection."""
+
+
+def encode_page_token(updated_at: datetime, doc_id: str) -> str:
+    raw = json.dumps([updated_at.isoformat(), doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_page_token(token: str) -> Tuple[datetime, str]:
+    """(updatedAt, document ID) of the last document of the previous page."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        updated_at, doc_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), str(doc_id)
+    except (ValueError, TypeError) as e:
+        raise PaginationError(f"Invalid page token: {e}")
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Comma-separated field list → projection (None for all fields)."""
+    if not fields:
+        return None
+    allowed = list(allowed)
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown field {', '.join(unknown)}. Valid: {', '.join(allowed)}")
+    return list(dict.fromkeys([*CURSOR_FIELDS, *requested]))
+
+
+def _to_json(data: Dict) -> Dict:
+    updated_at = data.get(ORDER_FIELD)
+    if isinstance(updated_at, datetime):
+        data[ORDER_FIELD] = updated_at.isoformat()
+    return data
+
+
+def page_query(query, limit: int, page_token: Optional[str] = None, fields: Optional[List[str]] = None):
+    """
+    A collection (or query) ordered newest first, positioned after page_token.
+    Works on sync and async Firestore queries alike. Asks for limit + 1
+    documents to know whether there is a next page.
+    """
+    from google.cloud import firestore
+
+    query = query.order_by(ORDER_FIELD, direction=firestore.Query.DESCENDING).order_by(
+        "__name__", direction=firestore.Query.DESCENDING
+    )
+    if fields is not None:
+        query = query.select(fields)
+    if page_token:
+        updated_at, doc_id = decode_page_token(page_token)
+        query = query.start_after({ORDER_FIELD: updated_at, "__name__": doc_id})
+    return query.limit(limit + 1)
+
+
+def page_from_docs(docs: List, limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """
+    (documents as JSON-ready dicts, token of the next page or None on the
+    last page) from the snapshots a page_query returned.
+    """
+    page, more = docs[:limit], len(docs) > limit
+    next_token = None
+    if more:
+        last = page[-1]
+        next_token = encode_page_token(last.get(ORDER_FIELD), last.id)
+    return [_to_json(doc.to_dict()) for doc in page], next_token
+
+
+def backfill_marker(collection_name: str) -> str:
+    """ID of the document in MIGRATIONS_COLLECTION recording that collection_name was backfilled."""
+    return f"{collection_name}.{ORDER_FIELD}"
+
+
+def backfill_stamp(snapshot) -> datetime:
+    """updatedAt for an unstamped document: its Firestore update time, which keeps the old documents' order."""
+    return snapshot.update_time or datetime.now(timezone.utc)
+
+
+def backfill_updated_at(client, collection_name: str) -> int:
+    """Stamp documents that have no updatedAt (one full scan). Returns how many were updated."""
+    collection = client.collection(collection_name)
+    batch, pending, updated = client.batch(), 0, 0
+    for doc in collection.select([ORDER_FIELD]).stream():
+        if doc.to_dict().get(ORDER_FIELD) is not None:
+            continue
+        batch.update(doc.reference, {ORDER_FIELD: backfill_stamp(doc)})
+        pending += 1
+        if pending == BATCH_WRITE_LIMIT:
+            batch.commit()
+            updated += pending
+            batch, pending = client.batch(), 0
+    if pending:
+        batch.commit()
+        updated += pending
+    client.collection(MIGRATIONS_COLLECTION).document(backfill_marker(collection_name)).set(
+        {"stamped": updated, "at": datetime.now(timezone.utc)}
+    )
+    return updated
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", metavar="COLLECTION", required=True, help="collection to stamp with updatedAt")
+    args = parser.parse_args()
+
+    from repository import create_client
+
+    count = backfill_updated_at(create_client(), args.backfill)
+    print(f"Stamped {count} documents in {args.backfill} with {ORDER_FIELD}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,254 @@
+"""
+Price Book Module
+=================
+Versioned price books, loaded from a file or Firestore and swapped at runtime.
+
+A price book document overrides any subset of the built-in price data: the
+PRICING table, the JB_EFFICIENCY table and the PriceReference source records
+(by constant name). Everything it leaves out keeps its built-in value:
+
+    {
+      "version": "2026-01",
+      "pricing": {"foundation_per_m2": 3700, "flooring": {"kitchen": 1700}},
+      "efficiency": {"contingency_pct": {"jb_villan": 0.05}},
+      "references": {"FOUNDATION_PER_M2": {"value": 3700, "market_range_high": 4800}}
+    }
+
+Loading validates the overrides against the built-in shapes (unknown keys,
+wrong types and negative prices are rejected, keeping the active book) and
+compiles the result into an immutable PriceBook whose line item table has
+every price resolved. Activation is a single reference swap: estimates read
+the active book once, so one estimate never mixes versions.
+
+The source is polled in a background thread when PRICE_BOOK_RELOAD_SECONDS
+is set; POST /price-book/reload reloads on demand.
+
+Configuration (environment):
+- PRICE_BOOK_SOURCE:         "builtin" (default), "file" or "firestore"
+- PRICE_BOOK_PATH:           JSON file for the file source
+- PRICE_BOOK_COLLECTION:     Firestore collection for the firestore source (document "active")
+- PRICE_BOOK_RELOAD_SECONDS: poll interval for changes, 0 disables polling (default: 0)
+"""
+import os
+import json
+import math
+import logging
+import threading
+import dataclasses
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from metrics import observe_call
+from pricing_engine import (
+    JB_EFFICIENCY, PRICE_REFERENCES, PRICING, PriceBook, activate_price_book, compile_price_book, current_price_book,
+)
+from standards.pricing_references_2025 import PriceReference
+
+logger = logging.getLogger(__name__)
+
+PRICE_BOOK_PATH = os.environ.get("PRICE_BOOK_PATH", "")
+PRICE_BOOK_SOURCE = os.environ.get("PRICE_BOOK_SOURCE", "file" if PRICE_BOOK_PATH else "builtin").lower()
+PRICE_BOOK_COLLECTION = os.environ.get("PRICE_BOOK_COLLECTION", "price_books")
+PRICE_BOOK_RELOAD_SECONDS = float(os.environ.get("PRICE_BOOK_RELOAD_SECONDS", "0"))
+
+_REFERENCE_FIELDS = {f.name for f in dataclasses.fields(PriceReference)}
+
+
+class PriceBookError(ValueError):
+    """A price book document that cannot be loaded (bad JSON, unknown key, invalid value)."""
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _merge(base: Mapping, overrides: Any, path: str) -> Dict:
+    """base with overrides applied, checked key by key against base's shape."""
+    if not isinstance(overrides, dict):
+        raise PriceBookError(f"{path} must be an object")
+    merged = dict(base)
+    for key, value in overrides.items():
+        where = f"{path}.{key}"
+        if key not in base:
+            raise PriceBookError(f"Unknown price book entry {where}")
+        current = base[key]
+        if isinstance(current, Mapping):
+            merged[key] = _merge(current, value, where)
+        elif _is_number(current):
+            if not _is_number(value) or value < 0:
+                raise PriceBookError(f"{where} must be a non-negative number")
+            merged[key] = value
+        elif not isinstance(value, str):
+            raise PriceBookError(f"{where} must be a string")
+        else:
+            merged[key] = value
+    return merged
+
+
+def _merge_references(overrides: Any) -> Dict:
+    if not isinstance(overrides, dict):
+        raise PriceBookError("references must be an object")
+    references = dict(PRICE_REFERENCES)
+    for name, fields in overrides.items():
+        if name not in references:
+            raise PriceBookError(f"Unknown price reference {name}")
+        if not isinstance(fields, dict):
+            raise PriceBookError(f"references.{name} must be an object")
+        for field_name, value in fields.items():
+            where = f"references.{name}.{field_name}"
+            if field_name not in _REFERENCE_FIELDS:
+                raise PriceBookError(f"Unknown price reference field {where}")
+            if field_name in ("value", "market_range_low", "market_range_high"):
+                if not ((value is None and field_name != "value") or (_is_number(value) and value >= 0)):
+                    raise PriceBookError(f"{where} must be a non-negative number")
+            elif not (value is None and field_name == "notes") and not isinstance(value, str):
+                raise PriceBookError(f"{where} must be a string")
+        references[name] = dataclasses.replace(references[name], **fields)
+    return references
+
+
+def parse_price_book(document: Any) -> PriceBook:
+    """Validate a price book document and compile it over the built-in prices."""
+    if not isinstance(document, dict):
+        raise PriceBookError("A price book must be a JSON object")
+    unknown = set(document) - {"version", "pricing", "efficiency", "references"}
+    if unknown:
+        raise PriceBookError(f"Unknown price book section {', '.join(sorted(unknown))}")
+    version = document.get("version")
+    if not isinstance(version, str) or not version.strip():
+        raise PriceBookError("A price book needs a non-empty string version")
+    return compile_price_book(
+        version.strip(),
+        _merge(PRICING, document.get("pricing", {}), "pricing"),
+        _merge(JB_EFFICIENCY, document.get("efficiency", {}), "efficiency"),
+        _merge_references(document.get("references", {})),
+    )
+
+
+class FilePriceBookSource:
+    """A JSON file; its modification time and size tell whether it changed."""
+    name = "file"
+
+    def __init__(self, path: str = PRICE_BOOK_PATH):
+        self.path = path
+
+    def fetch(self, fingerprint: Optional[str]) -> Optional[Tuple[str, Any]]:
+        """(fingerprint, document), or None if unchanged since fingerprint."""
+        stat = os.stat(self.path)
+        current = f"{stat.st_mtime_ns}:{stat.st_size}"
+        if current == fingerprint:
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return current, json.load(f)
+        except json.JSONDecodeError as e:
+            raise PriceBookError(f"Invalid JSON in {self.path}: {e}")
+
+
+class FirestorePriceBookSource:
+    """Document "active" of a Firestore collection; its update time tells whether it changed."""
+    name = "firestore"
+
+    def __init__(self, collection: str = PRICE_BOOK_COLLECTION, client=None):
+        if client is None:
+            from repository import create_client
+            client = create_client()
+        self.document = client.collection(collection).document("active")
+
+    def fetch(self, fingerprint: Optional[str]) -> Optional[Tuple[str, Any]]:
+        with observe_call("firestore", "get_price_book"):
+            doc = self.document.get()
+        if not doc.exists:
+            raise PriceBookError("No active price book document in Firestore")
+        current = str(doc.update_time)
+        if current == fingerprint:
+            return None
+        return current, doc.to_dict()
+
+
+class PriceBookLoader:
+    """
+    Loads price books from a source into the pricing engine.
+
+    reload() never lets a bad document through: on any error the active book
+    stays and the error is logged and re-raised (the poller only logs it).
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+        self.fingerprint: Optional[str] = None
+        self.loaded_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def reload(self) -> bool:
+        """Fetch the source and activate it if it changed. Returns whether a new book was activated."""
+        if self.source is None:
+            return False
+        with self._lock:
+            try:
+                fetched = self.source.fetch(self.fingerprint)
+                if fetched is None:
+                    return False
+                fingerprint, document = fetched
+                book = parse_price_book(document)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Price book reload from {self.source.name} failed, keeping {current_price_book().version}: {e}")
+                raise
+            self.fingerprint = fingerprint
+            self.last_error = None
+            previous = current_price_book()
+            if book.checksum == previous.checksum and book.version == previous.version:
+                return False
+            activate_price_book(book)
+            self.loaded_at = datetime.now(timezone.utc).isoformat()
+            logger.info(f"Activated price book {book.version} ({book.checksum}), was {previous.version}")
+            return True
+
+    def status(self) -> Dict:
+        return {
+            **current_price_book().describe(),
+            "source": self.source.name if self.source is not None else "builtin",
+            "loadedAt": self.loaded_at,
+            "lastError": self.last_error,
+        }
+
+    def start_polling(self, interval: float = PRICE_BOOK_RELOAD_SECONDS) -> None:
+        """Poll the source every interval seconds in a daemon thread (no-op for 0 or no source)."""
+        if self.source is None or interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, args=(interval,), name="price-book-reload", daemon=True)
+        self._thread.start()
+
+    def stop_polling(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _poll(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.reload()
+            except Exception:
+                pass  # Logged by reload(); keep the active book and try again next interval
+
+
+def build_loader_from_env(firestore_client=None) -> PriceBookLoader:
+    """Loader for PRICE_BOOK_SOURCE (builtin, file or firestore)."""
+    if PRICE_BOOK_SOURCE == "file" and PRICE_BOOK_PATH:
+        return PriceBookLoader(FilePriceBookSource(PRICE_BOOK_PATH))
+    if PRICE_BOOK_SOURCE == "firestore":
+        try:
+            return PriceBookLoader(FirestorePriceBookSource(PRICE_BOOK_COLLECTION, firestore_client))
+        except Exception as e:
+            logger.error(f"Firestore price book source unavailable, using the built-in prices: {e}")
+            return PriceBookLoader()
+    if PRICE_BOOK_SOURCE not in ("builtin", "file"):
+        logger.warning(f"Unknown PRICE_BOOK_SOURCE '{PRICE_BOOK_SOURCE}', using the built-in prices")
+    return PriceBookLoader()
+
@@ -0,0 +1,1223 @@
+"""
+Pricing Engine Module
+=====================
+Table-driven deterministic pricing for analyzed floor plans.
+
+Every line item an estimate can contain is declared once, in order, by
+build_line_items(): its texts, unit price, price source and efficiency
+block are resolved when the table is built, and its quantity, inclusion
+condition and quantity breakdown are named rules looked up in a pricing
+context computed in one pass over the rooms.
+
+A PriceBook is that table compiled for one version of the prices. The
+built-in tables below are the "builtin" book; price_book.py loads other
+versions and swaps the active book at runtime.
+
+price_items() returns plain dicts shaped exactly like CostItem.model_dump(),
+which is what the API responds with. calculate_pricing() validates them into
+CostItem models for callers that need the models.
+"""
+import json
+import string
+import hashlib
+from types import MappingProxyType
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple, Union
+
+from models import CostItem, PrefabDiscount, PriceSource
+from standards import pricing_references_2025
+from standards.pricing_references_2025 import PriceReference
+
+
+# Helper function to convert PriceReference to PriceSource for CostItem
+def make_price_source(price_ref) -> PriceSource:
+    """Convert a PriceReference from pricing_references_2025.py to a PriceSource for CostItem."""
+    return PriceSource(
+        sourceName=price_ref.source_name,
+        sourceUrl=price_ref.source_url,
+        verificationDate=price_ref.verification_date,
+        marketRangeLow=price_ref.market_range_low,
+        marketRangeHigh=price_ref.market_range_high,
+        notes=price_ref.notes
+    )
+
+# Roof slope factor for pitched roofs
+# JB Villan uses 22° (1:2.5 ratio) as their standard pitch for single-family homes.
+# This is optimal for:
+# - Snow shedding: Steep enough for Swedish winters
+# - Attic space: Shallow enough for usable storage/attic
+# - Aesthetics: Traditional Swedish villa appearance
+# - Factory efficiency: Standardized truss design for prefab assembly
+# Formula: slope_factor = 1/cos(pitch_angle)
+# 1/cos(22°) = 1/0.927 ≈ 1.08
+ROOF_PITCH_DEGREES = 22
+ROOF_SLOPE_FACTOR = 1.08
+
+
+# --- Pricing Database (Sweden 2025) ---
+# All prices in SEK, include materials + labor
+# Source references: see backend/standards/pricing_references_2025.py
+# Last verified: 2025-11
+# Primary sources: byggstart.se, bygglov.se, husexperter.se, greenmatch.se
+PRICING = {
+    # Per m² rates by room type
+    "flooring": {
+        "bedroom": 850,      # Parquet
+        "living": 850,       # Parquet
+        "kitchen": 1600,     # Tile
+        "bathroom": 1600,    # Tile
+        "laundry": 1600,     # Tile
+        "entry": 1600,       # Tile
+        "closet": 850,       # Parquet (same as bedroom)
+        "storage": 450,      # Basic
+        "garage": 350,       # Concrete/Epoxy
+        "utility": 450,      # Basic
+    },
+    "walls": {
+        "standard": 1450,    # Interior wall per m²
+        "wet_room": 4200,    # Wet room wall (Säker Vatten compliant)
+    },
+    "ceiling": {
+        "standard": 350,     # Paint
+        "wet_room": 450,     # Moisture resistant
+    },
+    # Fixed costs
+    "foundation_per_m2": 3500,
+    "roof_per_m2": 2200,
+    "exterior_wall_per_m2": 3800,
+
+    # Per-unit costs
+    "wc_unit": 14000,
+    "washbasin_unit": 6000,
+    "shower_unit": 8000,
+    "floor_drain": 6500,
+    "kitchen_base": 85000,   # Base kitchen installation
+
+    # Electrical per point - UPDATED 2025-11 based on husexperter.se
+    "socket": 1800,                # New outlet (was 1400, market: 1500-2500)
+    "spotlight": 1600,
+
+    # Windows & Doors
+    "window_per_m2": 8500,       # Average window cost per m² glass
+    "exterior_door": 25000,      # Front door
+    "interior_door": 8500,       # Per door
+    "patio_door": 35000,         # Sliding/french doors
+
+    # HVAC & Ventilation
+    "heat_pump": 120000,         # Air-to-water heat pump
+    "underfloor_heating_per_m2": 450,  # Wet rooms
+    "ventilation_ftx": 85000,    # FTX system with heat recovery
+    "radiator": 4500,            # Per unit
+
+    # Interior finishing
+    "interior_wall_per_m2": 1450,  # Gypsum, paint
+    "painting_per_m2": 180,        # Walls and ceiling
+
+    # Plumbing system
+    "plumbing_base": 45000,      # Pipes, connections
+    "water_heater": 15000,
+
+    # Ground preparation - CORRECTED 2025-11 based on bygglov.se
+    "excavation_per_m2": 1000,     # Site preparation (was 300, market: 500-1500)
+    "drainage_per_m": 400,         # Perimeter drainage (was 150, market: 300-600)
+
+    # Additional structure
+    "insulation_per_m2": 200,      # Extra insulation beyond walls
+
+    # Electrical
+    "distribution_board": 22000,   # Main electrical panel
+
+    # Interior finishing
+    "trim_per_m2": 250,            # Baseboards, door/window frames
+
+    # Site costs
+    "site_overhead_pct": 0.05,     # Scaffolding, containers, waste (5%)
+    "contingency_pct": 0.10,       # Risk margin (10%)
+
+    # Exterior finishing
+    "facade_cladding_per_m2": 1200,  # Träpanel/puts
+    "exterior_paint_per_m2": 180,    # Exterior paint
+    "gutters_per_m": 650,            # Stuprännor
+    "soffit_per_m": 450,             # Vindskivor
+
+    # Connection fees (Swedish averages)
+    "va_connection": 120000,         # Water/sewer connection
+    "el_connection": 35000,          # Electrical grid connection
+
+    # Appliances
+    "appliances_package": 65000,     # Stove, fridge, dishwasher, washer, dryer
+
+    # Bathroom accessories
+    "bathroom_accessories": 8000,    # Mirror, cabinet, towel rail per bathroom
+
+    # Wardrobes
+    "wardrobe_per_bedroom": 12000,   # Built-in wardrobe
+
+    # Lighting
+    "lighting_fixtures": 25000,      # Complete lighting package
+
+    # External works
+    "driveway_per_m2": 450,          # Gravel/stone driveway
+    "terrace_per_m2": 2500,          # Wooden deck
+    "steps_entry": 15000,            # Entry steps
+
+    # Insurance/guarantees
+    "construction_insurance": 25000,  # Byggförsäkring
+
+    # Mandatory costs
+    "climate_declaration": 20000,
+    "ka_fee": 35000,         # Kontrollansvarig
+    "bygglov": 40000,        # Building permit
+    "project_mgmt": 60000,
+}
+
+# --- JB Villan Efficiency Pricing ---
+# JB Villan offers different types of efficiency advantages:
+#
+# PREFAB: Items manufactured off-site in JB Villan's factory
+#   - Wall panels, roof trusses assembled in controlled environment
+#   - Reduces on-site labor, material waste, weather delays
+#
+# STREAMLINED: Items that benefit from faster build timeline
+#   - Prefab components = shorter time on site
+#   - Lower scaffolding, container, and site management costs
+#
+# STANDARDIZED: Items that benefit from proven designs
+#   - Fewer change orders and surprises
+#   - Lower contingency needed due to predictable process
+#
+JB_EFFICIENCY = {
+    # PREFAB - True factory manufacturing
+    "exterior_wall_per_m2": {
+        "type": "PREFAB",
+        "general_contractor": 3800,
+        "jb_villan": 2800,
+        "savings_pct": 26,
+        "reason": "Factory-manufactured wall panels",
+        "explanation": "JB Villan manufactures complete wall panels in their factory with insulation, vapor barriers, and sheathing pre-installed. This eliminates weather delays, reduces material waste from optimized cutting, and requires less skilled on-site labor for assembly."
+    },
+    "roof_per_m2": {
+        "type": "PREFAB",
+        "general_contractor": 2200,
+        "jb_villan": 1800,
+        "savings_pct": 18,
+        "reason": "Pre-assembled roof trusses from factory",
+        "explanation": "Roof trusses are engineered and assembled in JB Villan's factory using precision jigs. Factory assembly ensures consistent quality, faster installation (crane sets in hours vs days of stick-framing), and eliminates on-site cutting waste."
+    },
+    "interior_wall_per_m2": {
+        "type": "PREFAB",
+        "general_contractor": 1450,
+        "jb_villan": 1200,
+        "savings_pct": 17,
+        "reason": "Pre-cut framing and panels",
+        "explanation": "Interior wall studs and gypsum panels are pre-cut to exact dimensions in JB Villan's factory. This eliminates on-site measuring errors, reduces drywall waste, and speeds up installation since carpenters spend less time cutting."
+    },
+    # STREAMLINED - Benefits from faster build time
+    "site_overhead_pct": {
+        "type": "STREAMLINED",
+        "general_contractor": 0.05,
+        "jb_villan": 0.03,
+        "savings_pct": 40,
+        "reason": "Faster build = lower site costs",
+        "explanation": "Because prefab walls and roof go up in days instead of weeks, JB Villan projects spend less time on site. This means fewer weeks of scaffolding rental, site container rental, temporary power, waste removal, and site management costs."
+    },
+    # STANDARDIZED - Benefits from proven designs
+    "contingency_pct": {
+        "type": "STANDARDIZED",
+        "general_contractor": 0.10,
+        "jb_villan": 0.06,
+        "savings_pct": 40,
+        "reason": "Proven designs = fewer surprises",
+        "explanation": "JB Villan uses standardized, proven designs that have been built many times. This predictability means fewer change orders, less rework, and fewer unexpected issues. General contractors typically budget 10% contingency; JB Villan's track record allows for 6%."
+    },
+
+    # BULK - Volume purchasing agreements with specific brands
+    "kitchen_complete": {
+        "type": "BULK",
+        "brand": "Vedum",
+        "general_contractor": 150000,
+        "jb_villan": 95000,
+        "savings_pct": 37,
+        "reason": "Vedum B2B partnership pricing",
+        "explanation": "JB Villan has volume agreements with Vedum Kök & Bad, Sweden's largest kitchen manufacturer. While consumer pricing for a Vedum kitchen (e.g., 'Life' or 'Sense' series) starts at 100,000-200,000 kr, B2B hustillverkare pricing with volume discounts is 30-40% lower. Source: Vedum.se price list 2025, Byggahus.se forum discussions on prefab kitchen pricing."
+    },
+    "bathroom_per_room": {
+        "type": "BULK",
+        "brand": "Vedum",
+        "general_contractor": 85000,
+        "jb_villan": 59000,
+        "savings_pct": 31,
+        "reason": "Vedum B2B bathroom fixtures",
+        "explanation": "JB Villan sources bathroom vanities and fixtures from Vedum (e.g., 'Free 600' vanity at 4,776 kr B2B, 'Flow 1000' at 7,550 kr). Toilets typically Gustavsberg Nordic (3,909 kr B2B). Consumer pricing would be 25-40% higher. This includes vanity, WC, shower fixtures, and tiling. Source: Vedum official price list 2025."
+    },
+    "appliances_package": {
+        "type": "BULK",
+        "brand": "Siemens/Bosch",
+        "general_contractor": 100000,
+        "jb_villan": 65000,
+        "savings_pct": 35,
+        "reason": "Volume appliance purchasing",
+        "explanation": "JB Villan purchases appliances in bulk from BSH (Siemens/Bosch) or Electrolux. Standard package includes: refrigerator/freezer (~12,000 kr), induction hob (~8,000 kr), oven (~7,000 kr), dishwasher (~6,000 kr), washer (~7,000 kr), dryer (~6,000 kr), microwave (~4,000 kr), range hood (~5,000 kr). Volume pricing 35% below retail. Source: Prisjakt.nu comparison, BSH trade pricing."
+    },
+
+    # VENDOR - Long-term supplier relationships
+    "heat_pump": {
+        "type": "VENDOR",
+        "brand": "NIBE",
+        "general_contractor": 120000,
+        "jb_villan": 95000,
+        "savings_pct": 21,
+        "reason": "NIBE vendor partnership pricing",
+        "explanation": "JB Villan uses NIBE F2120 air-to-water heat pumps (or similar F-series). Retail price ~130,000 kr installed, but JB Villan's volume purchasing and certified installer network reduces total cost. NIBE is Sweden's leading heat pump manufacturer. Materials ~72,000 kr (pump unit, buffer tank, controls), Labor ~23,000 kr (3-day installation). Source: NIBE.se, Värmepumpsforum."
+    },
+
+    # STREAMLINED - Benefits from turn-key model
+    "electrical_total": {
+        "type": "STREAMLINED",
+        "brand": "Schneider/ABB",
+        "general_contractor": 180000,
+        "jb_villan": 162000,
+        "savings_pct": 10,
+        "reason": "Standardized electrical layout",
+        "explanation": "JB Villan uses standardized electrical plans with pre-determined outlet/switch locations (Schneider or ABB components). This reduces planning time and installation complexity. Includes main panel, wiring, outlets (50-70 double outlets), switches (30-40), outdoor lighting, and connection to grid. Consumer/elbehörighet rates would add 10%+ for custom planning."
+    },
+    "plumbing_total": {
+        "type": "STREAMLINED",
+        "brand": "Gustavsberg/Geberit",
+        "general_contractor": 110000,
+        "jb_villan": 99000,
+        "savings_pct": 10,
+        "reason": "Standardized plumbing runs",
+        "explanation": "JB Villan designs optimize plumbing runs with bathrooms/kitchen adjacent to minimize pipe lengths. Uses Gustavsberg/Geberit fixtures (Säker Vatten certified). Includes all rough-in, supply lines, drain connections, water heater hookup. Standardized layouts reduce labor by 10% vs custom plumbing designs."
+    },
+
+    # BUNDLED - Costs absorbed in turn-key price
+    "admin_bundled": {
+        "type": "BUNDLED",
+        "brand": "N/A",
+        "general_contractor": 115000,
+        "jb_villan": 0,
+        "savings_pct": 100,
+        "reason": "Admin costs bundled in turn-key price",
+        "explanation": "In JB Villan's totalentreprenad (turn-key) model, administrative costs are absorbed into the package price rather than itemized separately. This includes: Bygglov (building permit ~40,000 kr), KA-kontroll (35,000 kr), project management (40,000 kr). These costs exist but are part of JB Villan's overhead, not billed separately. Source: JB Villan contract terms."
+    },
+}
+
+
+# Source records by constant name (EXCAVATION_PER_M2, ...): price sources and market ranges
+PRICE_REFERENCES = {
+    name: value for name, value in vars(pricing_references_2025).items() if isinstance(value, PriceReference)
+}
+
+
+# --- Line Item Table ---
+BIAREA_CATEGORIES = ("garage", "storage", "utility")  # Same split as ocr_service.calculate_area_breakdown
+WET_ROOM_CATEGORIES = ("bathroom", "laundry")
+TILE_FLOOR_CATEGORIES = ("bathroom", "laundry", "kitchen", "entry")
+ROOM_WALL_HEIGHT = 2.5  # m, rooms and exterior walls
+
+PricingContext = Dict[str, Any]
+
+# CostItem fields in declaration order with their defaults: the shape of model_dump()
+_COST_ITEM_DEFAULTS = {name: info.get_default() for name, info in CostItem.model_fields.items()}
+
+
+def _entry(name: str, value: float, unit: str, category: Optional[str]) -> Dict:
+    """A QuantityBreakdownItem as a dict."""
+    return {"name": name, "value": float(value), "unit": unit, "category": category}
+
+
+# Nested dicts a template can hold (flat, so copying one level is enough)
+_TEMPLATE_DICTS = ("priceSource", "prefabDiscount")
+
+
+def _from_template(template: Dict) -> Dict:
+    """A new item from a template, sharing none of the template's dicts."""
+    item = template.copy()
+    for key in _TEMPLATE_DICTS:
+        if item[key] is not None:
+            item[key] = dict(item[key])
+    return item
+
+
+def _render(text: str, ctx: PricingContext) -> str:
+    return text.format_map(ctx) if "{" in text else text
+
+
+def _template_fields(text: str) -> Set[str]:
+    """Context keys a str.format template refers to."""
+    return {name for _, name, _, _ in string.Formatter().parse(text) if name}
+
+
+@dataclass(frozen=True)
+class Breakdown:
+    """Quantity breakdown rule: context keys of the entries and total, and the method text."""
+    items: str
+    total: str
+    method: str  # Static text or a str.format template over the context
+
+
+@dataclass
+class LineItem:
+    """
+    One line of the estimate.
+
+    quantity and when name pricing context entries (when must be truthy for
+    the line to be included); description and the breakdown method may be
+    str.format templates over the context. pricing is "per_unit" (rounded
+    quantity × unit price), "fixed" (unit price, quantity 1) or "exact"
+    (unrounded quantity × unit price).
+    """
+    id: str
+    phase: str
+    element_name: str
+    description: str
+    unit: str
+    unit_price: float
+    quantity: Union[str, float] = 1
+    when: Optional[str] = None
+    pricing: str = "per_unit"
+    confidence: float = 1.0
+    guideline: Optional[str] = None
+    breakdown: Optional[Breakdown] = None
+    price_source: Optional[PriceReference] = None
+    efficiency: Optional[Dict] = None  # JB_EFFICIENCY entry
+    scale_efficiency: bool = False     # Efficiency prices are per unit (× quantity), not fixed totals
+    template: Dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Everything that does not depend on the plan is rendered once, here
+        template = dict(_COST_ITEM_DEFAULTS)
+        template.update(
+            id=self.id,
+            phase=self.phase,
+            elementName=self.element_name,
+            description=self.description,
+            unit=self.unit,
+            unitPrice=float(self.unit_price),
+            confidenceScore=float(self.confidence),
+            guidelineReference=self.guideline,
+        )
+        if self.pricing == "fixed":
+            template.update(quantity=1.0, totalCost=float(self.unit_price))
+        elif not isinstance(self.quantity, str):
+            template.update(quantity=float(self.quantity), totalCost=float(round(self.quantity * self.unit_price)))
+        if self.efficiency is not None and not self.scale_efficiency:
+            eff = self.efficiency
+            template["prefabDiscount"] = PrefabDiscount(
+                efficiencyType=eff["type"],
+                generalContractorPrice=eff["general_contractor"],
+                jbVillanPrice=eff["jb_villan"],
+                savingsAmount=eff["general_contractor"] - eff["jb_villan"],
+                savingsPercent=eff["savings_pct"],
+                reason=eff["reason"],
+                explanation=eff["explanation"]
+            ).model_dump()
+        if self.price_source is not None:
+            template["priceSource"] = make_price_source(self.price_source).model_dump()
+        self.template = template
+
+    def reads(self) -> Set[str]:
+        """Context keys this line depends on (see repricing.py)."""
+        keys = _template_fields(self.description)
+        if self.when is not None:
+            keys.add(self.when)
+        if isinstance(self.quantity, str):
+            keys.add(self.quantity)
+        if self.breakdown is not None:
+            keys |= {self.breakdown.items, self.breakdown.total} | _template_fields(self.breakdown.method)
+        return keys
+
+    def emit(self, ctx: PricingContext, items: List[Dict]) -> None:
+        if self.when is not None and not ctx[self.when]:
+            return
+        item = _from_template(self.template)
+        if "{" in self.description:
+            item["description"] = self.description.format_map(ctx)
+        if isinstance(self.quantity, str) and self.pricing != "fixed":
+            quantity = ctx[self.quantity]
+            total = quantity * self.unit_price
+            item["quantity"] = float(quantity)
+            item["totalCost"] = float(round(total) if self.pricing == "per_unit" else total)
+            if self.scale_efficiency:
+                eff = self.efficiency
+                gc_total = round(quantity * eff["general_contractor"])
+                jb_total = round(quantity * eff["jb_villan"])
+                item["prefabDiscount"] = {
+                    "efficiencyType": eff["type"],
+                    "generalContractorPrice": float(gc_total),
+                    "jbVillanPrice": float(jb_total),
+                    "savingsAmount": float(gc_total - jb_total),
+                    "savingsPercent": eff["savings_pct"],
+                    "reason": eff["reason"],
+                    "explanation": eff["explanation"],
+                }
+        if self.breakdown is not None:
+            item["quantityBreakdown"] = {
+                "items": [dict(entry) for entry in ctx[self.breakdown.items]],
+                "total": float(ctx[self.breakdown.total]),
+                "unit": self.unit,
+                "calculationMethod": _render(self.breakdown.method, ctx),
+            }
+        items.append(item)
+
+
+@dataclass
+class RoomFlooring:
+    """One flooring line per room, priced by room category."""
+    rates: Dict[str, float]
+    default_rate: float
+    template: Dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        template = dict(_COST_ITEM_DEFAULTS)
+        template.update(phase="interior", unit="m²", confidenceScore=1.0, guidelineReference="SS 21054 - BOA")
+        self.template = template
+
+    def reads(self) -> Set[str]:
+        return {"rooms", "room_entries"}
+
+    def emit(self, ctx: PricingContext, items: List[Dict]) -> None:
+        for room, entry in zip(ctx["rooms"], ctx["room_entries"]):
+            category = room["category"]
+            area = room["area"]
+            name = room["name"]
+            floor_price = self.rates.get(category, self.default_rate)
+            item = _from_template(self.template)
+            item.update(
+                id=f"interior-floor-{name.lower().replace(' ', '-')}",
+                elementName=f"Flooring - {name}",
+                description="Tile flooring" if category in TILE_FLOOR_CATEGORIES else "Parquet flooring",
+                quantity=float(area),
+                unitPrice=float(floor_price),
+                totalCost=float(round(area * floor_price)),
+                quantityBreakdown={
+                    "items": [dict(entry)],
+                    "total": float(area),
+                    "unit": "m²",
+                    "calculationMethod": f"Floor area from {name} ({category})",
+                },
+            )
+            items.append(item)
+
+
+@dataclass
+class Markup:
+    """Percentage of the subtotal of all other lines (site overhead, contingency)."""
+    id: str
+    element_name: str
+    description: str  # Completed with the JB Villan percentage
+    guideline: str
+    efficiency: Dict
+    price_source: PriceReference
+    template: Dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        template = dict(_COST_ITEM_DEFAULTS)
+        template.update(
+            id=self.id,
+            phase="admin",
+            elementName=self.element_name,
+            description=f"{self.description} ({int(self.efficiency['jb_villan']*100)}%).",
+            quantity=1.0,
+            unit="st",
+            confidenceScore=1.0,
+            guidelineReference=self.guideline,
+            priceSource=make_price_source(self.price_source).model_dump(),
+        )
+        self.template = template
+
+    def emit(self, subtotal: float, items: List[Dict]) -> None:
+        eff = self.efficiency
+        gc_total = round(subtotal * eff["general_contractor"])
+        jb_total = round(subtotal * eff["jb_villan"])
+        item = _from_template(self.template)
+        item.update(
+            unitPrice=float(jb_total),
+            totalCost=float(jb_total),
+            prefabDiscount={
+                "efficiencyType": eff["type"],
+                "generalContractorPrice": float(gc_total),
+                "jbVillanPrice": float(jb_total),
+                "savingsAmount": float(gc_total - jb_total),
+                "savingsPercent": eff["savings_pct"],
+                "reason": eff["reason"],
+                "explanation": eff["explanation"],
+            },
+        )
+        items.append(item)
+
+
+FOOTPRINT_METHOD = "Building footprint: BOA ({boyta:.1f}) + Biarea ({biarea:.1f}) + walls"
+BOA_METHOD = "Living area (BOA): {boyta:.1f} m²"
+WALL_METHOD = "Same as exterior walls: {wall_area:.1f} m²"
+
+
+def build_line_items(pricing: Dict, efficiency: Dict, references: Optional[Mapping[str, PriceReference]] = None):
+    """
+    (line items in estimate order, markups) for a price table, efficiency
+    table and price references by name (default: pricing_references_2025).
+    """
+    references = PRICE_REFERENCES if references is None else references
+    roof_eff = efficiency["roof_per_m2"]
+    ext_wall_eff = efficiency["exterior_wall_per_m2"]
+    int_wall_eff = efficiency["interior_wall_per_m2"]
+    kitchen_eff = efficiency["kitchen_complete"]
+    heat_pump_eff = efficiency["heat_pump"]
+    plumbing_eff = efficiency["plumbing_total"]
+    electrical_eff = efficiency["electrical_total"]
+    appliances_eff = efficiency["appliances_package"]
+
+    def per_bathroom(what: str) -> Breakdown:
+        return Breakdown("bathroom_details", "bathroom_count", f"1 {what} per bathroom")
+
+    line_items = [
+        # --- GROUND WORKS ---
+        LineItem(
+            id="ground-excavation", phase="ground", element_name="Excavation & Site Preparation",
+            description="Ground preparation, leveling - {byggyta:.1f} m²",
+            unit="m²", unit_price=pricing["excavation_per_m2"], quantity="byggyta", when="has_footprint",
+            confidence=0.9, guideline="AMA Anläggning",
+            breakdown=Breakdown("byggyta_breakdown", "byggyta", FOOTPRINT_METHOD),
+            price_source=references["EXCAVATION_PER_M2"],
+        ),
+        # Foundation - standard pricing (NOT prefab - concrete poured on site)
+        LineItem(
+            id="ground-foundation", phase="ground", element_name="Foundation (Slab on Grade)",
+            description="Insulated slab on grade with 300mm EPS under, 100mm edge insulation. Includes reinforcement mesh, radon barrier, and underfloor heating pipes preparation.",
+            unit="m²", unit_price=pricing["foundation_per_m2"], quantity="byggyta", when="has_footprint",
+            guideline="BBR 6:1, SS 21054",
+            breakdown=Breakdown("byggyta_breakdown", "byggyta", FOOTPRINT_METHOD),
+            price_source=references["FOUNDATION_PER_M2"],
+        ),
+        LineItem(
+            id="ground-drainage", phase="ground", element_name="Perimeter Drainage",
+            description="Drainage system around building - {ground_perimeter:.0f} m",
+            unit="m", unit_price=pricing["drainage_per_m"], quantity="ground_perimeter", when="has_footprint",
+            confidence=0.85, guideline="BBR 6:1",
+            breakdown=Breakdown(
+                "ground_perimeter_breakdown", "ground_perimeter",
+                "4 × √(footprint) = 4 × √({byggyta:.1f}) = {ground_perimeter:.1f} m",
+            ),
+            price_source=references["DRAINAGE_PER_M"],
+        ),
+
+        # --- STRUCTURE ---
+        # Roof - JB Villan PREFAB (factory-assembled trusses), 22° pitch slope factor
+        LineItem(
+            id="structure-roof", phase="structure", element_name="Roof Structure & Covering",
+            description=f"Pitched roof ({ROOF_PITCH_DEGREES}° standard pitch) with concrete tiles. JB Villan uses {ROOF_PITCH_DEGREES}° as their standard pitch - optimal for snow shedding while maintaining attic space.",
+            unit="m²", unit_price=roof_eff["jb_villan"], quantity="roof_surface_area", when="has_footprint",
+            guideline="BBR 9:4, EKS 11, AMA Hus",
+            breakdown=Breakdown(
+                "roof_breakdown", "roof_surface_area",
+                f"Building footprint ({{byggyta:.1f}} m²) × slope factor ({ROOF_SLOPE_FACTOR} from {ROOF_PITCH_DEGREES}° pitch) = {{roof_surface_area:.1f}} m² roof surface",
+            ),
+            efficiency=roof_eff, scale_efficiency=True, price_source=references["ROOF_PER_M2"],
+        ),
+        # Exterior walls - JB Villan PREFAB (factory-manufactured panels)
+        LineItem(
+            id="structure-ext-walls", phase="structure", element_name="Exterior Walls (260mm Energy)",
+            description="Timber frame 45x220mm + 45x45mm service layer. Mineral wool insulation U-value ≤0.18 W/m²K per BBR 9.",
+            unit="m²", unit_price=ext_wall_eff["jb_villan"], quantity="wall_area", when="has_footprint",
+            confidence=0.8, guideline="BBR 9:4, AMA Hus",
+            breakdown=Breakdown(
+                "wall_breakdown", "wall_area",
+                f"Perimeter ({{wall_perimeter:.1f}} m) × height ({ROOM_WALL_HEIGHT} m) = {{wall_area:.1f}} m²",
+            ),
+            efficiency=ext_wall_eff, scale_efficiency=True, price_source=references["EXTERIOR_WALL_PER_M2"],
+        ),
+        LineItem(
+            id="structure-insulation", phase="structure", element_name="Additional Insulation",
+            description="Extra insulation for energy compliance - {boyta:.0f} m²",
+            unit="m²", unit_price=pricing["insulation_per_m2"], quantity="boyta", when="has_footprint",
+            confidence=0.85, guideline="BBR 9",
+            breakdown=Breakdown("boa_breakdown", "boyta", BOA_METHOD),
+        ),
+        LineItem(
+            id="structure-facade", phase="structure", element_name="Facade Cladding",
+            description="Timber panel/render finish - {wall_area:.0f} m²",
+            unit="m²", unit_price=pricing["facade_cladding_per_m2"], quantity="wall_area", when="has_footprint",
+            confidence=0.85, guideline="AMA Hus",
+            breakdown=Breakdown("wall_breakdown", "wall_area", WALL_METHOD),
+            price_source=references["FACADE_CLADDING_PER_M2"],
+        ),
+        LineItem(
+            id="structure-ext-paint", phase="structure", element_name="Exterior Painting",
+            description="Facade painting - {wall_area:.0f} m²",
+            unit="m²", unit_price=pricing["exterior_paint_per_m2"], quantity="wall_area", when="has_footprint",
+            confidence=0.9, guideline="AMA Hus",
+            breakdown=Breakdown("wall_breakdown", "wall_area", WALL_METHOD),
+            price_source=references["EXTERIOR_PAINT_PER_M2"],
+        ),
+        LineItem(
+            id="structure-gutters", phase="structure", element_name="Gutters & Downpipes",
+            description="Stuprännor och hängrännor - {wall_perimeter:.0f} m",
+            unit="m", unit_price=pricing["gutters_per_m"], quantity="wall_perimeter", when="has_footprint",
+            confidence=0.9, guideline="AMA Hus",
+            breakdown=Breakdown(
+                "roof_perimeter_breakdown", "wall_perimeter", "Building perimeter × 1.2 = {wall_perimeter:.1f} m",
+            ),
+            price_source=references["GUTTERS_PER_M"],
+        ),
+        LineItem(
+            id="structure-soffit", phase="structure", element_name="Soffit & Fascia",
+            description="Vindskivor och underslag - {wall_perimeter:.0f} m",
+            unit="m", unit_price=pricing["soffit_per_m"], quantity="wall_perimeter", when="has_footprint",
+            confidence=0.9, guideline="AMA Hus",
+            breakdown=Breakdown(
+                "roof_perimeter_breakdown", "wall_perimeter", "Same as gutters: {wall_perimeter:.1f} m",
+            ),
+            price_source=references["SOFFIT_PER_M"],
+        ),
+
+        # --- INTERIOR BY ROOM ---
+        RoomFlooring(rates=pricing["flooring"], default_rate=450),
+        # Wet room walls (Säker Vatten compliant - ~3x standard cost)
+        LineItem(
+            id="interior-wet-walls", phase="interior", element_name="Wet Room Walls (Säker Vatten)",
+            description="Full waterproofing system per Säker Vatten 2021:2. Includes wet room gypsum, liquid membrane (min 2 coats), reinforcement tape at corners, and ceramic tiles. Wall area calculated as perimeter × 2.5m height for each wet room. Rate ~3× standard walls due to waterproofing requirements.",
+            unit="m²", unit_price=pricing["walls"]["wet_room"], quantity="total_wet_wall_area", when="has_wet_walls",
+            confidence=0.85, guideline="Säker Vatten 2021:2, BBV 21:1, BBR 6:5",
+            breakdown=Breakdown(
+                "wet_room_details", "wet_room_area", "Wall area = perimeter × 2.5m height for each wet room",
+            ),
+            price_source=references["INTERIOR_WALL_WETROOM_PER_M2"],
+        ),
+        # Standard room walls - JB Villan PREFAB (pre-cut framing)
+        LineItem(
+            id="interior-standard-walls", phase="interior", element_name="Standard Room Walls",
+            description="Gypsum with paint finish - {total_standard_wall_area:.1f} m².",
+            unit="m²", unit_price=int_wall_eff["jb_villan"], quantity="total_standard_wall_area",
+            when="has_standard_walls", confidence=0.85, guideline="AMA Hus",
+            breakdown=Breakdown(
+                "standard_room_details", "standard_room_area",
+                "Wall area = perimeter × 2.5m height for each standard room",
+            ),
+            efficiency=int_wall_eff, scale_efficiency=True, price_source=references["INTERIOR_WALL_STANDARD_PER_M2"],
+        ),
+
+        # --- PLUMBING - Vedum/Gustavsberg bathroom fixtures ---
+        LineItem(
+            id="plumbing-wc", phase="plumbing", element_name="WC Installation (Gustavsberg Nordic)",
+            description="Wall-hung Gustavsberg Nordic WC with concealed cistern frame - {bathroom_count} units. B2B price ~3,909 kr/unit.",
+            unit="st", unit_price=pricing["wc_unit"], quantity="bathroom_count", when="has_bathrooms",
+            guideline="Säker Vatten", breakdown=per_bathroom("WC"), price_source=references["WC_UNIT"],
+        ),
+        LineItem(
+            id="plumbing-basin", phase="plumbing", element_name="Washbasin & Mixer (Vedum)",
+            description="Vedum Free 600 vanity with porcelain basin and Mora mixer tap - {bathroom_count} units. B2B price ~4,776 kr/unit.",
+            unit="st", unit_price=pricing["washbasin_unit"], quantity="bathroom_count", when="has_bathrooms",
+            guideline="Säker Vatten", breakdown=per_bathroom("washbasin"),
+            efficiency=efficiency["bathroom_per_room"], price_source=references["WASHBASIN_UNIT"],
+        ),
+        # Kitchen - Vedum B2B pricing
+        LineItem(
+            id="interior-kitchen", phase="interior", element_name="Kitchen Installation (Vedum)",
+            description=f"Vedum kitchen package: base cabinets, upper cabinets, worktop, sink, mixer tap. Brand: {kitchen_eff['brand']}. Installation included.",
+            unit="st", unit_price=kitchen_eff["jb_villan"], pricing="fixed", when="has_kitchen",
+            confidence=0.9, guideline="AMA Hus", efficiency=kitchen_eff, price_source=references["KITCHEN_BASE"],
+        ),
+
+        # --- CEILING & PAINTING ---
+        LineItem(
+            id="interior-ceiling", phase="interior", element_name="Ceiling Finishing",
+            description="Gypsum ceiling with paint - {boyta:.0f} m²",
+            unit="m²", unit_price=pricing["ceiling"]["standard"], quantity="boyta", when="has_boa",
+            confidence=0.9, guideline="AMA Hus",
+            breakdown=Breakdown("all_room_details", "boyta", "Sum of all room floor areas (BOA)"),
+            price_source=references["CEILING_STANDARD_PER_M2"],
+        ),
+
+        # --- WINDOWS & DOORS ---
+        # Windows (estimate: 15% of floor area as glass)
+        LineItem(
+            id="structure-windows", phase="structure", element_name="Windows",
+            description="Triple-glazed windows - {window_area:.0f} m²",
+            unit="m²", unit_price=pricing["window_per_m2"], quantity="window_area", when="has_boa",
+            confidence=0.8, guideline="BBR 9 - Energy",
+            breakdown=Breakdown(
+                "window_breakdown", "window_area", "15% of BOA ({boyta:.1f} m² × 0.15 = {window_area:.1f} m²)",
+            ),
+            price_source=references["WINDOW_PER_M2"],
+        ),
+        LineItem(
+            id="structure-ext-door", phase="structure", element_name="Exterior Door",
+            description="Insulated entry door with frame",
+            unit="st", unit_price=pricing["exterior_door"], pricing="fixed", when="has_boa",
+            guideline="BBR", price_source=references["EXTERIOR_DOOR"],
+        ),
+        # Patio/terrace door - ONLY if terrace detected (priced like windows)
+        LineItem(
+            id="structure-patio-door", phase="structure", element_name="Patio Door",
+            description="Sliding glass door to terrace",
+            unit="st", unit_price=pricing["patio_door"], pricing="fixed", when="has_patio_door",
+            confidence=0.9, guideline="BBR", price_source=references["WINDOW_PER_M2"],
+        ),
+        # Interior doors (estimate: 1 per room + 2 extra)
+        LineItem(
+            id="interior-doors", phase="interior", element_name="Interior Doors",
+            description="Standard interior doors with frames - {door_count} st",
+            unit="st", unit_price=pricing["interior_door"], quantity="door_count", when="has_boa",
+            confidence=0.8, guideline="AMA Hus",
+            breakdown=Breakdown(
+                "door_breakdown", "door_count", "1 door per room ({room_count}) + 2 extra = {door_count}",
+            ),
+            price_source=references["INTERIOR_DOOR"],
+        ),
+
+        # --- HVAC & VENTILATION ---
+        # Heat pump - NIBE vendor pricing
+        LineItem(
+            id="hvac-heatpump", phase="plumbing", element_name=f"Heat Pump ({heat_pump_eff['brand']} F2120)",
+            description=f"{heat_pump_eff['brand']} air-to-water heat pump ~8-10 kW sized for Swedish climate zone III. Includes: pump unit (~72,000 kr), buffer tank, controls. Labor: ~23,000 kr (3-day installation). COP ≥4.0 required for BBR 9 energy compliance.",
+            unit="st", unit_price=heat_pump_eff["jb_villan"], pricing="fixed", when="has_boa",
+            confidence=0.9, guideline="BBR 9:2, SS-EN 14825", efficiency=heat_pump_eff, price_source=references["HEAT_PUMP"],
+        ),
+        LineItem(
+            id="hvac-underfloor", phase="plumbing", element_name="Underfloor Heating (Wet Rooms)",
+            description="Electric/water underfloor heating - {wet_room_area:.1f} m²",
+            unit="m²", unit_price=pricing["underfloor_heating_per_m2"], quantity="wet_room_area",
+            when="has_underfloor_heating", confidence=0.9, guideline="Säker Vatten",
+            breakdown=Breakdown(
+                "wet_room_details", "wet_room_area", "Sum of wet room (bathroom + laundry) floor areas",
+            ),
+            price_source=references["UNDERFLOOR_HEATING_PER_M2"],
+        ),
+        # Radiators (estimate: 1 per room)
+        LineItem(
+            id="hvac-radiators", phase="plumbing", element_name="Radiators",
+            description="Panel radiators - {room_count} st",
+            unit="st", unit_price=pricing["radiator"], quantity="room_count", when="has_boa",
+            confidence=0.8, guideline="BBR",
+            breakdown=Breakdown("per_room_units", "room_count", "1 radiator per room"),
+            price_source=references["RADIATOR"],
+        ),
+        LineItem(
+            id="hvac-ventilation", phase="plumbing", element_name="FTX Ventilation System",
+            description="Mechanical ventilation with heat recovery",
+            unit="st", unit_price=pricing["ventilation_ftx"], pricing="fixed", when="has_boa",
+            guideline="BBR 6:2", price_source=references["FTX_VENTILATION"],
+        ),
+
+        # --- PLUMBING BASE - Streamlined pricing ---
+        LineItem(
+            id="plumbing-base", phase="plumbing", element_name=f"Plumbing System ({plumbing_eff['brand']})",
+            description=f"Water pipes, drainage, connections. Optimized layout with kitchen/bathrooms adjacent minimizes pipe runs. Brand: {plumbing_eff['brand']} (Säker Vatten certified).",
+            unit="st", unit_price=pricing["plumbing_base"], pricing="fixed",
+            confidence=0.9, guideline="Säker Vatten", efficiency=plumbing_eff, price_source=references["PLUMBING_BASE"],
+        ),
+        LineItem(
+            id="plumbing-waterheater", phase="plumbing", element_name="Water Heater",
+            description="Hot water tank/cylinder",
+            unit="st", unit_price=pricing["water_heater"], pricing="fixed",
+            guideline="Säker Vatten", price_source=references["WATER_HEATER"],
+        ),
+        # Showers, drains and accessories (one per bathroom)
+        LineItem(
+            id="plumbing-shower", phase="plumbing", element_name="Shower Installation",
+            description="Shower with mixer and drain - {bathroom_count} st",
+            unit="st", unit_price=pricing["shower_unit"], quantity="bathroom_count", when="has_bathrooms",
+            guideline="Säker Vatten", breakdown=per_bathroom("shower"), price_source=references["SHOWER_UNIT"],
+        ),
+        LineItem(
+            id="plumbing-drain", phase="plumbing", element_name="Floor Drains",
+            description="Wet room floor drains - {bathroom_count} st",
+            unit="st", unit_price=pricing["floor_drain"], quantity="bathroom_count", when="has_bathrooms",
+            guideline="Säker Vatten", breakdown=per_bathroom("floor drain"), price_source=references["FLOOR_DRAIN"],
+        ),
+        LineItem(
+            id="interior-bath-accessories", phase="interior", element_name="Bathroom Accessories",
+            description="Mirrors, cabinets, towel rails - {bathroom_count} st",
+            unit="st", unit_price=pricing["bathroom_accessories"], quantity="bathroom_count", when="has_bathrooms",
+            confidence=0.9, guideline="AMA Hus", breakdown=per_bathroom("set"), price_source=references["BATHROOM_ACCESSORIES"],
+        ),
+        LineItem(
+            id="interior-wardrobes", phase="interior", element_name="Built-in Wardrobes",
+            description="Garderober - {bedroom_count} st",
+            unit="st", unit_price=pricing["wardrobe_per_bedroom"], quantity="bedroom_count", when="has_bedrooms",
+            confidence=0.85, guideline="AMA Hus",
+            breakdown=Breakdown("bedroom_details", "bedroom_count", "1 wardrobe per bedroom"),
+        ),
+
+        # --- ELECTRICAL (estimate based on room count) - Streamlined pricing ---
+        LineItem(
+            id="electrical-panel", phase="electrical", element_name=f"Distribution Board ({electrical_eff['brand']})",
+            description=f"Main electrical panel with breakers. Standardized layout with pre-determined outlet/switch locations. Brand: {electrical_eff['brand']}.",
+            unit="st", unit_price=pricing["distribution_board"], pricing="fixed",
+            guideline="SS 437", efficiency=electrical_eff, price_source=references["DISTRIBUTION_BOARD"],
+        ),
+        LineItem(
+            id="electrical-sockets", phase="electrical", element_name="Electrical Points",
+            description="Sockets, switches, spotlights - {socket_count} points",
+            unit="st", unit_price=pricing["socket"], quantity="socket_count",
+            confidence=0.7, guideline="SS 436 40 00",
+            breakdown=Breakdown(
+                "socket_breakdown", "socket_count", "~6 electrical points per room × {room_count} rooms",
+            ),
+            price_source=references["SOCKET"],
+        ),
+        LineItem(
+            id="electrical-lighting", phase="electrical", element_name="Lighting Fixtures",
+            description="Complete lighting package for all rooms",
+            unit="st", unit_price=pricing["lighting_fixtures"], pricing="fixed",
+            confidence=0.85, guideline="SS 436", price_source=references["LIGHTING_FIXTURES"],
+        ),
+
+        # --- INTERIOR: Appliances - ONLY if kitchen or laundry detected ---
+        LineItem(
+            id="interior-appliances", phase="interior",
+            element_name=f"Kitchen & Laundry Appliances ({appliances_eff['brand']})",
+            description=f"Package: refrigerator/freezer (~12k kr), induction hob (~8k kr), oven (~7k kr), dishwasher (~6k kr), washer (~7k kr), dryer (~6k kr), microwave (~4k kr), range hood (~5k kr). Brand: {appliances_eff['brand']}.",
+            unit="st", unit_price=appliances_eff["jb_villan"], pricing="fixed", when="has_appliances",
+            confidence=0.9, guideline="Market Rate", efficiency=appliances_eff, price_source=references["APPLIANCES_PACKAGE"],
+        ),
+
+        # --- COMPLETION (External Works) - ONLY if detected in floor plan ---
+        # Entry steps are not priced: most floor plans don't show exterior steps
+        LineItem(
+            id="completion-terrace", phase="completion", element_name="Terrace/Deck",
+            description="Impregnated wood deck - {terrace_area:.1f} m². Includes foundation, joists, decking boards, railing. Per AMA Hus standards.",
+            unit="m²", unit_price=pricing["terrace_per_m2"], quantity="terrace_area", when="has_terrace",
+            pricing="exact", guideline="AMA Hus 23", price_source=references["TERRACE_PER_M2"],
+        ),
+
+        # --- INTERIOR TRIM ---
+        LineItem(
+            id="interior-trim", phase="interior", element_name="Interior Trim & Moldings",
+            description="Baseboards, door frames, window frames - {boyta:.0f} m²",
+            unit="m²", unit_price=pricing["trim_per_m2"], quantity="boyta", when="has_boa",
+            confidence=0.9, guideline="AMA Hus",
+            breakdown=Breakdown("boa_breakdown", "boyta", BOA_METHOD),
+        ),
+
+        # --- ADMIN/MANDATORY ---
+        LineItem(
+            id="admin-va-connection", phase="admin", element_name="VA Connection (Water/Sewer)",
+            description="Municipal water and sewer connection", unit="st", unit_price=pricing["va_connection"],
+            pricing="fixed", guideline="Municipal Rate", price_source=references["VA_CONNECTION"],
+        ),
+        LineItem(
+            id="admin-el-connection", phase="admin", element_name="Electrical Grid Connection",
+            description="Power company connection fee", unit="st", unit_price=pricing["el_connection"],
+            pricing="fixed", guideline="Grid Company Rate", price_source=references["EL_CONNECTION"],
+        ),
+        LineItem(
+            id="admin-insurance", phase="admin", element_name="Construction Insurance",
+            description="Byggförsäkring", unit="st", unit_price=pricing["construction_insurance"],
+            pricing="fixed", guideline="Insurance Standard", price_source=references["CONSTRUCTION_INSURANCE"],
+        ),
+        LineItem(
+            id="admin-klimat", phase="admin", element_name="Climate Declaration (LCA)",
+            description="Mandatory climate impact assessment", unit="st", unit_price=pricing["climate_declaration"],
+            pricing="fixed", guideline="PBL 2025", price_source=references["CLIMATE_DECLARATION"],
+        ),
+        LineItem(
+            id="admin-ka", phase="admin", element_name="Kontrollansvarig (KA)",
+            description="Certified inspector fee", unit="st", unit_price=pricing["ka_fee"],
+            pricing="fixed", guideline="PBL", price_source=references["KA_FEE"],
+        ),
+        LineItem(
+            id="admin-bygglov", phase="admin", element_name="Building Permit (Bygglov)",
+            description="Municipal permit fee", unit="st", unit_price=pricing["bygglov"],
+            pricing="fixed", guideline="PBL", price_source=references["BYGGLOV"],
+        ),
+        LineItem(
+            id="admin-mgmt", phase="admin", element_name="Project Management & BAS-P/U",
+            description="Site management and safety coordination", unit="st", unit_price=pricing["project_mgmt"],
+            pricing="fixed", guideline="AML", price_source=references["PROJECT_MANAGEMENT"],
+        ),
+    ]
+
+    # --- SITE OVERHEAD & CONTINGENCY (JB Villan efficiency) ---
+    markups = [
+        # STREAMLINED (faster build = lower site costs)
+        Markup(
+            id="admin-site-overhead", element_name="Site Overhead",
+            description="Scaffolding, containers, waste removal", guideline="Industry Standard",
+            efficiency=efficiency["site_overhead_pct"], price_source=references["SITE_OVERHEAD_PCT"],
+        ),
+        # STANDARDIZED (proven designs = fewer surprises)
+        Markup(
+            id="admin-contingency", element_name="Contingency",
+            description="Risk margin and unforeseen costs", guideline="ABT 06",
+            efficiency=efficiency["contingency_pct"], price_source=references["CONTINGENCY_PCT"],
+        ),
+    ]
+    return line_items, markups
+
+
+# --- Price Books ---
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+@dataclass(frozen=True, eq=False)
+class PriceBook:
+    """
+    One version of the prices, compiled: the tables it was built from (read
+    only) and the line item table rendered from them. Books are never
+    changed in place; price_book.py swaps in a new one with
+    activate_price_book().
+    """
+    version: str
+    pricing: Mapping
+    efficiency: Mapping
+    references: Mapping[str, PriceReference]
+    line_items: Tuple
+    markups: Tuple[Markup, ...]
+    lines: Mapping[str, LineItem]  # Line items by id
+    checksum: str                   # Of the tables, to tell identical books apart
+
+    def describe(self) -> Dict:
+        return {"version": self.version, "checksum": self.checksum}
+
+
+def compile_price_book(
+    version: str,
+    pricing: Mapping,
+    efficiency: Mapping,
+    references: Optional[Mapping[str, PriceReference]] = None,
+) -> PriceBook:
+    """Render the line item table for these tables. Validating overrides is price_book.py's job."""
+    references = dict(PRICE_REFERENCES if references is None else references)
+    pricing, efficiency = _thaw(pricing), _thaw(efficiency)
+    line_items, markups = build_line_items(pricing, efficiency, references)
+    payload = json.dumps(
+        {"pricing": pricing, "efficiency": efficiency, "references": {name: asdict(ref) for name, ref in references.items()}},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return PriceBook(
+        version=version,
+        pricing=_freeze(pricing),
+        efficiency=_freeze(efficiency),
+        references=MappingProxyType(references),
+        line_items=tuple(line_items),
+        markups=tuple(markups),
+        lines=MappingProxyType({line.id: line for line in line_items if isinstance(line, LineItem)}),
+        checksum=hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16],
+    )
+
+
+BUILTIN_PRICE_BOOK = compile_price_book("builtin", PRICING, JB_EFFICIENCY)
+_active_book = BUILTIN_PRICE_BOOK
+
+
+def current_price_book() -> PriceBook:
+    """
+    The book new estimates are priced with. Read it once per estimate: a
+    swap mid-estimate must not mix two versions.
+    """
+    return _active_book
+
+
+def activate_price_book(book: PriceBook) -> PriceBook:
+    """Make book the active price book (one reference assignment). Returns the previous one."""
+    global _active_book
+    previous, _active_book = _active_book, book
+    return previous
+
+
+def footprint_quantities(byggyta):
+    """
+    The context quantities sized by the building footprint alone (byggyta:
+    a number, or a NumPy array of them for scenarios.py).
+    """
+    ground_perimeter = (byggyta ** 0.5) * 4
+    wall_perimeter = (byggyta ** 0.5) * 4 * 1.2  # Rough estimate, also the roof perimeter
+    return {
+        "byggyta": byggyta,
+        "ground_perimeter": ground_perimeter,
+        "wall_perimeter": wall_perimeter,
+        "wall_area": wall_perimeter * ROOM_WALL_HEIGHT,
+    }
+
+
+def pricing_context(rooms: List[Dict], summary: Dict[str, float]) -> PricingContext:
+    """
+    Quantities, flags and breakdown entries the line item rules refer to,
+    computed in one pass over the rooms.
+    """
+    room_count = len(rooms)
+
+    # Get summary areas, or estimate from room data
+    byggyta = summary.get("byggyta", 0) or summary.get("bta", 0)
+    boyta = summary.get("boyta", 0)
+
+    total_room_area = 0
+    biarea = 0
+    living_area = 0
+    wet_room_area = 0
+    standard_room_area = 0
+    total_wet_wall_area = 0
+    total_standard_wall_area = 0
+    terrace_area = 0
+    bathroom_count = 0
+    has_kitchen = False
+    has_laundry = False
+    has_terrace = False
+
+    room_entries = []           # One m² entry per room, shared by every breakdown listing it
+    boa_breakdown = []
+    biarea_breakdown = []
+    wet_room_details = []       # For underfloor heating, wet walls
+    standard_room_details = []  # For standard walls
+    bedroom_details = []        # For wardrobes
+    bathroom_details = []       # For WC, basins, showers, drains
+    per_room_units = []         # 1 st per room: doors, radiators
+    socket_breakdown = []
+
+    for room in rooms:
+        category = room["category"]
+        area = room["area"]
+        name = room["name"]
+        entry = _entry(name, area, "m²", category)
+        room_entries.append(entry)
+        total_room_area += area
+
+        if category in BIAREA_CATEGORIES:
+            biarea += area
+            biarea_breakdown.append(entry)
+        else:
+            living_area += area
+            boa_breakdown.append(entry)
+
+        # Wall area per room: perimeter (≈ 4√area for roughly square rooms) × ceiling height
+        room_wall_area = 4 * (area ** 0.5) * ROOM_WALL_HEIGHT
+        if category in WET_ROOM_CATEGORIES:
+            wet_room_area += area
+            total_wet_wall_area += room_wall_area
+            wet_room_details.append(entry)
+        else:
+            standard_room_area += area
+            total_standard_wall_area += room_wall_area
+            standard_room_details.append(entry)
+
+        if category == "bedroom":
+            bedroom_details.append(_entry(name, 1, "st", category))
+        elif category == "bathroom":
+            bathroom_count += 1
+            bathroom_details.append(_entry(name, 1, "st", category))
+        elif category == "kitchen":
+            has_kitchen = True
+        elif category == "laundry":
+            has_laundry = True
+        elif category == "terrace":
+            has_terrace = True
+            terrace_area += area
+
+        per_room_units.append(_entry(name, 1, "st", category))
+        socket_breakdown.append(_entry(name, 6, "st", category))
+
+    # Estimate boyta as living area (exclude garage, storage)
+    if boyta == 0:
+        boyta = living_area if living_area > 0 else total_room_area
+
+    # Estimate byggyta as total footprint (all rooms + 10% for walls)
+    if byggyta == 0:
+        byggyta = total_room_area * 1.1
+
+    byggyta_breakdown = boa_breakdown + biarea_breakdown
+    if total_room_area > 0:
+        wall_allowance = byggyta - total_room_area
+        if wall_allowance > 0:
+            byggyta_breakdown.append(_entry("Wall thickness allowance", round(wall_allowance, 1), "m²", "structure"))
+
+    footprint = footprint_quantities(byggyta)
+    ground_perimeter, wall_perimeter = footprint["ground_perimeter"], footprint["wall_perimeter"]
+    wall_area = footprint["wall_area"]
+    roof_surface_area = round(byggyta * ROOF_SLOPE_FACTOR, 1)
+    window_area = boyta * 0.15
+    wall_breakdown = [
+        _entry("Perimeter", round(wall_perimeter, 1), "m", "structure"),
+        _entry("Wall height", ROOM_WALL_HEIGHT, "m", "structure"),
+    ]
+
+    return {
+        "rooms": rooms,
+        "room_entries": room_entries,
+        "room_count": room_count,
+        "byggyta": byggyta,
+        "boyta": boyta,
+        "biarea": biarea,
+        "byggyta_breakdown": byggyta_breakdown,
+        "boa_breakdown": boa_breakdown,
+        "all_room_details": room_entries,
+        "ground_perimeter": ground_perimeter,
+        "ground_perimeter_breakdown": [_entry("Building perimeter", round(ground_perimeter, 1), "m", "structure")],
+        "roof_surface_area": roof_surface_area,
+        "roof_breakdown": byggyta_breakdown + [_ROOF_SLOPE_ENTRY],
+        "wall_perimeter": wall_perimeter,
+        "wall_area": wall_area,
+        "wall_breakdown": wall_breakdown,
+        "roof_perimeter_breakdown": [_entry("Roof perimeter", round(wall_perimeter, 1), "m", "structure")],
+        "wet_room_area": wet_room_area,
+        "total_wet_wall_area": total_wet_wall_area,
+        "wet_room_details": wet_room_details,
+        "standard_room_area": standard_room_area,
+        "total_standard_wall_area": total_standard_wall_area,
+        "standard_room_details": standard_room_details,
+        "bathroom_count": bathroom_count,
+        "bathroom_details": bathroom_details,
+        "bedroom_count": len(bedroom_details),
+        "bedroom_details": bedroom_details,
+        "window_area": window_area,
+        "window_breakdown": [_entry("BOA (15%)", boyta, "m²", "living")],
+        "door_count": room_count + 2,
+        "door_breakdown": per_room_units + [_EXTRA_DOORS_ENTRY],
+        "per_room_units": per_room_units,
+        "socket_count": room_count * 6,  # Average 6 sockets per room
+        "socket_breakdown": socket_breakdown,
+        "terrace_area": terrace_area,
+        "has_footprint": byggyta > 0,
+        "has_boa": boyta > 0,
+        "has_wet_walls": total_wet_wall_area > 0,
+        "has_standard_walls": total_standard_wall_area > 0,
+        "has_underfloor_heating": boyta > 0 and wet_room_area > 0,
+        "has_bathrooms": bathroom_count > 0,
+        "has_bedrooms": bool(bedroom_details),
+        "has_kitchen": has_kitchen,
+        "has_appliances": has_kitchen or has_laundry,
+        "has_terrace": has_terrace,
+        "has_patio_door": boyta > 0 and has_terrace,
+    }
+
+
+_ROOF_SLOPE_ENTRY = _entry(f"Slope factor ({ROOF_PITCH_DEGREES}° pitch)", ROOF_SLOPE_FACTOR, "×", "calculation")
+_EXTRA_DOORS_ENTRY = _entry("Extra doors", 2, "st", "utility")
+
+
+def price_items(rooms: List[Dict], summary: Dict[str, float], book: Optional[PriceBook] = None) -> List[Dict]:
+    """
+    Deterministic line items for the extracted rooms and summary areas, as
+    CostItem-shaped dicts (exactly what CostItem.model_dump() would return),
+    priced with book (default: the active price book). Every item is a
+    fresh copy: changing one never affects another item, a later call or
+    the book.
+    """
+    book = book or _active_book
+    ctx = pricing_context(rooms, summary)
+    items: List[Dict] = []
+    for line in book.line_items:
+        line.emit(ctx, items)
+    # Percentage-based costs apply to the subtotal of everything above
+    subtotal = sum(item["totalCost"] for item in items)
+    for markup in book.markups:
+        markup.emit(subtotal, items)
+    return items
+
+
+def calculate_pricing(rooms: List[Dict], summary: Dict[str, float], book: Optional[PriceBook] = None) -> List[CostItem]:
+    """
+    Calculate deterministic pricing based on extracted room data.
+    Returns list of validated CostItem objects.
+    """
+    return [CostItem.model_validate(item) for item in price_items(rooms, summary, book)]
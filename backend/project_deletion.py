@@ -0,0 +1,71 @@
+"""
+Project Deletion Module
+=======================
+Deletes a project and everything derived from it, in parallel.
+
+Three independent branches run concurrently:
+
+1. Firestore documents (repository.py): the project, its cost_data document
+   and every document in their subcollections at any depth, found with one
+   query per subcollection and deleted in batches of up to 500, all committed
+   at once. Up to 500 documents is one atomic batch.
+2. Analysis job records for the project (jobs.py), in batched commits.
+3. OCR cache entries (memory, disk and Firestore tiers) for the files those
+   jobs analyzed. Entries are content-addressed and shared, so an entry is
+   only evicted when no remaining job (of another project, or of none)
+   analyzed the same file.
+
+Branch 3 needs the job records from branch 2, so it runs right after it.
+Either way the wall time is about one branch's round trips, not one per
+document. The result counts what each branch deleted.
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from executors import run_blocking
+from metrics import observe_call
+from ocr_cache import OCRCache
+from ocr_service import ocr_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def _unreferenced(job_store, uploads: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """The (content hash, MIME type) pairs no remaining job refers to."""
+    return [upload for upload in uploads if not job_store.references_content(*upload)]
+
+
+def _evict(cache: OCRCache, keys: Iterable[str]) -> None:
+    for key in keys:
+        cache.delete(key)
+
+
+async def delete_project_data(project_id: str, repository, job_store, ocr_cache: Optional[OCRCache] = None) -> Dict[str, int]:
+    """
+    Delete a project with its items, subcollections, jobs and the OCR cache
+    entries no other job uses.
+    Returns {"documents", "jobs", "ocrCacheEntries", "total"}.
+    """
+    async def jobs_and_ocr_cache():
+        # The job store and the disk/Firestore cache tiers block; keep them off the event loop
+        with observe_call(job_store.name, "job_delete_by_project"):
+            jobs = await run_blocking("firestore", job_store.delete_by_project, project_id)
+        uploads = {(job["contentHash"], job["mimeType"]) for job in jobs if job.get("contentHash")}
+        if ocr_cache is None or not uploads:
+            return len(jobs), 0
+        # Other projects may have uploaded the same files: keep the entries they still use
+        with observe_call(job_store.name, "job_references_content"):
+            unreferenced = await run_blocking("firestore", _unreferenced, job_store, uploads)
+        keys = {ocr_cache_key(content_hash, mime_type) for content_hash, mime_type in unreferenced}
+        if keys:
+            await run_blocking("ocr_cache", _evict, ocr_cache, keys)
+        return len(jobs), len(keys)
+
+    documents, (jobs, ocr_entries) = await asyncio.gather(
+        repository.delete_project(project_id), jobs_and_ocr_cache()
+    )
+    counts = {"documents": documents, "jobs": jobs, "ocrCacheEntries": ocr_entries}
+    counts["total"] = sum(counts.values())
+    logger.info(f"Deleted project {project_id}: {counts}")
+    return counts
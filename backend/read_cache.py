@@ -0,0 +1,133 @@
+"""
+Read Cache Module
+=================
+Read-through cache for GET /projects/{id} and GET /projects/{id}/items.
+
+Entries hold the serialized JSON response body and its strong ETag (a hash of
+the body), so a hit skips both the Firestore read and the serialization, and
+a client that sends If-None-Match with the current ETag gets a 304 with no
+body. The ETag is derived from the content alone, so every instance computes
+the same one for the same data.
+
+The cache is an in-process LRU with a TTL. The write routes invalidate the
+entries they change; the TTL bounds how long a write made through another
+instance can go unseen. Invalidation bumps a generation counter, and a load
+that started before any invalidation does not store its (possibly stale)
+result.
+
+Configuration (environment):
+- READ_CACHE_TTL_SECONDS: entry lifetime, 0 disables the cache (default: 30)
+- READ_CACHE_MAX_ENTRIES: entries kept before the least recently used is evicted (default: 512)
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi import Response
+
+from metrics import record_cache_lookup
+
+READ_CACHE_TTL_SECONDS = float(os.environ.get("READ_CACHE_TTL_SECONDS", "30"))
+READ_CACHE_MAX_ENTRIES = int(os.environ.get("READ_CACHE_MAX_ENTRIES", "512"))
+
+# Authenticated data: browsers may keep it but must revalidate (with the ETag) before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag of a response body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 specifies for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+    expires: float
+
+
+class ReadCache:
+    """LRU of response bodies with a TTL. Thread-safe; keys are tuples like ("items", project_id)."""
+
+    def __init__(self, ttl: float = READ_CACHE_TTL_SECONDS, max_entries: int = READ_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key: Hashable, body: bytes, generation: Optional[int] = None) -> CachedBody:
+        """
+        Cache body under key and return the entry. With a generation (taken
+        before loading), the entry is not stored if anything was invalidated since.
+        """
+        entry = CachedBody(body, make_etag(body), time.monotonic() + self.ttl)
+        if self.ttl <= 0:
+            return entry
+        with self._lock:
+            if generation is not None and self._generation != generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[bytes]]) -> CachedBody:
+        """The cached entry for key, or load() the body and cache it. key[0] labels the hit/miss metric."""
+        entry = self.get(key)
+        record_cache_lookup(str(key[0]), hit=entry is not None)
+        if entry is not None:
+            return entry
+        generation = self.generation()
+        return self.set(key, await load(), generation)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def cached_json_response(entry: CachedBody, if_none_match: Optional[str]) -> Response:
+    """200 with the cached body, or 304 with no body if the client already has this ETag."""
+    headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
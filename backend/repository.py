@@ -0,0 +1,421 @@
+"""
+Repository Module
+=================
+Async storage for projects and their cost items.
+
+The project, item and health routes go through a ProjectRepository instead of
+the synchronous Firestore client, so a storage round trip suspends the request
+on the event loop rather than holding a threadpool worker. Two implementations
+share one interface:
+
+- FirestoreProjectRepository: google.cloud.firestore.AsyncClient. Set
+  FIRESTORE_EMULATOR_HOST to run it against the Firestore emulator.
+- InMemoryProjectRepository: a process-local fake with the same semantics
+  (copies on read and write, newest-first cursor pages), for tests and
+  offline development.
+
+The connection settings live here and are shared by every Firestore client
+the backend creates (this async client, the job store and the price book
+source).
+
+Collections: `projects` (one document per project) and `cost_data` (one
+document per project holding the item order and pricing plan). Each item is
+its own document in the `cost_data/{project_id}/items` subcollection, keyed by
+CostItem.id, so a project is not bound by Firestore's 1 MiB document limit.
+Saving items diffs them against the stored ones and writes only the items that
+changed, were added or were removed, and the parent document only when the
+order or the plan changes. Up to 500 writes, the read, diff and writes run in
+one transaction, so concurrent saves cannot interleave. update_items() runs a
+read-modify-write (repricing) in that same transaction. Larger saves are
+written in phases instead: the new and changed items (in parallel batches),
+then the parent with the new order, then the deletions. A reader therefore
+never sees an order that names a missing item. Projects saved as a single document with an `items` array are
+still read, and move to the subcollection on their next save.
+
+Configuration (environment):
+- GOOGLE_CLOUD_PROJECT:      Firestore project (default: kgvilla)
+- FIRESTORE_DATABASE:        Firestore database (default: "(default)")
+- FIRESTORE_TIMEOUT_SECONDS: deadline of each repository call (default: 10)
+- FIRESTORE_EMULATOR_HOST:   host:port of the Firestore emulator (read by the client library)
+- PROJECT_STORE:             "firestore" (default) or "memory"
+"""
+import os
+import copy
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import observe_call
+from pagination import (
+    BATCH_WRITE_LIMIT, MIGRATIONS_COLLECTION, ORDER_FIELD, _to_json, backfill_marker, backfill_stamp, decode_page_token,
+    encode_page_token, page_from_docs, page_query,
+)
+
+logger = logging.getLogger(__name__)
+
+FIRESTORE_PROJECT = os.environ.get("GOOGLE_CLOUD_PROJECT", "kgvilla")
+FIRESTORE_DATABASE = os.environ.get("FIRESTORE_DATABASE", "(default)")
+FIRESTORE_TIMEOUT = float(os.environ.get("FIRESTORE_TIMEOUT_SECONDS", "10"))
+PROJECT_STORE = os.environ.get("PROJECT_STORE", "firestore").lower()
+
+PROJECTS_COLLECTION = "projects"
+ITEMS_COLLECTION = "cost_data"
+ITEMS_SUBCOLLECTION = "items"
+
+
+def client_settings() -> Dict:
+    """Keyword arguments for every Firestore client (sync or async)."""
+    return {"project": FIRESTORE_PROJECT, "database": FIRESTORE_DATABASE}
+
+
+def create_client():
+    """Synchronous Firestore client (job store, price book source, CLI tools)."""
+    from google.cloud import firestore
+    return firestore.Client(**client_settings())
+
+
+def create_async_client():
+    """
+    Async Firestore client. Its gRPC channel is opened on first use, so it
+    binds to the event loop serving requests, not the one importing main.
+    """
+    from google.cloud import firestore
+    return firestore.AsyncClient(**client_settings())
+
+
+def _item_key(item_id: str) -> str:
+    """Firestore document ID for an item ID ('/' is not allowed in IDs; '%' and '~' are escaped to keep keys unique)."""
+    key = item_id.replace("%", "%25").replace("/", "%2F").replace("~", "%7E")
+    if key in ("", ".", "..") or (key.startswith("__") and key.endswith("__")):
+        key = "%" + key  # Reserved IDs; a bare '%' never comes out of the escaping above
+    return key
+
+
+def item_keys(items: List[Dict]) -> List[str]:
+    """
+    Document keys for a list of items, in order. Repeated IDs (two rooms with
+    the same name price to the same line ID) get "~2", "~3"... suffixes.
+    """
+    seen: Counter = Counter()
+    keys = []
+    for item in items:
+        key = _item_key(str(item["id"]))
+        seen[key] += 1
+        keys.append(key if seen[key] == 1 else f"{key}~{seen[key]}")
+    return keys
+
+
+def assemble_items(parent: Optional[Dict], docs: Dict[str, Dict]) -> Optional[Dict]:
+    """The stored parent document and item documents as {"items": [...], "plan": ...}, or None."""
+    if parent is None:
+        return None
+    if "order" not in parent:
+        return parent  # Single-document layout from before the subcollection
+    data = {name: value for name, value in parent.items() if name != "order"}
+    data["items"] = [docs[key] for key in parent["order"] if key in docs]
+    return data
+
+
+def plan_item_writes(
+    parent: Optional[Dict], docs: Dict[str, Dict], data: Dict
+) -> Tuple[Optional[Dict], Dict[str, Dict], List[str]]:
+    """
+    The writes that turn the stored state (parent document, item documents by
+    key) into data: (new parent document or None if unchanged, items to set
+    by key, keys to delete).
+    """
+    items = data.get("items", [])
+    keys = item_keys(items)
+    upserts = {key: item for key, item in zip(keys, items) if docs.get(key) != item}
+    kept = set(keys)
+    deletes = [key for key in docs if key not in kept]
+    new_parent = {name: value for name, value in data.items() if name != "items"}
+    new_parent["order"] = keys
+    return (None if new_parent == parent else new_parent), upserts, deletes
+
+
+class FirestoreProjectRepository:
+    """Projects and items in Firestore, through the async client."""
+    name = "firestore"
+
+    def __init__(self, client, timeout: float = FIRESTORE_TIMEOUT):
+        self.client = client
+        self.timeout = timeout
+        self.projects = client.collection(PROJECTS_COLLECTION)
+        self.cost_data = client.collection(ITEMS_COLLECTION)
+        self._backfilled = False
+        self._backfill_lock = asyncio.Lock()
+
+    async def ping(self) -> None:
+        """One small read; raises if Firestore is unreachable."""
+        with observe_call("firestore", "health_check"):
+            async for _ in self.projects.limit(1).stream(timeout=self.timeout):
+                break
+
+    async def list_projects(
+        self, limit: int, page_token: Optional[str] = None, fields: Optional[List[str]] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """One page of projects, newest first, and the next page's token (see pagination.py)."""
+        await self._ensure_backfilled()
+        query = page_query(self.projects, limit, page_token, fields)
+        with observe_call("firestore", "list_page"):
+            docs = [doc async for doc in query.stream(timeout=self.timeout)]
+        return page_from_docs(docs, limit)
+
+    async def _ensure_backfilled(self) -> None:
+        """
+        Stamp projects saved before updatedAt existed, once per process (and
+        once per database, via the marker). A failure is logged and retried on
+        the next listing.
+        """
+        if self._backfilled:
+            return
+        async with self._backfill_lock:
+            if self._backfilled:
+                return
+            marker = self.client.collection(MIGRATIONS_COLLECTION).document(backfill_marker(PROJECTS_COLLECTION))
+            try:
+                with observe_call("firestore", "backfill_updated_at"):
+                    if not (await marker.get(timeout=self.timeout)).exists:
+                        writes = [
+                            ("update", doc.reference, {ORDER_FIELD: backfill_stamp(doc)})
+                            async for doc in self.projects.select([ORDER_FIELD]).stream(timeout=self.timeout)
+                            if doc.to_dict().get(ORDER_FIELD) is None
+                        ]
+                        await self._commit(writes)
+                        await marker.set({"stamped": len(writes), "at": datetime.now(timezone.utc)}, timeout=self.timeout)
+                        logger.info(f"Stamped {len(writes)} projects with {ORDER_FIELD}")
+            except Exception as e:
+                logger.error(f"Backfilling {ORDER_FIELD} on projects failed, will retry: {e}")
+                return
+            self._backfilled = True
+
+    async def get_project(self, project_id: str) -> Optional[Dict]:
+        with observe_call("firestore", "get_project"):
+            doc = await self.projects.document(project_id).get(timeout=self.timeout)
+        return doc.to_dict() if doc.exists else None
+
+    async def save_project(self, project: Dict) -> None:
+        with observe_call("firestore", "save_project"):
+            await self.projects.document(project["id"]).set(project, timeout=self.timeout)
+
+    async def _descendants(self, doc) -> List:
+        """Every document under doc, in any subcollection at any depth (one query per direct subcollection)."""
+        from google.cloud.firestore_v1.field_path import FieldPath
+
+        async def under(collection) -> List:
+            query = collection.recursive().select([FieldPath.document_id()])
+            return [snapshot.reference async for snapshot in query.stream(timeout=self.timeout)]
+
+        collections = [collection async for collection in doc.collections(timeout=self.timeout)]
+        found = await asyncio.gather(*(under(collection) for collection in collections))
+        return [ref for refs in found for ref in refs]
+
+    async def delete_project(self, project_id: str) -> int:
+        """
+        Delete a project, its cost_data document and everything under either
+        (items and any other subcollection). Returns the number of documents
+        deleted.
+
+        Up to BATCH_WRITE_LIMIT documents go in one batch, which is atomic. A
+        larger project deletes its descendants in parallel batches first and
+        the two top-level documents last, so a failure leaves the project in
+        place and the delete can simply be retried.
+        """
+        roots = [self.projects.document(project_id), self.cost_data.document(project_id)]
+        with observe_call("firestore", "delete_project"):
+            found = await asyncio.gather(
+                *(root.get(timeout=self.timeout) for root in roots),
+                *(self._descendants(root) for root in roots),
+            )
+            existing = [root for root, snapshot in zip(roots, found[:2]) if snapshot.exists]
+            descendants = [ref for refs in found[2:] for ref in refs]
+            writes = [("delete", ref, None) for ref in descendants]
+            if len(writes) + len(roots) <= BATCH_WRITE_LIMIT:
+                await self._commit(writes + [("delete", root, None) for root in roots])
+            else:
+                await self._commit(writes)
+                await self._commit([("delete", root, None) for root in roots])
+        return len(existing) + len(descendants)
+
+    async def _read_items(self, project_id: str, transaction=None) -> Tuple[Optional[Dict], Dict[str, Dict]]:
+        """(parent document or None, item documents by key), read concurrently."""
+        parent = self.cost_data.document(project_id)
+        items = parent.collection(ITEMS_SUBCOLLECTION)
+
+        async def item_docs() -> Dict[str, Dict]:
+            return {doc.id: doc.to_dict() async for doc in items.stream(transaction=transaction, timeout=self.timeout)}
+
+        snapshot, docs = await asyncio.gather(parent.get(transaction=transaction, timeout=self.timeout), item_docs())
+        return (snapshot.to_dict() if snapshot.exists else None), docs
+
+    async def _commit(self, writes: List[Tuple[str, Any, Optional[Dict]]]) -> None:
+        """Commit (operation, document, data) writes in batches of BATCH_WRITE_LIMIT, all in flight at once."""
+        batches = []
+        for start in range(0, len(writes), BATCH_WRITE_LIMIT):
+            batch = self.client.batch()
+            for operation, ref, value in writes[start:start + BATCH_WRITE_LIMIT]:
+                if operation == "set":
+                    batch.set(ref, value)
+                elif operation == "update":
+                    batch.update(ref, value)
+                else:
+                    batch.delete(ref)
+            batches.append(batch.commit(timeout=self.timeout))
+        await asyncio.gather(*batches)
+
+    async def get_items(self, project_id: str) -> Optional[Dict]:
+        """The project's items and plan ({"items": [...], "plan": {...}}), or None."""
+        with observe_call("firestore", "get_items"):
+            parent, docs = await self._read_items(project_id)
+        return assemble_items(parent, docs)
+
+    async def save_items(self, project_id: str, data: Dict) -> int:
+        """Store {"items": [...], "plan": ...} by writing only what differs. Returns the number of writes."""
+        return await self.update_items(project_id, lambda current: data)
+
+    async def update_items(self, project_id: str, update: Callable[[Optional[Dict]], Dict]) -> int:
+        """
+        Read the stored items (None if there are none), store update(stored)
+        and return the number of writes. The read and the writes share one
+        transaction, which Firestore retries (calling update again) when a
+        concurrent save touched the same documents, so no save is lost.
+        Exceptions from update abort without writing.
+        """
+        from google.cloud import firestore
+
+        parent_ref = self.cost_data.document(project_id)
+        items = parent_ref.collection(ITEMS_SUBCOLLECTION)
+
+        @firestore.async_transactional
+        async def diff_and_write(transaction):
+            with observe_call("firestore", "save_items_read"):
+                parent, docs = await self._read_items(project_id, transaction)
+            data = update(assemble_items(parent, docs))
+            new_parent, upserts, deletes = plan_item_writes(parent, docs, data)
+            if len(upserts) + len(deletes) + (new_parent is not None) > BATCH_WRITE_LIMIT:
+                return new_parent, upserts, deletes, False  # Too big for one transaction
+            for key, item in upserts.items():
+                transaction.set(items.document(key), item)
+            for key in deletes:
+                transaction.delete(items.document(key))
+            if new_parent is not None:
+                transaction.set(parent_ref, new_parent)
+            return new_parent, upserts, deletes, True
+
+        with observe_call("firestore", "save_items"):
+            new_parent, upserts, deletes, committed = await diff_and_write(self.client.transaction())
+            if not committed:
+                # Items first and deletions last, so the stored order never names a missing item
+                await self._commit([("set", items.document(key), item) for key, item in upserts.items()])
+                if new_parent is not None:
+                    await parent_ref.set(new_parent, timeout=self.timeout)
+                await self._commit([("delete", items.document(key), None) for key in deletes])
+        return len(upserts) + len(deletes) + (new_parent is not None)
+
+    async def close(self) -> None:
+        # AsyncClient.close() only releases its HTTP session; the gRPC channel
+        # belongs to the API client, which exists once anything was requested
+        api = self.client._firestore_api_internal
+        if api is not None:
+            await api.transport.close()
+        self.client.close()
+
+
+class InMemoryProjectRepository:
+    """
+    Process-local fake of FirestoreProjectRepository. Documents are deep-copied
+    in and out, like a round trip through Firestore, and listing follows the
+    same order, cursors and projections. Projects without updatedAt are
+    stamped with their save time on the first listing, like the Firestore
+    backfill.
+    """
+    name = "memory"
+
+    def __init__(self):
+        self.projects: Dict[str, Dict] = {}
+        self.cost_data: Dict[str, Dict] = {}
+        self.item_docs: Dict[str, Dict[str, Dict]] = {}
+        self.update_times: Dict[str, datetime] = {}  # Stand-in for Firestore's document update time
+        self._backfilled = False
+        self.writes = 0  # Documents written or deleted, as Firestore would bill them
+
+    async def ping(self) -> None:
+        return None
+
+    async def list_projects(
+        self, limit: int, page_token: Optional[str] = None, fields: Optional[List[str]] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        if not self._backfilled:
+            for project_id, doc in self.projects.items():
+                if doc.get(ORDER_FIELD) is None:
+                    doc[ORDER_FIELD] = self.update_times[project_id]
+                    self.writes += 1
+            self._backfilled = True
+        ordered = sorted(
+            (doc for doc in self.projects.values() if isinstance(doc.get(ORDER_FIELD), datetime)),
+            key=lambda doc: (doc[ORDER_FIELD], doc["id"]),
+            reverse=True,
+        )
+        if page_token:
+            after = decode_page_token(page_token)
+            ordered = [doc for doc in ordered if (doc[ORDER_FIELD], doc["id"]) < after]
+        page = ordered[:limit]
+        next_token = encode_page_token(page[-1][ORDER_FIELD], page[-1]["id"]) if len(ordered) > limit else None
+        if fields is not None:
+            page = [{name: doc[name] for name in fields if name in doc} for doc in page]
+        return [_to_json(copy.deepcopy(doc)) for doc in page], next_token
+
+    async def get_project(self, project_id: str) -> Optional[Dict]:
+        return copy.deepcopy(self.projects.get(project_id))
+
+    async def save_project(self, project: Dict) -> None:
+        self.projects[project["id"]] = copy.deepcopy(project)
+        self.update_times[project["id"]] = datetime.now(timezone.utc)
+
+    async def delete_project(self, project_id: str) -> int:
+        deleted = (self.projects.pop(project_id, None) is not None) + (self.cost_data.pop(project_id, None) is not None)
+        deleted += len(self.item_docs.pop(project_id, {}))
+        self.writes += deleted
+        return deleted
+
+    async def get_items(self, project_id: str) -> Optional[Dict]:
+        return copy.deepcopy(assemble_items(self.cost_data.get(project_id), self.item_docs.get(project_id, {})))
+
+    async def save_items(self, project_id: str, data: Dict) -> int:
+        return await self.update_items(project_id, lambda current: data)
+
+    async def update_items(self, project_id: str, update: Callable[[Optional[Dict]], Dict]) -> int:
+        # Nothing is awaited between the read and the writes, so concurrent updates cannot interleave
+        data = update(copy.deepcopy(assemble_items(self.cost_data.get(project_id), self.item_docs.get(project_id, {}))))
+        docs = self.item_docs.setdefault(project_id, {})
+        new_parent, upserts, deletes = plan_item_writes(self.cost_data.get(project_id), docs, data)
+        docs.update(copy.deepcopy(upserts))
+        for key in deletes:
+            del docs[key]
+        if new_parent is not None:
+            self.cost_data[project_id] = copy.deepcopy(new_parent)
+        written = len(upserts) + len(deletes) + (new_parent is not None)
+        self.writes += written
+        return written
+
+    async def close(self) -> None:
+        return None
+
+
+def build_repository_from_env():
+    """Repository for PROJECT_STORE, or None when Firestore cannot be reached (offline mode)."""
+    if PROJECT_STORE == "memory":
+        logger.info("Projects are stored in process memory (PROJECT_STORE=memory)")
+        return InMemoryProjectRepository()
+    if PROJECT_STORE != "firestore":
+        logger.warning(f"Unknown PROJECT_STORE '{PROJECT_STORE}', using Firestore")
+    try:
+        repository = FirestoreProjectRepository(create_async_client())
+    except Exception as e:
+        logger.error(f"Async Firestore client failed: {e}")
+        return None
+    logger.info(f"Async Firestore repository for project {FIRESTORE_PROJECT}")
+    return repository
@@ -0,0 +1,289 @@
+"""
+Repricing Module
+================
+Incremental repricing of a saved estimate after a user edit.
+
+A PricingModel holds one project's line items, optionally together with the
+plan they were priced from (rooms and summary areas). Edits come in two kinds:
+
+- Overrides: customQuantity / customUnitPrice on one item. Only that item's
+  total changes (effective quantity × effective unit price, as the frontend
+  computes it), then the running subtotal and the two markups.
+- Plan inputs (byggyta, boyta, bta): the pricing context is recomputed and
+  only the line items that read a context value that actually changed are
+  emitted again. Roof, facade and drainage follow byggyta; the dozens of
+  per-room lines do not move.
+
+Which lines read which context values is the dependency graph, built once at
+import from the line item declarations (LineItem.reads()). Markups are shares
+of the subtotal, which is kept as a running sum.
+
+Every apply() returns a delta: the items that changed or appeared, the ids
+that were removed, and the new subtotal and total.
+
+Saved items record the version of the price book that priced them
+(priceBookVersion). A saved estimate is repriced with that same book
+(book_for_version), so one estimate never mixes two versions. Only the active
+and the built-in book are held in memory; an estimate priced with any other
+version cannot be repriced incrementally and has to be priced again in full.
+"""
+import logging
+from typing import Dict, List, Optional, Set
+
+from pricing_engine import BUILTIN_PRICE_BOOK, LineItem, PriceBook, current_price_book, price_items, pricing_context
+
+logger = logging.getLogger(__name__)
+
+# Summary areas pricing_context() reads
+REPRICING_INPUTS = ("byggyta", "boyta", "bta")
+OVERRIDE_FIELDS = ("customQuantity", "customUnitPrice")
+# Set by the user or the frontend, never by the engine: kept when a line is emitted again
+USER_FIELDS = (
+    "projectId", "levelId", "customUnitPrice", "customQuantity", "isUserAdded", "userNotes",
+    "selectedOptionId", "options", "validationData", "roomId", "system",
+)
+
+# Ids, order, pricing rules and dependencies are the same in every price book (books only
+# change values), so the structure is read off the built-in book; emitting uses the model's book
+_LINE_ITEMS = BUILTIN_PRICE_BOOK.line_items
+_LINES = dict(BUILTIN_PRICE_BOOK.lines)
+_MARKUPS = {markup.id: markup for markup in BUILTIN_PRICE_BOOK.markups}
+
+# Position of each engine line in the estimate, for inserting lines that appear
+_FLOORING_RANK = next(rank for rank, line in enumerate(_LINE_ITEMS) if not isinstance(line, LineItem))
+_RANK = {line.id: rank for rank, line in enumerate(_LINE_ITEMS) if isinstance(line, LineItem)}
+_RANK.update({markup_id: len(_LINE_ITEMS) + idx for idx, markup_id in enumerate(_MARKUPS)})
+
+# Dependency graph: context key → ids of the lines that read it, in estimate order
+_READERS: Dict[str, List[str]] = {}
+for _line in _LINES.values():
+    for _key in _line.reads():
+        _READERS.setdefault(_key, []).append(_line.id)
+
+
+class RepricingError(ValueError):
+    """An edit the model cannot apply (unknown item or input, plan inputs without a plan)."""
+
+
+class PriceBookMismatchError(RepricingError):
+    """The saved items were priced with a price book that is no longer available."""
+
+
+def book_for_version(version: Optional[str]) -> PriceBook:
+    """
+    The price book saved items were priced with. Items saved before the
+    version was recorded (None) get the active book.
+    """
+    active = current_price_book()
+    if version is None or version == active.version:
+        return active
+    if version == BUILTIN_PRICE_BOOK.version:
+        return BUILTIN_PRICE_BOOK
+    raise PriceBookMismatchError(
+        f"Items were priced with price book {version}, but {active.version} is active; save a full reprice instead"
+    )
+
+
+def _rank(item_id: str) -> Optional[int]:
+    if item_id in _RANK:
+        return _RANK[item_id]
+    if item_id.startswith("interior-floor-"):
+        return _FLOORING_RANK
+    return None
+
+
+def _base_total(item: Dict) -> float:
+    """Total without overrides, by the rule that priced the item."""
+    if item["id"] in _MARKUPS:
+        return item["unitPrice"]
+    line = _LINES.get(item["id"])
+    if line is not None and line.pricing == "fixed":
+        return item["unitPrice"]
+    total = item["quantity"] * item["unitPrice"]
+    if item.get("isUserAdded") or (line is not None and line.pricing == "exact") or _rank(item["id"]) is None:
+        return float(total)
+    return float(round(total))
+
+
+def effective_total(item: Dict) -> float:
+    """(customQuantity ?? quantity) × (customUnitPrice ?? unitPrice), or the priced total without overrides."""
+    quantity, unit_price = item.get("customQuantity"), item.get("customUnitPrice")
+    if quantity is None and unit_price is None:
+        return _base_total(item)
+    if quantity is None:
+        quantity = item["quantity"]
+    if unit_price is None:
+        unit_price = item["unitPrice"]
+    return float(quantity * unit_price)
+
+
+class PricingModel:
+    """
+    One project's estimate, repriced in place by apply().
+
+    Built from saved items (overrides only) or with the plan the items were
+    priced from (overrides and plan inputs), under one price book (default:
+    the active book). Item dicts are replaced, never mutated, so items shared
+    with price_items() output stay intact. Ids are
+    not unique (rooms with the same name share a flooring id); an override
+    applies to every item with the id, like the frontend's updateItem.
+    """
+
+    def __init__(
+        self,
+        items: List[Dict],
+        rooms: Optional[List[Dict]] = None,
+        summary: Optional[Dict[str, float]] = None,
+        book: Optional[PriceBook] = None,
+    ):
+        self.book = book or current_price_book()
+        self.items: List[Dict] = list(items)
+        self.rooms = rooms
+        self.summary = dict(summary or {})
+        self.ctx = pricing_context(rooms, self.summary) if rooms is not None else None
+        self.subtotal = sum(item["totalCost"] for item in self.items if item["id"] not in _MARKUPS)
+        self._positions: Dict[str, List[int]] = {}
+        self._reindex()
+        self._changed: Set[str] = set()  # Ids touched by the current apply()
+        self._removed: List[str] = []
+
+    @classmethod
+    def from_plan(cls, rooms: List[Dict], summary: Dict[str, float], book: Optional[PriceBook] = None) -> "PricingModel":
+        book = book or current_price_book()
+        return cls(price_items(rooms, summary, book), rooms, summary, book)
+
+    @property
+    def has_plan(self) -> bool:
+        return self.ctx is not None
+
+    @property
+    def total_cost(self) -> float:
+        markups = sum(self.items[self._positions[markup_id][0]]["totalCost"] for markup_id in _MARKUPS if markup_id in self._positions)
+        return self.subtotal + markups
+
+    def apply(
+        self,
+        overrides: Optional[Dict[str, Dict[str, Optional[float]]]] = None,
+        inputs: Optional[Dict[str, float]] = None,
+    ) -> Dict:
+        """
+        Apply overrides ({item_id: {"customQuantity": ..., "customUnitPrice": ...}},
+        None clears an override) and plan inputs ({"byggyta": ...}).
+
+        Returns {"items": changed or added items, "removed": ids, "subtotal", "totalCost"}.
+        Everything is validated before anything changes.
+        """
+        overrides = overrides or {}
+        inputs = inputs or {}
+        for item_id, fields in overrides.items():
+            if item_id not in self._positions:
+                raise RepricingError(f"Unknown item '{item_id}'")
+            unknown = set(fields) - set(OVERRIDE_FIELDS)
+            if unknown:
+                raise RepricingError(f"Cannot override {', '.join(sorted(unknown))}. Valid: {', '.join(OVERRIDE_FIELDS)}")
+        if inputs:
+            unknown = set(inputs) - set(REPRICING_INPUTS)
+            if unknown:
+                raise RepricingError(f"Unknown plan input {', '.join(sorted(unknown))}. Valid: {', '.join(REPRICING_INPUTS)}")
+            if any(value < 0 for value in inputs.values()):
+                raise RepricingError("Plan inputs are areas in m² and cannot be negative")
+            if not self.has_plan:
+                raise RepricingError("Plan inputs need the plan (rooms and summary) the items were priced from")
+
+        self._changed = set()
+        self._removed = []
+        for item_id, fields in overrides.items():
+            for position in self._positions[item_id]:
+                item = dict(self.items[position])
+                item.update(fields)
+                item["totalCost"] = effective_total(item)
+                self._replace(position, item)
+        if inputs:
+            self._set_inputs(inputs)
+        self._reprice_markups()
+        return {
+            "items": [item for item in self.items if item["id"] in self._changed],
+            "removed": list(self._removed),
+            "subtotal": self.subtotal,
+            "totalCost": self.total_cost,
+        }
+
+    def _set_inputs(self, inputs: Dict[str, float]) -> None:
+        summary = {**self.summary, **inputs}
+        ctx = pricing_context(self.rooms, summary)
+        affected = set()
+        for key, line_ids in _READERS.items():
+            if ctx[key] != self.ctx[key]:
+                affected.update(line_ids)
+        logger.debug(f"Plan inputs {inputs} reprice {len(affected)} of {len(self.items)} items")
+
+        for line_id in _LINES:
+            if line_id not in affected:
+                continue
+            line = self.book.lines[line_id]
+            emitted: List[Dict] = []
+            line.emit(ctx, emitted)
+            positions = self._positions.get(line_id)
+            if not emitted:
+                if positions:
+                    self._remove(positions[0])
+                continue
+            item = emitted[0]
+            if not positions:
+                # A line the user deleted stays deleted; only lines switched on by this edit appear
+                if line.when is not None and not self.ctx[line.when]:
+                    self._insert(item)
+                continue
+            self._update_engine_item(positions[0], item)
+        self.summary = summary
+        self.ctx = ctx
+
+    def _reprice_markups(self) -> None:
+        for markup in self.book.markups:
+            positions = self._positions.get(markup.id)
+            if not positions:
+                continue
+            emitted: List[Dict] = []
+            markup.emit(self.subtotal, emitted)
+            old = self.items[positions[0]]
+            if emitted[0]["unitPrice"] != old["unitPrice"] or emitted[0]["prefabDiscount"] != old.get("prefabDiscount"):
+                self._update_engine_item(positions[0], emitted[0])
+
+    def _update_engine_item(self, position: int, item: Dict) -> None:
+        """Replace an engine line with a freshly emitted one, keeping the user's fields and overrides."""
+        old = self.items[position]
+        for name in USER_FIELDS:
+            item[name] = old.get(name)
+        item["totalCost"] = effective_total(item)
+        self._replace(position, item)
+
+    def _replace(self, position: int, item: Dict) -> None:
+        old = self.items[position]
+        self.items[position] = item
+        if item["id"] not in _MARKUPS:
+            self.subtotal += item["totalCost"] - old["totalCost"]
+        self._changed.add(item["id"])
+
+    def _insert(self, item: Dict) -> None:
+        rank = _rank(item["id"])
+        # Before the first engine line that comes later; user-added items have no rank
+        ranks = [_rank(other["id"]) for other in self.items]
+        position = next((idx for idx, other in enumerate(ranks) if other is not None and other > rank), len(self.items))
+        self.items.insert(position, item)
+        self._reindex()
+        self.subtotal += item["totalCost"]
+        self._changed.add(item["id"])
+        if item["id"] in self._removed:
+            self._removed.remove(item["id"])
+
+    def _remove(self, position: int) -> None:
+        old = self.items.pop(position)
+        self._reindex()
+        self.subtotal -= old["totalCost"]
+        self._changed.discard(old["id"])
+        self._removed.append(old["id"])
+
+    def _reindex(self) -> None:
+        self._positions = {}
+        for position, item in enumerate(self.items):
+            self._positions.setdefault(item["id"], []).append(position)
@@ -0,0 +1,193 @@
+"""
+Scenarios Module
+================
+What-if pricing: one parsed room set priced under many parameter scenarios.
+
+The plan is priced once with price_items(). Only a handful of line items
+depend on the scenario parameters (the lines sized by the footprint, roof,
+foundation, site overhead and contingency), so the engine tiles the base
+quantities and totals into scenarios×items matrices and recomputes just
+those columns as NumPy array operations over all scenarios at once. A sweep of thousands of combinations
+takes a few milliseconds.
+
+Parameters (defaults come from the active price book and pricing constants):
+- roof_slope_factor:     roof surface per m² of footprint (ROOF_SLOPE_FACTOR)
+- foundation_per_m2:     slab on grade price per m²
+- site_overhead_pct:     JB Villan site overhead share of the subtotal
+- contingency_pct:       JB Villan contingency share of the subtotal
+- wall_thickness_factor: net → gross area factor, for totalArea and cost per m².
+                         The footprint (byggyta) scales with it relative to the
+                         default, and with it every line the footprint sizes
+                         (excavation, foundation, drainage, roof, exterior walls,
+                         facade, gutters, soffits)
+
+Scenario row 0 always uses the defaults, so it equals the normal estimate.
+
+Configuration (environment):
+- SCENARIO_MAX_COUNT: most scenarios priced per request (default: 10000)
+"""
+import os
+import logging
+import itertools
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from ocr_service import WALL_THICKNESS_FACTOR
+from pricing_engine import (
+    ROOF_SLOPE_FACTOR, PriceBook, current_price_book, footprint_quantities, price_items, pricing_context,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    _numpy_available = True
+except ImportError as e:
+    logger.warning(f"NumPy not available, scenario pricing disabled: {e}")
+    _numpy_available = False
+
+SCENARIO_MAX_COUNT = int(os.environ.get("SCENARIO_MAX_COUNT", "10000"))
+
+SCENARIO_PARAMETERS = (
+    "roof_slope_factor", "foundation_per_m2", "site_overhead_pct", "contingency_pct", "wall_thickness_factor",
+)
+_COLUMN = {name: idx for idx, name in enumerate(SCENARIO_PARAMETERS)}
+_SHARES = ("site_overhead_pct", "contingency_pct")
+
+_MARKUP_PARAMETER = {"admin-site-overhead": "site_overhead_pct", "admin-contingency": "contingency_pct"}
+
+
+class ScenarioError(ValueError):
+    """Invalid scenario parameters (unknown name, bad value, too many scenarios)."""
+
+
+def scenario_defaults(book: Optional[PriceBook] = None) -> Dict[str, float]:
+    """The parameter values the estimate is priced with under book (default: the active book)."""
+    book = book or current_price_book()
+    return {
+        "roof_slope_factor": ROOF_SLOPE_FACTOR,
+        "foundation_per_m2": book.pricing["foundation_per_m2"],
+        "site_overhead_pct": book.efficiency["site_overhead_pct"]["jb_villan"],
+        "contingency_pct": book.efficiency["contingency_pct"]["jb_villan"],
+        "wall_thickness_factor": WALL_THICKNESS_FACTOR,
+    }
+
+
+@dataclass
+class ScenarioResult:
+    """Line item quantities and totals per scenario (rows) and item (columns)."""
+    parameters: "np.ndarray"   # scenarios × SCENARIO_PARAMETERS
+    item_ids: List[str]
+    quantities: "np.ndarray"   # scenarios × items
+    totals: "np.ndarray"       # scenarios × items
+    total_cost: "np.ndarray"   # per scenario
+    total_area: "np.ndarray"   # gross m² per scenario
+
+    def to_dict(self, include_items: bool = True) -> Dict:
+        cost_per_m2 = np.divide(
+            self.total_cost, self.total_area, out=np.zeros_like(self.total_cost), where=self.total_area > 0
+        )
+        result = {
+            "parameters": list(SCENARIO_PARAMETERS),
+            "scenarios": self.parameters.tolist(),
+            "totalCost": self.total_cost.tolist(),
+            "totalArea": self.total_area.tolist(),
+            "costPerM2": np.round(cost_per_m2).tolist(),
+            "itemIds": self.item_ids,
+        }
+        if include_items:
+            result["items"] = self.totals.tolist()
+        return result
+
+
+def build_parameter_matrix(
+    scenarios: Optional[List[Dict[str, float]]] = None,
+    sweep: Optional[Dict[str, List[float]]] = None,
+    book: Optional[PriceBook] = None,
+) -> "np.ndarray":
+    """
+    Scenario rows: the defaults, then each explicit scenario, then every
+    combination of the sweep values (cartesian product). Parameters a
+    scenario leaves out keep their default (under book, default: the active book).
+    """
+    scenarios = scenarios or []
+    sweep = sweep or {}
+    for name in itertools.chain(sweep, *scenarios):
+        if name not in _COLUMN:
+            raise ScenarioError(f"Unknown scenario parameter '{name}'. Valid: {', '.join(SCENARIO_PARAMETERS)}")
+
+    sweep_count = 1
+    for values in sweep.values():
+        sweep_count *= len(values)
+    count = 1 + len(scenarios) + (sweep_count if sweep else 0)
+    if count > SCENARIO_MAX_COUNT:
+        raise ScenarioError(f"{count} scenarios requested, at most {SCENARIO_MAX_COUNT} allowed")
+
+    defaults = scenario_defaults(book)
+    defaults = np.array([defaults[name] for name in SCENARIO_PARAMETERS], dtype=float)
+    matrix = np.tile(defaults, (count, 1))
+    for row, scenario in enumerate(scenarios, start=1):
+        for name, value in scenario.items():
+            matrix[row, _COLUMN[name]] = value
+    if sweep:
+        grids = np.meshgrid(*[np.asarray(values, dtype=float) for values in sweep.values()], indexing="ij")
+        rows = slice(1 + len(scenarios), count)
+        for name, grid in zip(sweep, grids):
+            matrix[rows, _COLUMN[name]] = grid.ravel()
+
+    if not np.isfinite(matrix).all() or (matrix < 0).any():
+        raise ScenarioError("Scenario parameters must be finite, non-negative numbers")
+    shares = matrix[:, [_COLUMN[name] for name in _SHARES]]
+    if (shares > 1).any():
+        raise ScenarioError(f"{' and '.join(_SHARES)} are fractions of the subtotal (0-1)")
+    return matrix
+
+
+def price_scenarios(
+    rooms: List[Dict],
+    summary: Dict[str, float],
+    parameters: "np.ndarray",
+    book: Optional[PriceBook] = None,
+) -> ScenarioResult:
+    """Price one room set under every scenario row of `parameters` in one pass."""
+    book = book or current_price_book()
+    ctx = pricing_context(rooms, summary)
+    items = price_items(rooms, summary, book)
+    item_ids = [item["id"] for item in items]
+    column = {item_id: idx for idx, item_id in enumerate(item_ids)}
+    count = parameters.shape[0]
+
+    quantities = np.tile(np.array([item["quantity"] for item in items]), (count, 1))
+    totals = np.tile(np.array([item["totalCost"] for item in items]), (count, 1))
+
+    # The footprint scales with the wall thickness factor relative to the default
+    byggyta = ctx["byggyta"] * parameters[:, _COLUMN["wall_thickness_factor"]] / WALL_THICKNESS_FACTOR
+    footprint = footprint_quantities(byggyta)
+    for item_id, idx in column.items():
+        line = book.lines.get(item_id)
+        if line is not None and line.pricing != "fixed" and line.quantity in footprint:
+            quantity = footprint[line.quantity]
+            quantities[:, idx] = quantity
+            totals[:, idx] = np.rint(quantity * line.unit_price) if line.pricing == "per_unit" else quantity * line.unit_price
+    if "structure-roof" in column:
+        roof_area = np.round(byggyta * parameters[:, _COLUMN["roof_slope_factor"]], 1)
+        quantities[:, column["structure-roof"]] = roof_area
+        totals[:, column["structure-roof"]] = np.rint(roof_area * book.lines["structure-roof"].unit_price)
+    if "ground-foundation" in column:
+        totals[:, column["ground-foundation"]] = np.rint(byggyta * parameters[:, _COLUMN["foundation_per_m2"]])
+
+    # Markups are shares of the subtotal of all other lines
+    subtotal = totals[:, :len(items) - len(book.markups)].sum(axis=1)
+    for markup in book.markups:
+        share = parameters[:, _COLUMN[_MARKUP_PARAMETER[markup.id]]]
+        totals[:, column[markup.id]] = np.rint(subtotal * share)
+
+    total_net = sum(room["area"] for room in rooms)
+    return ScenarioResult(
+        parameters=parameters,
+        item_ids=item_ids,
+        quantities=quantities,
+        totals=totals,
+        total_cost=totals.sum(axis=1),
+        total_area=np.round(total_net * parameters[:, _COLUMN["wall_thickness_factor"]], 1),
+    )
@@ -0,0 +1,15 @@
+"""Shared pytest fixtures for the backend tests."""
+import os
+
+import pytest
+
+from helpers import OCR_FIXTURES, ocr_result
+
+os.environ.setdefault("API_KEY", "test-key")
+
+
+@pytest.fixture(params=sorted(OCR_FIXTURES), ids=lambda plan: plan)
+def plan_ocr(request):
+    """(plan filename, full_text, text_blocks) for each sample plan."""
+    full_text, text_blocks = ocr_result(OCR_FIXTURES[request.param])
+    return request.param, full_text, text_blocks
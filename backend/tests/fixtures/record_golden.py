@@ -0,0 +1,57 @@
+"""
+Record Golden Pipeline Values
+=============================
+Runs every recorded OCR fixture through the deterministic pipeline (fake
+Document AI processor, no network) and stores the per-plan summary areas,
+equipment, pricing totals and area totals in tests/fixtures/golden_pipeline.json.
+
+Only re-record after an intentional change to parsing or pricing, and review
+the diff: every changed number is a changed estimate for that plan.
+
+Usage:
+    python tests/fixtures/record_golden.py
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(TESTS_DIR)
+
+from helpers import FIXTURE_DIR, OCR_FIXTURE_DIR, OCR_FIXTURES, REPO_ROOT  # noqa: E402
+
+
+async def golden_values(plan: str, fixture: dict) -> dict:
+    from ocr_service import analyze_floor_plan_deterministic, parse_summary_areas
+
+    with open(os.path.join(REPO_ROOT, plan), "rb") as f:
+        content = f.read()
+    result = await analyze_floor_plan_deterministic(content, fixture["mime_type"])
+    return {
+        "summary": parse_summary_areas(fixture["text"]),
+        "equipment": result["equipment"],
+        "itemCount": len(result["items"]),
+        "totalCost": round(sum(item["totalCost"] for item in result["items"]), 2),
+        "totalArea": result["totalArea"],
+        "boa": result["boa"],
+        "biarea": result["biarea"],
+    }
+
+
+def main():
+    from fake_documentai import FakeDocumentProcessor
+    from ocr_service import set_documentai_async_client
+
+    logging.disable(logging.WARNING)
+    set_documentai_async_client(FakeDocumentProcessor.from_fixture_dir(OCR_FIXTURE_DIR))
+    golden = {plan: asyncio.run(golden_values(plan, fixture)) for plan, fixture in OCR_FIXTURES.items()}
+    with open(os.path.join(FIXTURE_DIR, "golden_pipeline.json"), "w", encoding="utf-8") as f:
+        json.dump(golden, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    print(f"Recorded golden values for {len(golden)} plans")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Record OCR Fixtures
+===================
+Runs the sample floor plans in the repo root through Document AI and stores
+the (text, blocks) result as fixtures in tests/fixtures/ocr/.
+
+The checked-in fixtures were transcribed by hand from the plans (origin
+"transcribed"); re-recording replaces them with real Document AI output
+(origin "documentai"). Expected values in the tests must be re-checked after
+re-recording.
+
+Usage (needs Document AI credentials and DOCUMENTAI_PROCESSOR_ID):
+    python tests/fixtures/record_ocr_fixtures.py [plan ...]
+"""
+import os
+import sys
+import json
+import hashlib
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+FIXTURE_DIR = os.path.join(BACKEND_DIR, "tests", "fixtures", "ocr")
+sys.path.append(BACKEND_DIR)
+
+SAMPLE_PLANS = [
+    "01.jpg", "02.jpg", "1324.png", "1328.jpg", "1329.jpg", "1334.jpg",
+    "1347.jpg", "1352.jpg", "1355.png", "1369.jpg", "1405.jpg",
+]
+MIME_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".pdf": "application/pdf"}
+
+
+def fixture_path(plan: str) -> str:
+    return os.path.join(FIXTURE_DIR, f"plan_{os.path.splitext(plan)[0]}.json")
+
+
+def write_fixture(path: str, fixture: dict) -> None:
+    """Write a fixture with one block per line, so diffs stay readable."""
+    header = {key: value for key, value in fixture.items() if key != "blocks"}
+    lines = [json.dumps(header, ensure_ascii=False, indent=1)[:-2] + ',\n "blocks": [']
+    lines.append(",\n".join("  " + json.dumps(block, ensure_ascii=False) for block in fixture["blocks"]))
+    lines.append(" ]\n}\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def record(plan: str) -> None:
+    from ocr_service import extract_text_with_bounding_boxes
+
+    with open(os.path.join(REPO_ROOT, plan), "rb") as f:
+        content = f.read()
+    mime_type = MIME_TYPES[os.path.splitext(plan)[1].lower()]
+    text, blocks = extract_text_with_bounding_boxes(content, mime_type)
+    if not text:
+        raise SystemExit(f"Document AI returned no text for {plan}")
+
+    write_fixture(fixture_path(plan), {
+        "source": plan,
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "mime_type": mime_type,
+        "origin": "documentai",
+        "text": text,
+        "blocks": blocks,
+    })
+    print(f"Recorded {plan}: {len(blocks)} blocks")
+
+
+if __name__ == "__main__":
+    for plan in sys.argv[1:] or SAMPLE_PLANS:
+        record(plan)
@@ -0,0 +1,103 @@
+"""
+Record Pricing Regression Cases
+===============================
+Prices the rooms and summary areas of every sample plan, plus synthetic
+edge cases (no rooms, no summary areas, terraces, biarea-only plans), and
+stores the inputs with the resulting line items in
+tests/fixtures/pricing_regression.json.
+
+Each case keeps [id, quantity, totalCost] per line item for readable diffs,
+and a SHA-256 of the full serialized item list (every field, in order), so
+any change to a description, breakdown or price source is caught too.
+
+The items come from the hand-written calculate_pricing the pricing engine
+replaced, loaded from git the same way benchmarks/bench_pricing.py does, so
+the fixture checks the engine against that implementation and never
+against itself.
+
+Usage:
+    python tests/fixtures/record_pricing.py [--baseline REVISION]
+"""
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(TESTS_DIR)
+
+from helpers import FIXTURE_DIR, OCR_FIXTURES, ocr_result  # noqa: E402
+
+
+def room(name: str, area: float, category: str) -> dict:
+    return {"name": name, "area": area, "category": category}
+
+
+NO_SUMMARY = {"boyta": 0, "bta": 0, "biyta": 0, "byggyta": 0}
+
+SYNTHETIC_CASES = [
+    {"name": "empty", "rooms": [], "summary": NO_SUMMARY},
+    {"name": "empty-with-summary", "rooms": [], "summary": {**NO_SUMMARY, "boyta": 120.0, "byggyta": 150.0}},
+    {"name": "rooms-without-summary", "summary": NO_SUMMARY, "rooms": [
+        room("SOV 1", 12.3, "bedroom"), room("SOV 2", 9.1, "bedroom"), room("VARDAGSRUM", 28.4, "living"),
+        room("KÖK", 14.0, "kitchen"), room("BAD", 5.2, "bathroom"), room("WC/D", 3.1, "bathroom"),
+        room("TVÄTT", 6.0, "laundry"), room("HALL", 7.5, "entry"),
+    ]},
+    {"name": "terrace-garage-storage", "summary": {**NO_SUMMARY, "boyta": 98.6, "bta": 140.2}, "rooms": [
+        room("SOVRUM", 11.0, "bedroom"), room("ALLRUM", 22.0, "living"), room("BAD", 4.8, "bathroom"),
+        room("GARAGE", 24.5, "garage"), room("FÖRRÅD", 6.2, "storage"), room("TEKNIK", 3.4, "utility"),
+        room("ALTAN", 18.75, "terrace"), room("UTEPLATS", 9.5, "terrace"), room("KLK", 2.1, "closet"),
+    ]},
+    {"name": "biarea-only", "summary": NO_SUMMARY, "rooms": [
+        room("GARAGE", 30.0, "garage"), room("FÖRRÅD", 8.0, "storage"),
+    ]},
+    {"name": "laundry-no-kitchen", "summary": {**NO_SUMMARY, "byggyta": 60.0}, "rooms": [
+        room("TVÄTT", 7.0, "laundry"), room("HALL", 4.0, "entry"), room("OKÄND", 5.5, "other"),
+    ]},
+]
+
+
+def serialize(items) -> list:
+    return [item.model_dump() if hasattr(item, "model_dump") else item for item in items]
+
+
+def digest(item_dicts: list) -> str:
+    payload = json.dumps(item_dicts, ensure_ascii=False, sort_keys=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def plan_cases() -> list:
+    from ocr_service import parse_rooms_with_spatial_matching, parse_summary_areas
+
+    cases = []
+    for plan, fixture in OCR_FIXTURES.items():
+        full_text, text_blocks = ocr_result(fixture)
+        rooms = [room(r["name"], r["area"], r["category"]) for r in parse_rooms_with_spatial_matching(text_blocks)]
+        cases.append({"name": plan, "rooms": rooms, "summary": parse_summary_areas(full_text)})
+    return cases
+
+
+def main():
+    from benchmarks.bench_pricing import BASELINE_REVISION, load_baseline
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=BASELINE_REVISION, help="git revision of the hand-written pricing")
+    args = parser.parse_args()
+    calculate_pricing = load_baseline(args.baseline)
+
+    logging.disable(logging.WARNING)
+    cases = plan_cases() + SYNTHETIC_CASES
+    for case in cases:
+        item_dicts = serialize(calculate_pricing(case["rooms"], case["summary"]))
+        case["items"] = [[item["id"], item["quantity"], item["totalCost"]] for item in item_dicts]
+        case["digest"] = digest(item_dicts)
+    with open(os.path.join(FIXTURE_DIR, "pricing_regression.json"), "w", encoding="utf-8") as f:
+        json.dump(cases, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    print(f"Recorded {len(cases)} pricing cases")
+
+
+if __name__ == "__main__":
+    main()
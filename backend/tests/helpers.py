@@ -0,0 +1,42 @@
+"""Loaders for the recorded sample-plan fixtures, shared by tests and benchmarks."""
+import os
+import sys
+import json
+import glob
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)  # Sample plan images live here
+FIXTURE_DIR = os.path.join(BACKEND_DIR, "tests", "fixtures")
+OCR_FIXTURE_DIR = os.path.join(FIXTURE_DIR, "ocr")
+
+# Backend modules are imported the same way main.py does
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+
+def load_json(name: str):
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_ocr_fixtures():
+    """Recorded OCR results for the sample plans, keyed by plan filename."""
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(OCR_FIXTURE_DIR, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            fixture = json.load(f)
+        fixtures[fixture["source"]] = fixture
+    return fixtures
+
+
+def ocr_result(fixture):
+    """(full_text, text_blocks) exactly as the Document AI path would produce them."""
+    from fake_documentai import build_document
+    from ocr_service import _document_to_text_blocks
+    return _document_to_text_blocks(build_document(fixture["text"], fixture["blocks"]))
+
+
+OCR_FIXTURES = load_ocr_fixtures()
+
+# [room name, area] pairs as printed on each sample plan
+EXPECTED_ROOMS = load_json("expected_rooms.json")
@@ -0,0 +1,165 @@
+"""POST /analyze/batch: bounded concurrency, dedup, per-file errors and NDJSON streaming."""
+import io
+import os
+import json
+import struct
+import asyncio
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+import ocr_service
+from fake_documentai import FakeDocumentProcessor
+from ocr_service import set_documentai_async_client
+
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+
+
+class TrackingProcessor(FakeDocumentProcessor):
+    """Fake processor with a delay per upload that records how many calls overlap."""
+
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = delays
+        self.in_flight = 0
+        self.peak = 0
+
+    async def process_document(self, request=None, timeout=None, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(request.raw_document.content, 0))
+            return await super().process_document(request=request, timeout=timeout)
+        finally:
+            self.in_flight -= 1
+
+
+def png(tag: str) -> bytes:
+    return b"\x89PNG\r\n\x1a\n" + tag.encode()
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """Posts files to /analyze/batch with OCR answered by a TrackingProcessor; returns (lines, summary)."""
+    monkeypatch.setattr(ocr_service, "get_ocr_cache", lambda: None)  # Every analysis reaches the processor
+    main.limiter.reset()
+    processors = []
+
+    def post(files, delays=None, **params):
+        processor = TrackingProcessor(delays or {})
+        processors.append(processor)
+        set_documentai_async_client(processor)
+        try:
+            response = TestClient(main.app).post(
+                "/analyze/batch", params=params, headers=HEADERS,
+                files=[("files", (name, content, "image/png")) for name, content in files],
+            )
+        finally:
+            set_documentai_async_client(None)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        return processor, lines[:-1], lines[-1]
+
+    yield post
+    main.limiter.reset()
+
+
+def test_parallelism_bounds_concurrent_analyses(batch):
+    files = [(f"{i}.png", png(f"plan {i}")) for i in range(6)]
+    processor, lines, summary = batch(files, {content: 0.05 for _, content in files}, parallelism=2)
+    assert processor.peak == 2
+    assert processor.calls == 6
+    assert summary["count"] == 6 and summary["failed"] == 0
+    assert all(line["status"] == "ok" for line in lines)
+
+
+def test_identical_uploads_are_analyzed_once(batch):
+    same = png("same plan")
+    processor, lines, summary = batch([("a.png", same), ("b.png", same), ("c.png", png("other")), ("d.png", same)])
+    assert processor.calls == 2
+    by_name = {line["filename"]: line for line in lines}
+    assert by_name["a.png"]["result"] == by_name["b.png"]["result"] == by_name["d.png"]["result"]
+    assert summary["count"] == 4
+
+
+def test_failures_are_isolated_per_file(batch, monkeypatch):
+    analyze = main.analyze_floor_plan_deterministic
+
+    async def failing_analysis(contents, mime_type, content_hash, **kwargs):
+        if contents == png("crashes"):
+            raise RuntimeError("parser bug")
+        return await analyze(contents, mime_type, content_hash, **kwargs)
+
+    monkeypatch.setattr(main, "analyze_floor_plan_deterministic", failing_analysis)
+    files = [("ok.png", png("fine")), ("text.png", b"plain text, not an image"), ("crash.png", png("crashes"))]
+    _, lines, summary = batch(files)
+
+    by_name = {line["filename"]: line for line in lines}
+    assert by_name["ok.png"]["status"] == "ok"
+    assert by_name["text.png"] == {"index": 1, "filename": "text.png", "status": "error", "error": "Invalid file type: unknown"}
+    assert by_name["crash.png"] == {"index": 2, "filename": "crash.png", "status": "error", "error": "Analysis failed"}
+    assert summary["done"] and summary["failed"] == 2
+
+
+def test_results_stream_in_completion_order(batch):
+    files = [("slow.png", png("slow")), ("medium.png", png("medium")), ("fast.png", png("fast"))]
+    delays = {png("slow"): 0.3, png("medium"): 0.15, png("fast"): 0}
+    _, lines, summary = batch(files, delays)
+    assert [line["filename"] for line in lines] == ["fast.png", "medium.png", "slow.png"]
+    assert [line["index"] for line in lines] == [2, 1, 0]  # Index ties each line to its upload
+    assert summary["count"] == 3
+
+
+def make_zip(members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def no_member_reads(monkeypatch):
+    def read(self, *args, **kwargs):
+        raise AssertionError("member decompressed before the archive was checked")
+    monkeypatch.setattr(zipfile.ZipFile, "read", read)
+
+
+def test_zips_with_too_many_members_are_rejected_before_decompressing(no_member_reads, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_FILES", 3)
+    archive = make_zip([(f"plan-{i}.png", png(f"plan {i}")) for i in range(4)] + [("notes.txt", b"skipped")])
+    with pytest.raises(HTTPException) as error:
+        main.expand_zip_upload("plans.zip", archive, 3)
+    assert error.value.status_code == 413
+
+    main.limiter.reset()
+    response = TestClient(main.app).post(
+        "/analyze/batch", headers=HEADERS,
+        files=[("files", ("plans.zip", archive, "application/zip"))],
+    )
+    assert response.status_code == 413
+
+
+def test_zips_expanding_past_the_batch_budget_are_rejected(no_member_reads, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_BODY_SIZE", 4096)
+    archive = make_zip([("a.png", png("a") + bytes(3000)), ("b.png", png("b") + bytes(3000))])  # Compresses to ~100 bytes
+    with pytest.raises(HTTPException) as error:
+        main.expand_zip_upload("plans.zip", archive, 10)
+    assert error.value.status_code == 413
+
+
+def test_unreadable_zip_members_are_per_file_errors():
+    data = bytearray(make_zip([("locked.png", png("a")), ("aes.png", png("b")), ("ok.png", png("c"))]))
+    first = data.find(b"PK\x01\x02")  # Central directory entries
+    second = data.find(b"PK\x01\x02", first + 4)
+    data[first + 8:first + 10] = struct.pack("<H", 0x1)  # Flagged as encrypted
+    data[second + 10:second + 12] = struct.pack("<H", 99)  # AES: compression method zipfile cannot read
+
+    entries = main.expand_zip_upload("plans.zip", bytes(data), 10)
+    assert [entry["filename"] for entry in entries] == ["plans.zip/locked.png", "plans.zip/aes.png", "plans.zip/ok.png"]
+    assert entries[0]["error"].startswith("Unreadable zip member") and entries[1]["error"].startswith("Unreadable zip member")
+    assert entries[2]["contents"] == png("c")
@@ -0,0 +1,43 @@
+"""Precompiled OCR block classifier: same answers as the per-pattern loop it replaced."""
+import pytest
+
+from benchmarks.bench_block_classifier import legacy_classify, make_corpus
+from helpers import OCR_FIXTURES, ocr_result
+from ocr_service import BLOCK_AREA, BLOCK_COMBINED, BLOCK_DIMENSION, BLOCK_ROOM, classify_text_block
+
+
+def golden_blocks():
+    """Every recorded block text of every sample plan, normalized as parse_rooms_with_spatial_matching does."""
+    texts = set()
+    for fixture in OCR_FIXTURES.values():
+        _, blocks = ocr_result(fixture)
+        texts.update(block["text"].upper().strip() for block in blocks)
+    return sorted(texts)
+
+
+@pytest.mark.parametrize("plan", sorted(OCR_FIXTURES))
+def test_matches_the_per_pattern_loop_on_the_golden_corpus(plan):
+    _, blocks = ocr_result(OCR_FIXTURES[plan])
+    texts = [block["text"].upper().strip() for block in blocks]
+    assert [classify_text_block(text) for text in texts] == [legacy_classify(text) for text in texts]
+
+
+def test_matches_the_per_pattern_loop_on_synthetic_blocks():
+    corpus = make_corpus(3000) + golden_blocks()
+    mismatches = [text for text in corpus if classify_text_block(text) != legacy_classify(text)]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("SOV 1 12,3 M²", (BLOCK_COMBINED, "SOV 1", 12.3)),
+    ("KÖK / MATPLATS 24.5 M²", (BLOCK_COMBINED, "KÖK / MATPLATS", 24.5)),
+    ("SOV 1 250 M²", (None, None, None)),  # Implausible area, and too long for a room label
+    ("WC/D 1", (BLOCK_ROOM, "WC/D 1", None)),
+    ("12,8 M²", (BLOCK_AREA, None, 12.8)),
+    ("2/4 M²", (BLOCK_AREA, None, 2.4)),  # "." misread as "/"
+    ("10X21", (BLOCK_DIMENSION, None, None)),
+    ("SEKTION A-A", (None, None, None)),
+])
+def test_known_blocks(text, expected):
+    assert classify_text_block(text) == expected
+    assert legacy_classify(text) == expected
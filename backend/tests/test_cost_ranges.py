@@ -0,0 +1,72 @@
+"""Monte Carlo cost ranges from the PriceReference market ranges."""
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import cost_ranges  # noqa: E402
+from cost_ranges import _item_range, relative_range, simulate_cost_range  # noqa: E402
+from helpers import load_json  # noqa: E402
+from pricing_engine import current_price_book, price_items  # noqa: E402
+from standards.pricing_references_2025 import EXCAVATION_PER_M2  # noqa: E402
+
+CASE = load_json("pricing_regression.json")[0]
+SAMPLES = 20000
+
+
+def test_relative_range():
+    assert relative_range(EXCAVATION_PER_M2) == (0.5, 1.5)
+    assert relative_range(None) is None
+
+
+def test_bands_are_ordered_and_reproducible():
+    result = simulate_cost_range(CASE["rooms"], CASE["summary"], SAMPLES, seed=7)
+    assert result == simulate_cost_range(CASE["rooms"], CASE["summary"], SAMPLES, seed=7)
+    total = result["total"]
+    assert total["p10"] < total["p50"] < total["p90"]
+    assert total["point"] == round(sum(item["totalCost"] for item in price_items(CASE["rooms"], CASE["summary"])))
+    assert set(result["phases"]) == {"ground", "structure", "interior", "plumbing", "electrical", "admin"}
+    for bands in result["phases"].values():
+        assert bands["p10"] <= bands["p50"] <= bands["p90"]
+
+
+def test_mean_matches_expected_triangular_mean():
+    # E[triangular(low, 1, high)] = (low + 1 + high) / 3 per line, markups on top
+    items = price_items(CASE["rooms"], CASE["summary"])
+    markups = current_price_book().markups
+    markup_ids = {markup.id for markup in markups}
+    expected = sum(
+        item["totalCost"] * (sum(_item_range(item)) + 1) / 3 if _item_range(item) else item["totalCost"]
+        for item in items if item["id"] not in markup_ids
+    ) * (1 + sum(markup.efficiency["jb_villan"] for markup in markups))
+    result = simulate_cost_range(CASE["rooms"], CASE["summary"], SAMPLES, seed=1)
+    assert result["total"]["mean"] == pytest.approx(expected, rel=0.002)
+
+
+def test_without_ranges_the_band_collapses_to_the_point(monkeypatch):
+    monkeypatch.setattr(cost_ranges, "_book_ranges", lambda book: ({}, {}))
+    total = simulate_cost_range(CASE["rooms"], CASE["summary"], 1000, seed=1)["total"]
+    assert total["p10"] == total["p90"] == pytest.approx(total["point"], abs=2)
+
+
+def test_area_uncertainty_widens_the_band():
+    narrow = simulate_cost_range(CASE["rooms"], CASE["summary"], SAMPLES, seed=3)["total"]
+    wide = simulate_cost_range(CASE["rooms"], CASE["summary"], SAMPLES, area_uncertainty=0.1, seed=3)["total"]
+    assert wide["p90"] - wide["p10"] > narrow["p90"] - narrow["p10"]
+
+
+def test_cost_range_endpoint():
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    body = {"rooms": CASE["rooms"], "summary": CASE["summary"], "samples": 5000, "seed": 2}
+    response = client.post("/projects/p1/cost-range", json=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["projectId"] == "p1"
+    assert response.json()["total"]["p50"] > 0
+
+    response = client.post("/projects/p1/cost-range", json={**body, "samples": 10**7}, headers=headers)
+    assert response.status_code == 422
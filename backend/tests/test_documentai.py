@@ -0,0 +1,165 @@
+"""Document AI clients: the pooled synchronous clients and the native async path."""
+import os
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import main
+import ocr_service
+from fake_documentai import FakeDocumentProcessor
+from ocr_service import DocumentAIClientPool, set_documentai_async_client
+
+
+class FakeClient:
+    """DocumentProcessorServiceClient stand-in; fails the next `failures` calls with a transport error."""
+    created = []
+    failures_when_created = 0
+
+    def __init__(self, client_options):
+        self.endpoint = client_options["api_endpoint"]
+        self.transport = SimpleNamespace(close=self.close)
+        self.failures = self.failures_when_created
+        self.calls = 0
+        self.closed = False
+        FakeClient.created.append(self)
+
+    def close(self):
+        self.closed = True
+
+    def process_document(self, request):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise google_exceptions.ServiceUnavailable("channel closed")
+        return SimpleNamespace(document=f"document from client {FakeClient.created.index(self)}")
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeClient.created = []
+    monkeypatch.setattr(ocr_service.documentai, "DocumentProcessorServiceClient", FakeClient)
+    monkeypatch.setattr(ocr_service, "PROCESSOR_NAME", "projects/p/locations/eu/processors/x")
+    pool = DocumentAIClientPool(2, "eu-documentai.googleapis.com")
+    monkeypatch.setattr(ocr_service, "_client_pool", pool)
+    return pool
+
+
+def test_clients_are_created_once_and_reused(pool):
+    documents = [ocr_service._process_document(b"plan", "image/png") for _ in range(5)]
+    assert len(FakeClient.created) == 2  # One per slot, however many requests
+    assert [client.calls for client in FakeClient.created] == [3, 2]
+    assert documents[:2] == ["document from client 0", "document from client 1"]
+    assert FakeClient.created[0].endpoint == "eu-documentai.googleapis.com"
+    assert pool.stats() == {"endpoint": "eu-documentai.googleapis.com", "size": 2, "connected": 2, "reconnects": 0}
+
+
+def test_transport_errors_rebuild_the_client(pool):
+    slot, broken = pool.acquire()
+    broken.failures = 1
+    pool.acquire()  # The next call lands on the broken slot again
+
+    assert ocr_service._process_document(b"plan", "image/png") == "document from client 1"  # Retried on the other slot
+    assert broken.closed and pool.stats()["connected"] == 1
+    assert ocr_service._process_document(b"plan", "image/png") == "document from client 2"  # Slot reconnected
+    assert pool._clients[slot] is FakeClient.created[2]
+    assert pool.stats()["reconnects"] == 1
+
+    pool.reset(slot, broken)  # A stale reset (another thread already replaced it) is ignored
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_repeated_transport_errors_are_raised(pool, monkeypatch):
+    monkeypatch.setattr(FakeClient, "failures_when_created", 1)
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        ocr_service._process_document(b"plan", "image/png")
+    assert len(FakeClient.created) == 2  # Retried once on a fresh connection
+    assert pool.stats() == {"endpoint": pool.endpoint, "size": 2, "connected": 0, "reconnects": 2}
+
+
+def png(tag: bytes) -> bytes:
+    """A PNG-signed upload unique to the test, so earlier OCR cache entries never answer it."""
+    return b"\x89PNG\r\n\x1a\n" + tag + os.urandom(8)
+
+
+@pytest.fixture
+def fake_processor():
+    processor = FakeDocumentProcessor(delay=5)
+    set_documentai_async_client(processor)
+    yield processor
+    set_documentai_async_client(None)
+
+
+def test_async_calls_past_their_deadline_return_no_text(fake_processor):
+    started = time.perf_counter()
+    result = asyncio.run(ocr_service.extract_text_with_bounding_boxes_async(png(b"slow"), "image/png", timeout=0.05))
+    assert result == ("", [])
+    assert time.perf_counter() - started < 1
+    assert fake_processor.calls == 1
+
+
+def test_async_results_come_from_the_processor():
+    processor = FakeDocumentProcessor()
+    content = png(b"fixture")
+    processor.add_fixture(content, "SOV 1\n12,3 m²", [{"text": "SOV 1", "x": 0.3, "y": 0.4, "level": "line"}])
+    set_documentai_async_client(processor)
+    try:
+        text, blocks = asyncio.run(ocr_service.extract_text_with_bounding_boxes_async(content, "image/png"))
+    finally:
+        set_documentai_async_client(None)
+    assert text.startswith("SOV 1")
+    assert "SOV 1" in [block["text"] for block in blocks]
+
+
+def test_fake_processor_works_without_the_sdk(monkeypatch):
+    monkeypatch.setattr(ocr_service, "_documentai_available", False)
+    monkeypatch.delattr(ocr_service, "documentai")
+    processor = FakeDocumentProcessor()
+    content = png(b"no sdk")
+    processor.add_fixture(content, "KÖK\n14,0 m²", [{"text": "KÖK", "x": 0.5, "y": 0.5, "level": "line"}])
+    set_documentai_async_client(processor)
+    try:
+        text, blocks = asyncio.run(ocr_service.extract_text_with_bounding_boxes_async(content, "image/png"))
+    finally:
+        set_documentai_async_client(None)
+    assert text.startswith("KÖK") and processor.calls == 1
+
+
+def post_then_disconnect(app, path, filename, content):
+    """Drive one multipart POST through the ASGI app; the client is gone once the body is sent."""
+    boundary = "kgvilla-test-boundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: image/png\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"x-api-key", os.environ["API_KEY"].encode()),
+            (b"content-type", f"multipart/form-data; boundary={boundary}".encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return next(message["status"] for message in sent if message["type"] == "http.response.start")
+
+
+def test_client_disconnect_cancels_the_ocr_call(fake_processor, monkeypatch):
+    monkeypatch.setattr(main, "DISCONNECT_POLL_SECONDS", 0.01)
+    started = time.perf_counter()
+    status = post_then_disconnect(main.app, "/analyze", "plan.png", png(b"disconnect"))
+    assert status == 499
+    assert time.perf_counter() - started < 2  # Not the 5s the OCR call would take
+    assert (fake_processor.calls, fake_processor.cancelled) == (1, 1)
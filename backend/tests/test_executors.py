@@ -0,0 +1,65 @@
+"""Bounded per-backend thread pools for blocking calls."""
+import time
+import asyncio
+import threading
+import contextvars
+
+import pytest
+
+import executors
+from executors import get_executor, get_executor_stats, run_blocking
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_executors(monkeypatch):
+    monkeypatch.setattr(executors, "_executors", {})
+    monkeypatch.setattr(executors, "BACKEND_WORKERS", {"slow": 2, "other": 1})
+    yield
+    executors.shutdown_executors()
+
+
+def test_concurrency_is_bounded_per_backend():
+    lock = threading.Lock()
+    running = {"slow": 0, "other": 0}
+    peak = {"slow": 0, "other": 0, "total": 0}
+
+    def call(backend):
+        with lock:
+            running[backend] += 1
+            peak[backend] = max(peak[backend], running[backend])
+            peak["total"] = max(peak["total"], sum(running.values()))
+        time.sleep(0.05)
+        with lock:
+            running[backend] -= 1
+        return backend
+
+    async def scenario():
+        calls = [run_blocking("slow", call, "slow") for _ in range(6)] + [run_blocking("other", call, "other") for _ in range(3)]
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(scenario()) == ["slow"] * 6 + ["other"] * 3
+    assert peak == {"slow": 2, "other": 1, "total": 3}  # Each pool is capped; one does not starve the other
+    stats = get_executor_stats()
+    assert stats["slow"]["completed"] == 6
+    assert stats["other"]["max_workers"] == 1
+    assert get_executor("unknown").max_workers == executors.DEFAULT_WORKERS
+
+
+def test_exceptions_propagate_from_the_worker():
+    def fail(message):
+        raise RuntimeError(message)
+
+    with pytest.raises(RuntimeError, match="transport down"):
+        asyncio.run(run_blocking("slow", fail, "transport down"))
+    stats = get_executor_stats()["slow"]
+    assert (stats["failed"], stats["completed"], stats["active"], stats["queued"]) == (1, 0, 0, 0)
+
+
+def test_context_variables_reach_the_worker():
+    async def scenario():
+        request_id.set("req-1")
+        return await run_blocking("slow", request_id.get)
+
+    assert asyncio.run(scenario()) == "req-1"
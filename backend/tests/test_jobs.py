@@ -0,0 +1,101 @@
+"""Background analysis jobs: records, stages, back-pressure and worker restarts."""
+import asyncio
+
+import pytest
+
+from jobs import InMemoryJobStore, JobQueue, QueueFullError
+
+
+async def analyze_plan(contents, mime_type, content_hash, on_stage):
+    await on_stage("ocr_done")
+    if contents == b"broken":
+        raise ValueError("unreadable plan")
+    await on_stage("priced")
+    if contents == b"blank":
+        return {"items": [], "rooms": []}  # What an analysis of a page without text returns
+    return {"rooms": [{"name": "KÖK"}], "bytes": len(contents)}
+
+
+def test_jobs_record_each_stage_until_completed_or_failed():
+    async def scenario():
+        queue = JobQueue(InMemoryJobStore(), analyze_plan, workers=2)
+        ok = await queue.submit(b"plan", "image/png", "plan.png", "hash-1", "p1")
+        broken = await queue.submit(b"broken", "image/png", "broken.png", "hash-2", "p1")
+        blank = await queue.submit(b"blank", "image/png", "blank.png", "hash-3", "p1")
+        await queue._queue.join()
+        done = await queue.get(ok["id"]), await queue.get(broken["id"]), await queue.get(blank["id"])
+        await queue.shutdown()
+        return ok, done
+
+    submitted, (ok, broken, blank) = asyncio.run(scenario())
+    assert (submitted["status"], submitted["stage"], len(submitted["stages"])) == ("queued", "queued", 1)
+    assert ok["status"] == "completed"
+    assert [entry["stage"] for entry in ok["stages"]] == ["queued", "started", "ocr_done", "priced", "completed"]
+    assert ok["result"] == {"rooms": [{"name": "KÖK"}], "bytes": 4} and ok["error"] is None
+    assert (ok["filename"], ok["mimeType"], ok["contentHash"], ok["projectId"]) == ("plan.png", "image/png", "hash-1", "p1")
+    assert ok["updatedAt"] == ok["stages"][-1]["at"]
+
+    assert broken["status"] == "failed"
+    assert [entry["stage"] for entry in broken["stages"]] == ["queued", "started", "ocr_done", "failed"]
+    assert broken["error"] == "ValueError: analysis failed"  # No exception details leak to clients
+    assert broken["result"] is None
+
+    assert blank["status"] == "failed" and blank["stages"][-1]["stage"] == "failed"
+    assert (blank["error"], blank["result"]) == ("No rooms found in the floor plan", None)
+
+
+def test_full_queue_rejects_new_jobs():
+    async def scenario():
+        release, started = asyncio.Event(), asyncio.Event()
+
+        async def blocked(contents, mime_type, content_hash, on_stage):
+            started.set()
+            await release.wait()
+            return {"rooms": [{"name": "KÖK"}]}
+
+        store = InMemoryJobStore()
+        queue = JobQueue(store, blocked, workers=1, max_queued=1)
+        running = await queue.submit(b"a", "image/png", "a.png")
+        await started.wait()  # The only worker is busy
+        waiting = await queue.submit(b"b", "image/png", "b.png")
+        with pytest.raises(QueueFullError):
+            await queue.submit(b"c", "image/png", "c.png")
+        assert queue.queued() == 1
+
+        release.set()
+        await queue._queue.join()
+        late = await queue.submit(b"d", "image/png", "d.png")  # Room again once drained
+        await queue._queue.join()
+        statuses = [(await queue.get(job["id"]))["status"] for job in (running, waiting, late)]
+        await queue.shutdown()
+        return statuses, len(store._jobs)
+
+    statuses, stored = asyncio.run(scenario())
+    assert statuses == ["completed"] * 3
+    assert stored == 3  # The rejected upload left no record
+
+
+def test_workers_restart_on_a_new_loop_or_after_dying():
+    queue = JobQueue(InMemoryJobStore(), analyze_plan, workers=1)
+
+    async def submit_and_wait(contents):
+        job = await queue.submit(contents, "image/png", "plan.png")
+        await queue._queue.join()
+        return (await queue.get(job["id"]))["status"], queue._tasks
+
+    first, first_tasks = asyncio.run(submit_and_wait(b"one"))
+    second, second_tasks = asyncio.run(submit_and_wait(b"two"))  # The first loop and its workers are gone
+    assert first == second == "completed"
+    assert first_tasks is not second_tasks
+
+    async def after_crash():
+        await submit_and_wait(b"three")
+        for task in queue._tasks:
+            task.cancel()
+        await asyncio.sleep(0)
+        result = await submit_and_wait(b"four")
+        await queue.shutdown()
+        return result
+
+    status, _ = asyncio.run(after_crash())
+    assert status == "completed"
@@ -0,0 +1,110 @@
+"""Pure ASGI logging middleware, request ID propagation and the JSON log format."""
+import json
+import asyncio
+import logging
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from executors import run_blocking
+from logging_config import JsonFormatter, RequestIdFilter, get_request_id
+from middleware import StructuredLoggingMiddleware
+from timing import span
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.addFilter(RequestIdFilter())
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(StructuredLoggingMiddleware)
+    module_logger = logging.getLogger("test_module")
+
+    @app.get("/echo")
+    async def echo(request: Request):
+        module_logger.info("in endpoint")
+        with span("work"):
+            thread_request_id = await run_blocking("test", get_request_id)
+        return {"state": request.state.request_id, "thread": thread_request_id}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for idx in range(3):
+                await asyncio.sleep(0)
+                yield f"chunk{idx}\n"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return app
+
+
+def capture(*names):
+    handler = ListHandler()
+    for name in names:
+        logger = logging.getLogger(name)
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return handler
+
+
+def release(handler, *names):
+    for name in names:
+        logging.getLogger(name).removeHandler(handler)
+
+
+def test_request_id_reaches_state_header_threads_and_logs():
+    handler = capture("api", "test_module")
+    try:
+        response = TestClient(make_app()).get("/echo")
+    finally:
+        release(handler, "api", "test_module")
+
+    request_id = response.headers["X-Request-ID"]
+    assert response.json() == {"state": request_id, "thread": request_id}
+    assert response.headers["Server-Timing"].startswith("work;dur=")
+    assert {record.request_id for record in handler.records} == {request_id}
+
+    access = [record for record in handler.records if record.name == "api"]
+    assert len(access) == 1
+    assert access[0].status_code == 200 and access[0].path == "/echo"
+    assert "work" in access[0].timings_ms
+    assert get_request_id() is None  # Reset once the request is done
+
+
+def test_streaming_response_passes_through():
+    handler = capture("api")
+    try:
+        response = TestClient(make_app()).get("/stream")
+    finally:
+        release(handler, "api")
+    assert response.text == "chunk0\nchunk1\nchunk2\n"
+    assert "X-Request-ID" in response.headers
+    assert [record.status_code for record in handler.records] == [200]
+
+
+def test_unknown_route_is_logged_as_warning():
+    handler = capture("api")
+    try:
+        TestClient(make_app()).get("/missing")
+    finally:
+        release(handler, "api")
+    assert [(record.levelname, record.status_code) for record in handler.records] == [("WARNING", 404)]
+
+
+def test_json_formatter_includes_extra_fields_and_request_id():
+    record = logging.LogRecord("api", logging.WARNING, __file__, 1, "GET %s", ("/x",), None)
+    record.request_id = "abc"
+    record.status_code = 404
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "GET /x"
+    assert entry["severity"] == "WARNING"
+    assert entry["request_id"] == "abc"
+    assert entry["status_code"] == 404
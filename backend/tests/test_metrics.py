@@ -0,0 +1,82 @@
+"""Prometheus collector: per-thread shards, exposition format and the /metrics endpoint."""
+import os
+import threading
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, EXTERNAL_ERRORS, EXTERNAL_LATENCY, observe_call
+
+
+def test_counter_sums_thread_shards():
+    counter = Counter("test_total", "Test.", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("a")
+        counter.inc("b", amount=2)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.values() == {("a",): 8000, ("b",): 16}
+
+
+def test_gauge_inc_and_dec_on_different_threads():
+    gauge = Gauge("test_in_flight", "Test.")
+    gauge.inc()
+    thread = threading.Thread(target=gauge.dec)
+    thread.start()
+    thread.join()
+    assert gauge.values() == {(): 0}
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test.", ("stage",), buckets=(0.01, 0.1, 1.0))
+    for seconds in (0.005, 0.01, 0.05, 0.5, 5.0):
+        histogram.observe(seconds, "ocr")
+    text = "\n".join(histogram.render())
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{stage="ocr",le="0.01"} 2' in text
+    assert 'test_seconds_bucket{stage="ocr",le="1.0"} 4' in text
+    assert 'test_seconds_bucket{stage="ocr",le="+Inf"} 5' in text
+    assert 'test_seconds_count{stage="ocr"} 5' in text
+    assert 'test_seconds_sum{stage="ocr"} 5.565000' in text
+
+
+def test_label_values_are_escaped():
+    counter = Counter("test_escaped_total", "Test.", ("path",))
+    counter.inc('a"b\\c')
+    assert counter.render()[-1] == 'test_escaped_total{path="a\\"b\\\\c"} 1'
+
+
+def test_observe_call_counts_errors():
+    with pytest.raises(RuntimeError):
+        with observe_call("test_service", "boom"):
+            raise RuntimeError("down")
+    with observe_call("test_service", "ok"):
+        pass
+    assert EXTERNAL_ERRORS.values()[("test_service", "boom")] == 1
+    assert ("test_service", "ok") not in EXTERNAL_ERRORS.values()
+    assert EXTERNAL_LATENCY.values()[("test_service", "ok")][-2] == 1
+
+
+def test_metrics_endpoint_labels_routes_by_template():
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    client.get("/projects/abc", headers=headers)
+    client.get("/projects/def", headers=headers)
+    client.get("/no-such-route")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'kgvilla_http_requests_total{method="GET",route="/projects/{project_id}",status="200"} 2' in text
+    assert 'route="unmatched",status="404"' in text
+    assert "/projects/abc" not in text
+    assert "kgvilla_http_requests_in_flight 1" in text  # The scrape itself
@@ -0,0 +1,73 @@
+"""Tiered, content-addressed OCR result cache."""
+import os
+
+import pytest
+
+from ocr_cache import DiskBackend, MemoryLRUBackend, OCRCache, estimate_size, hash_content, make_cache_key
+
+
+def result(text, blocks=1):
+    return text, [{"text": text, "bounding_box": {"x": 0.1, "y": 0.2}} for _ in range(blocks)]
+
+
+def test_memory_tier_evicts_least_recently_used_past_max_bytes():
+    entry_size = estimate_size(result("a"))
+    memory = MemoryLRUBackend(max_bytes=2 * entry_size)
+    memory.set("a", result("a"))
+    memory.set("b", result("b"))
+    assert memory.get("a") == result("a")  # "b" is now least recently used
+    memory.set("c", result("c"))
+
+    assert memory.get("b") is None
+    assert memory.get("a") == result("a") and memory.get("c") == result("c")
+    assert memory.current_bytes == 2 * entry_size
+
+    memory.set("big", result("x", blocks=3))  # Larger than the whole budget: skipped
+    assert memory.get("big") is None and len(memory) == 2
+
+
+def test_slower_tier_hits_are_promoted(tmp_path):
+    memory, disk = MemoryLRUBackend(), DiskBackend(str(tmp_path))
+    cache = OCRCache([memory, disk])
+    disk.set("k", result("plan"))
+
+    assert cache.get("k") == result("plan")
+    assert memory.get("k") == result("plan")
+    disk.delete("k")
+    assert cache.get("k") == result("plan")  # Now served from memory
+    assert cache.get("missing") is None
+    assert cache.stats() == {"tiers": ["memory", "disk"], "hits": 2, "misses": 1, "hit_ratio": 0.667}
+
+    cache.delete("k")
+    assert cache.get("k") is None
+
+
+def test_disk_tier_round_trips(tmp_path):
+    value = ("Kök 12,3 m²", [{"text": "Kök", "confidence": 0.98, "bounding_box": {"x": 0.25, "y": 0.5}}])
+    DiskBackend(str(tmp_path)).set("k", value)
+    assert DiskBackend(str(tmp_path)).get("k") == value  # A new instance reads what another wrote
+    assert os.listdir(tmp_path) == ["k.json.z"]  # No temporary files left behind
+
+
+@pytest.mark.parametrize("content", [b"not zlib", b""])
+def test_corrupt_disk_entries_are_misses(tmp_path, content):
+    disk = DiskBackend(str(tmp_path))
+    (tmp_path / "k.json.z").write_bytes(content)
+    cache = OCRCache([MemoryLRUBackend(), disk])
+    assert cache.get("k") is None
+
+    cache.set("k", result("fresh"))  # And are replaced by the next result
+    assert disk.get("k") == result("fresh")
+
+
+def test_key_depends_on_content_mime_type_and_processor():
+    content_hash = hash_content(b"%PDF-1.7 plan")
+    key = make_cache_key(content_hash, "application/pdf", "proc-1")
+    assert key == make_cache_key(content_hash, "application/pdf", "proc-1")
+    assert len({
+        key,
+        make_cache_key(hash_content(b"%PDF-1.7 other plan"), "application/pdf", "proc-1"),
+        make_cache_key(content_hash, "image/png", "proc-1"),
+        make_cache_key(content_hash, "application/pdf", "proc-2"),
+        make_cache_key(content_hash, "application/pdf", None),
+    }) == 5
@@ -0,0 +1,48 @@
+"""Cursor pagination of the project listing."""
+import os
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from pagination import PaginationError, decode_page_token, encode_page_token, parse_fields
+
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+
+
+def test_page_token_round_trip():
+    updated_at = datetime(2026, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc)
+    token = encode_page_token(updated_at, "proj-42")
+    assert "=" not in token
+    assert decode_page_token(token) == (updated_at, "proj-42")
+
+
+@pytest.mark.parametrize("token", ["not a token", "bm9wZQ", encode_page_token(datetime(2026, 1, 1), "x")[:-3]])
+def test_tampered_tokens_are_rejected(token):
+    with pytest.raises(PaginationError):
+        decode_page_token(token)
+
+
+def test_parse_fields():
+    allowed = main.Project.model_fields
+    assert parse_fields(None, allowed) is None
+    assert parse_fields("name, location,name", allowed) == ["id", "updatedAt", "name", "location"]
+    with pytest.raises(PaginationError, match="Unknown field owner"):
+        parse_fields("name,owner", allowed)
+
+
+@pytest.mark.parametrize("params, status", [
+    ({}, 200),
+    ({"limit": 10, "fields": "name"}, 200),
+    ({"pageToken": "garbage!"}, 400),
+    ({"fields": "secret"}, 400),
+    ({"limit": 0}, 422),
+    ({"limit": 10_000}, 422),
+])
+def test_list_projects_validates_before_reading(params, status):
+    response = TestClient(main.app).get("/projects", params=params, headers=HEADERS)
+    assert response.status_code == status
+    if status == 200:
+        assert response.json() == []  # No Firestore in tests
+        assert "X-Next-Page-Token" not in response.headers
@@ -0,0 +1,115 @@
+"""
+Golden-corpus benchmarks for the deterministic pipeline.
+
+Each stage is timed with pytest-benchmark on every recorded sample plan and
+its output is checked against the golden values, so both a wrong estimate
+and a performance regression fail locally, without network access.
+
+    pytest tests/test_pipeline_benchmarks.py               # time + check
+    RUN_BENCHMARK_BUDGETS=1 pytest tests/test_pipeline_benchmarks.py   # and hold BUDGETS
+    pytest --benchmark-skip                                # checks elsewhere only
+    pytest --benchmark-autosave                            # save a baseline
+    pytest --benchmark-compare --benchmark-compare-fail=median:25%
+"""
+import asyncio
+import os
+
+import pytest
+
+from helpers import EXPECTED_ROOMS, OCR_FIXTURE_DIR, OCR_FIXTURES, REPO_ROOT, load_json
+from ocr_service import detect_equipment, parse_rooms_from_text, parse_rooms_with_spatial_matching, parse_summary_areas
+from pricing_engine import price_items
+
+GOLDEN = load_json("golden_pipeline.json")
+TEXT_PARSER_ROOMS = {case["name"]: case["rooms"] for case in load_json("text_parser_regression.json")}
+
+# Median seconds per call on one plan. About 20x the timings on a laptop, so
+# only real regressions (e.g. a quadratic pass creeping back) trip them.
+# Absolute timings depend on the machine, so they are only asserted on request.
+RUN_BUDGETS = os.environ.get("RUN_BENCHMARK_BUDGETS", "").lower() in ("1", "true", "yes")
+BUDGETS = {
+    "spatial_matching": 0.02,
+    "text_parser": 0.01,
+    "summary_areas": 0.005,
+    "equipment": 0.005,
+    "pricing": 0.04,
+}
+
+
+def check_budget(benchmark, stage: str) -> None:
+    """Fail if the measured median exceeds the stage budget (only with RUN_BENCHMARK_BUDGETS=1, not with --benchmark-disable)."""
+    if RUN_BUDGETS and benchmark.stats is not None:
+        median = benchmark.stats.stats.median
+        assert median < BUDGETS[stage], f"{stage}: median {median * 1000:.2f}ms over {BUDGETS[stage] * 1000:.0f}ms budget"
+
+
+def room_pairs(rooms):
+    return sorted((room["name"], room["area"]) for room in rooms)
+
+
+def test_spatial_matching(benchmark, plan_ocr):
+    plan, _, text_blocks = plan_ocr
+    rooms = benchmark(parse_rooms_with_spatial_matching, text_blocks)
+    assert room_pairs(rooms) == sorted(map(tuple, EXPECTED_ROOMS[plan]))
+    check_budget(benchmark, "spatial_matching")
+
+
+def test_text_parser(benchmark, plan_ocr):
+    plan, full_text, _ = plan_ocr
+    rooms = benchmark(parse_rooms_from_text, full_text)
+    assert [[room["name"], room["area"]] for room in rooms] == TEXT_PARSER_ROOMS[plan]
+    check_budget(benchmark, "text_parser")
+
+
+def test_summary_areas(benchmark, plan_ocr):
+    plan, full_text, _ = plan_ocr
+    summary = benchmark(parse_summary_areas, full_text)
+    assert summary == pytest.approx(GOLDEN[plan]["summary"])
+    check_budget(benchmark, "summary_areas")
+
+
+def test_detect_equipment(benchmark, plan_ocr):
+    plan, full_text, _ = plan_ocr
+    equipment = benchmark(detect_equipment, full_text)
+    assert equipment == GOLDEN[plan]["equipment"]
+    check_budget(benchmark, "equipment")
+
+
+def test_price_items(benchmark, plan_ocr):
+    plan, full_text, text_blocks = plan_ocr
+    rooms = parse_rooms_with_spatial_matching(text_blocks)
+    summary = parse_summary_areas(full_text)
+    items = benchmark(price_items, rooms, summary)
+    assert len(items) == GOLDEN[plan]["itemCount"]
+    assert sum(item["totalCost"] for item in items) == pytest.approx(GOLDEN[plan]["totalCost"], abs=1)
+    check_budget(benchmark, "pricing")
+
+
+@pytest.fixture
+def fake_documentai():
+    from fake_documentai import FakeDocumentProcessor
+    from ocr_service import set_documentai_async_client
+
+    set_documentai_async_client(FakeDocumentProcessor.from_fixture_dir(OCR_FIXTURE_DIR))
+    yield
+    set_documentai_async_client(None)
+
+
+@pytest.mark.parametrize("plan", sorted(OCR_FIXTURES))
+def test_pipeline_totals(plan, fake_documentai):
+    from ocr_service import analyze_floor_plan_deterministic
+
+    path = os.path.join(REPO_ROOT, plan)
+    if not os.path.exists(path):
+        pytest.skip(f"{plan} not present")
+    with open(path, "rb") as f:
+        content = f.read()
+    result = asyncio.run(analyze_floor_plan_deterministic(content, OCR_FIXTURES[plan]["mime_type"]))
+
+    golden = GOLDEN[plan]
+    assert room_pairs(result["rooms"]) == sorted(map(tuple, EXPECTED_ROOMS[plan]))
+    assert len(result["items"]) == golden["itemCount"]
+    assert sum(item["totalCost"] for item in result["items"]) == pytest.approx(golden["totalCost"], abs=1)
+    assert (result["totalArea"], result["boa"], result["biarea"]) == pytest.approx(
+        (golden["totalArea"], golden["boa"], golden["biarea"])
+    )
@@ -0,0 +1,147 @@
+"""Versioned price books: validation, atomic activation and hot reload."""
+import os
+import json
+import asyncio
+
+import pytest
+
+from helpers import OCR_FIXTURE_DIR, REPO_ROOT, load_json
+from price_book import FilePriceBookSource, PriceBookError, PriceBookLoader, parse_price_book
+from pricing_engine import BUILTIN_PRICE_BOOK, PRICING, activate_price_book, current_price_book, price_items
+
+CASE = load_json("pricing_regression.json")[0]
+BOOK = {
+    "version": "2026-01",
+    "pricing": {"foundation_per_m2": 4000},
+    "efficiency": {"contingency_pct": {"jb_villan": 0.05}},
+    "references": {"FOUNDATION_PER_M2": {"market_range_high": 5000}},
+}
+
+
+@pytest.fixture(autouse=True)
+def builtin_book():
+    yield
+    activate_price_book(BUILTIN_PRICE_BOOK)
+
+
+def by_id(items):
+    return {item["id"]: item for item in items}
+
+
+def test_book_overrides_only_what_it_names():
+    book = parse_price_book(BOOK)
+    base = by_id(price_items(CASE["rooms"], CASE["summary"], BUILTIN_PRICE_BOOK))
+    priced = by_id(price_items(CASE["rooms"], CASE["summary"], book))
+
+    foundation = priced["ground-foundation"]
+    assert foundation["unitPrice"] == 4000
+    assert foundation["priceSource"]["marketRangeHigh"] == 5000
+    assert "(5%)" in priced["admin-contingency"]["description"]
+    changed = {item_id for item_id in base if base[item_id] != priced[item_id]}
+    assert changed == {"ground-foundation", "admin-site-overhead", "admin-contingency"}
+    assert BUILTIN_PRICE_BOOK.pricing["foundation_per_m2"] == PRICING["foundation_per_m2"]
+
+
+def test_books_are_read_only():
+    book = parse_price_book(BOOK)
+    with pytest.raises(TypeError):
+        book.pricing["foundation_per_m2"] = 1
+    with pytest.raises(TypeError):
+        book.pricing["flooring"]["kitchen"] = 1
+
+
+@pytest.mark.parametrize("document, message", [
+    ({"pricing": {}}, "version"),
+    ({"version": "x", "prices": {}}, "Unknown price book section"),
+    ({"version": "x", "pricing": {"foundation": 1}}, "Unknown price book entry pricing.foundation"),
+    ({"version": "x", "pricing": {"flooring": {"kitchen": -5}}}, "non-negative"),
+    ({"version": "x", "pricing": {"flooring": 900}}, "must be an object"),
+    ({"version": "x", "efficiency": {"heat_pump": {"reason": 3}}}, "must be a string"),
+    ({"version": "x", "references": {"ROOF_PER_M2": {"price": 1}}}, "Unknown price reference field"),
+])
+def test_invalid_books_are_rejected(document, message):
+    with pytest.raises(PriceBookError, match=message):
+        parse_price_book(document)
+
+
+def test_file_reload_swaps_versions_and_keeps_the_book_on_errors(tmp_path):
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps(BOOK))
+    loader = PriceBookLoader(FilePriceBookSource(str(path)))
+
+    assert loader.reload() is True
+    assert current_price_book().version == "2026-01"
+    assert loader.reload() is False  # Unchanged file
+
+    path.write_text(json.dumps({**BOOK, "version": "2026-02", "pricing": {"foundation_per_m2": 4100}}))
+    os.utime(path, ns=(0, 10**9))
+    assert loader.reload() is True
+    assert current_price_book().lines["ground-foundation"].unit_price == 4100
+
+    path.write_text("{not json")
+    os.utime(path, ns=(0, 2 * 10**9))
+    with pytest.raises(PriceBookError):
+        loader.reload()
+    assert current_price_book().version == "2026-02"
+    assert loader.status()["lastError"].startswith("Invalid JSON")
+
+
+def test_app_lifespan_loads_the_book_and_releases_everything(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from repository import InMemoryProjectRepository
+    import main
+
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps(BOOK))
+    loader = PriceBookLoader(FilePriceBookSource(str(path)))
+    closed = []
+    repository = InMemoryProjectRepository()
+    monkeypatch.setattr(repository, "close", lambda: closed.append(True) or asyncio.sleep(0))
+    monkeypatch.setattr(main, "price_books", loader)
+    monkeypatch.setattr(main, "repository", repository)
+
+    assert current_price_book() is BUILTIN_PRICE_BOOK  # Importing main loads nothing
+    with TestClient(main.app):
+        assert current_price_book().version == "2026-01"
+        loader.start_polling(interval=60)
+        assert loader._thread is not None
+    assert loader._thread is None and closed == [True]
+    assert main.job_queue._tasks == []
+
+
+def test_analysis_is_stamped_with_its_price_book():
+    from fastapi.testclient import TestClient
+    from fake_documentai import FakeDocumentProcessor
+    from ocr_service import set_documentai_async_client
+    import main
+
+    activate_price_book(parse_price_book(BOOK))
+    set_documentai_async_client(FakeDocumentProcessor.from_fixture_dir(OCR_FIXTURE_DIR))
+    try:
+        with open(os.path.join(REPO_ROOT, "1324.png"), "rb") as f:
+            response = TestClient(main.app).post(
+                "/analyze", files={"file": ("1324.png", f, "image/png")}, headers={"X-API-Key": os.environ["API_KEY"]}
+            )
+    finally:
+        set_documentai_async_client(None)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["priceBookVersion"] == "2026-01"
+    assert by_id(result["items"])["ground-foundation"]["unitPrice"] == 4000
+
+
+def test_plans_without_text_are_stamped_too():
+    import asyncio
+    from fake_documentai import FakeDocumentProcessor
+    from ocr_service import analyze_floor_plan_deterministic, set_documentai_async_client
+
+    activate_price_book(parse_price_book(BOOK))
+    set_documentai_async_client(FakeDocumentProcessor())  # Every upload reads as an empty page
+    try:
+        result = asyncio.run(analyze_floor_plan_deterministic(b"\x89PNG\r\n\x1a\nblank", "image/png"))
+    finally:
+        set_documentai_async_client(None)
+
+    assert result["items"] == []
+    assert result["priceBookVersion"] == "2026-01"
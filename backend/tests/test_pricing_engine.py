@@ -0,0 +1,52 @@
+"""Table-driven pricing: output pinned to the hand-written calculate_pricing it replaced."""
+import json
+import hashlib
+
+import pytest
+
+from helpers import load_json
+from models import CostItem
+from pricing_engine import JB_EFFICIENCY, PRICING, build_line_items, calculate_pricing, price_items
+
+# Inputs, [id, quantity, totalCost] per line and a digest of every serialized
+# field, recorded from the previous implementation (tests/fixtures/record_pricing.py)
+PRICING_CASES = load_json("pricing_regression.json")
+
+
+def digest(item_dicts) -> str:
+    payload = json.dumps(item_dicts, ensure_ascii=False, sort_keys=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@pytest.mark.parametrize("case", PRICING_CASES, ids=lambda case: case["name"])
+def test_price_items_match_previous_output(case):
+    items = price_items(case["rooms"], case["summary"])
+    assert [[item["id"], item["quantity"], item["totalCost"]] for item in items] == case["items"]
+    assert digest(items) == case["digest"]
+
+
+@pytest.mark.parametrize("case", PRICING_CASES[:1] + PRICING_CASES[-6:], ids=lambda case: case["name"])
+def test_calculate_pricing_validates_the_same_items(case):
+    models = calculate_pricing(case["rooms"], case["summary"])
+    assert all(isinstance(item, CostItem) for item in models)
+    assert [item.model_dump() for item in models] == price_items(case["rooms"], case["summary"])
+
+
+def test_line_items_follow_the_price_table():
+    pricing = {**PRICING, "wc_unit": PRICING["wc_unit"] * 2}
+    line_items, _ = build_line_items(pricing, JB_EFFICIENCY)
+    wc = next(line for line in line_items if getattr(line, "id", None) == "plumbing-wc")
+    assert wc.template["unitPrice"] == PRICING["wc_unit"] * 2
+
+
+def test_items_share_no_nested_values():
+    case = PRICING_CASES[-1]
+    items = price_items(case["rooms"], case["summary"])
+    for item in items:
+        for value in item.values():
+            if isinstance(value, dict):
+                value.clear()
+        if item["quantityBreakdown"]:
+            for entry in item["quantityBreakdown"]["items"]:
+                entry["value"] = -1.0
+    assert digest(price_items(case["rooms"], case["summary"])) == case["digest"]
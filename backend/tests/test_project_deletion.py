@@ -0,0 +1,77 @@
+"""Cascading project deletion: documents, job records and OCR cache entries."""
+import os
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from jobs import InMemoryJobStore
+from ocr_cache import MemoryLRUBackend, OCRCache
+from ocr_service import ocr_cache_key
+from project_deletion import delete_project_data
+from repository import InMemoryProjectRepository
+
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+
+
+def _job(job_id, project_id, content_hash):
+    return {"id": job_id, "projectId": project_id, "contentHash": content_hash, "mimeType": "image/png"}
+
+
+def _seed(repository, jobs, cache):
+    async def seed():
+        for project_id in ("p1", "p2"):
+            await repository.save_project({"id": project_id, "name": project_id, "location": "X"})
+            await repository.save_items(project_id, {"items": [{"id": f"item-{i}"} for i in range(3)]})
+    asyncio.run(seed())
+    for job in (_job("j1", "p1", "aaa"), _job("j2", "p1", "bbb"), _job("j3", "p1", None), _job("j4", "p2", "ccc"),
+                _job("j5", "p2", "bbb")):  # p2 uploaded the same file as j2
+        jobs.create(job)
+    for content_hash in ("aaa", "bbb", "ccc"):
+        cache.set(ocr_cache_key(content_hash, "image/png"), ("text", []))
+
+
+def test_deletes_everything_derived_from_the_project():
+    repository, jobs, cache = InMemoryProjectRepository(), InMemoryJobStore(), OCRCache([MemoryLRUBackend()])
+    _seed(repository, jobs, cache)
+
+    counts = asyncio.run(delete_project_data("p1", repository, jobs, cache))
+
+    assert counts == {"documents": 5, "jobs": 3, "ocrCacheEntries": 1, "total": 9}
+    assert asyncio.run(repository.get_project("p1")) is None
+    assert asyncio.run(repository.get_items("p1")) is None
+    assert jobs.list_by_project("p1") == []
+    assert cache.get(ocr_cache_key("aaa", "image/png")) is None
+    # Other projects are untouched
+    assert len(asyncio.run(repository.get_items("p2"))["items"]) == 3
+    assert [job["id"] for job in jobs.list_by_project("p2")] == ["j4", "j5"]
+    assert cache.get(ocr_cache_key("ccc", "image/png")) is not None
+    assert cache.get(ocr_cache_key("bbb", "image/png")) is not None  # Shared with p2
+
+
+def test_shared_entries_go_with_the_last_project_using_them():
+    repository, jobs, cache = InMemoryProjectRepository(), InMemoryJobStore(), OCRCache([MemoryLRUBackend()])
+    _seed(repository, jobs, cache)
+    asyncio.run(delete_project_data("p1", repository, jobs, cache))
+
+    counts = asyncio.run(delete_project_data("p2", repository, jobs, cache))
+    assert counts["ocrCacheEntries"] == 2
+    assert cache.get(ocr_cache_key("bbb", "image/png")) is None
+    assert cache.get(ocr_cache_key("ccc", "image/png")) is None
+
+
+def test_deleting_twice_reports_nothing_left():
+    repository, jobs = InMemoryProjectRepository(), InMemoryJobStore()
+    _seed(repository, jobs, OCRCache([MemoryLRUBackend()]))
+    asyncio.run(delete_project_data("p1", repository, jobs))
+    assert asyncio.run(delete_project_data("p1", repository, jobs)) == {"documents": 0, "jobs": 0, "ocrCacheEntries": 0, "total": 0}
+
+
+def test_delete_endpoint_reports_counts(monkeypatch):
+    monkeypatch.setattr(main, "repository", InMemoryProjectRepository())
+    main.read_cache.clear()
+    client = TestClient(main.app)
+    client.post("/projects", json={"id": "p9", "name": "Villa", "location": "Lund"}, headers=HEADERS)
+    response = client.delete("/projects/p9", headers=HEADERS)
+    assert response.status_code == 200
+    assert response.json()["deleted"]["documents"] == 1
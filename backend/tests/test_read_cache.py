@@ -0,0 +1,98 @@
+"""Read-through cache and ETag / 304 handling for project and item reads."""
+import os
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import read_cache
+from read_cache import ReadCache, etag_matches, make_etag
+from repository import InMemoryProjectRepository
+
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+ITEM = {"id": "a", "phase": "ground", "elementName": "A", "description": "A",
+        "quantity": 2, "unit": "m2", "unitPrice": 5, "totalCost": 10}
+
+
+def test_etag_matching():
+    etag = make_etag(b"[]")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_entries_expire_and_evict(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(read_cache.time, "monotonic", lambda: now[0])
+    cache = ReadCache(ttl=30, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(("items", key), key.encode())
+    assert cache.get(("items", "a")) is None  # Least recently used
+    assert cache.get(("items", "c")).body == b"c"
+    now[0] += 31
+    assert cache.get(("items", "c")) is None
+
+
+def test_loads_racing_an_invalidation_are_not_stored():
+    cache = ReadCache(ttl=30)
+
+    async def load():
+        cache.invalidate(("items", "p1"))  # A write lands while Firestore is being read
+        return b"stale"
+
+    entry = asyncio.run(cache.get_or_load(("items", "p1"), load))
+    assert entry.body == b"stale"
+    assert cache.get(("items", "p1")) is None
+
+
+@pytest.fixture
+def repository(monkeypatch):
+    repository = InMemoryProjectRepository()
+    monkeypatch.setattr(main, "repository", repository)
+    main.read_cache.clear()
+    return repository
+
+
+def test_reads_are_cached_until_a_write(repository, monkeypatch):
+    client = TestClient(main.app)
+    client.post("/projects/p1/items", json=[ITEM], headers=HEADERS)
+    reads = []
+    get_items = repository.get_items
+
+    async def counting_get_items(project_id):
+        reads.append(project_id)
+        return await get_items(project_id)
+
+    monkeypatch.setattr(repository, "get_items", counting_get_items)
+
+    first = client.get("/projects/p1/items", headers=HEADERS)
+    etag = first.headers["ETag"]
+    assert first.json()[0]["id"] == "a"
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    not_modified = client.get("/projects/p1/items", headers={**HEADERS, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert reads == ["p1"]  # Served from the cache
+
+    client.post("/projects/p1/items", json=[{**ITEM, "quantity": 3, "totalCost": 15}], headers=HEADERS)
+    changed = client.get("/projects/p1/items", headers={**HEADERS, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["quantity"] == 3
+    assert reads == ["p1", "p1"]
+
+
+def test_project_etag_and_delete_invalidation(repository):
+    client = TestClient(main.app)
+    client.post("/projects", json={"id": "p1", "name": "Villa", "location": "Lund"}, headers=HEADERS)
+    response = client.get("/projects/p1", headers=HEADERS)
+    assert response.json()["name"] == "Villa"
+    assert client.get("/projects/p1", headers={**HEADERS, "If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    client.delete("/projects/p1", headers=HEADERS)
+    assert client.get("/projects/p1", headers=HEADERS).status_code == 404
+    assert client.get("/projects/p1/items", headers=HEADERS).json() == []
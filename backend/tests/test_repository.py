@@ -0,0 +1,330 @@
+"""Async project repository: the in-memory fake (and Firestore, with the emulator) behind the project routes."""
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from helpers import load_json
+from repository import FirestoreProjectRepository, InMemoryProjectRepository, create_async_client, item_keys
+
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+CASE = next(case for case in load_json("pricing_regression.json") if case["rooms"])
+T0 = datetime(2026, 5, 1, tzinfo=timezone.utc)
+
+
+def _memory():
+    return InMemoryProjectRepository()
+
+
+def _emulator():
+    # Run with FIRESTORE_EMULATOR_HOST=localhost:8080 (gcloud emulators firestore start)
+    return FirestoreProjectRepository(create_async_client())
+
+
+@pytest.fixture(params=[
+    _memory,
+    pytest.param(_emulator, marks=pytest.mark.skipif(
+        not os.environ.get("FIRESTORE_EMULATOR_HOST"), reason="needs the Firestore emulator")),
+], ids=["memory", "emulator"])
+def run(request):
+    """Runs an async scenario against a fresh repository, created on the scenario's event loop."""
+    def runner(scenario):
+        async def main_():
+            repository = request.param()
+            try:
+                return await scenario(repository)
+            finally:
+                await repository.close()
+        return asyncio.run(main_())
+    return runner
+
+
+def test_documents_round_trip(run):
+    async def scenario(repo):
+        project = {"id": "repo-p1", "name": "Villa", "location": "Lund", "updatedAt": T0}
+        await repo.save_project(project)
+        project["name"] = "changed"  # Stored documents are copies
+        await repo.save_items("repo-p1", {"items": [{"id": "a", "totalCost": 10}]})
+        saved = await repo.get_project("repo-p1"), await repo.get_items("repo-p1")
+
+        await repo.delete_project("repo-p1")
+        return saved, await repo.get_project("repo-p1"), await repo.get_items("repo-p1")
+
+    (project, items), deleted_project, deleted_items = run(scenario)
+    assert project["name"] == "Villa"
+    assert project["updatedAt"] == T0
+    assert items == {"items": [{"id": "a", "totalCost": 10}]}
+    assert deleted_project is None and deleted_items is None
+
+
+def test_listing_pages_newest_first(run):
+    async def scenario(repo):
+        for i in range(5):
+            await repo.save_project({"id": f"repo-l{i}", "name": f"P{i}", "location": "X", "updatedAt": T0 + timedelta(hours=i % 3)})
+        pages, token = [], None
+        while True:
+            page, token = await repo.list_projects(2, token, ["id", "updatedAt", "name"])
+            pages.append(page)
+            if token is None:
+                break
+        for i in range(5):
+            await repo.delete_project(f"repo-l{i}")
+        return pages
+
+    pages = run(scenario)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    listed = [project["id"] for page in pages for project in page]
+    assert listed == ["repo-l2", "repo-l4", "repo-l1", "repo-l3", "repo-l0"]  # updatedAt, then ID, descending
+    assert set(pages[0][0]) == {"id", "updatedAt", "name"}
+    assert pages[0][0]["updatedAt"] == (T0 + timedelta(hours=2)).isoformat()
+
+
+def test_projects_without_updated_at_are_backfilled_and_listed(run):
+    async def scenario(repo):
+        if isinstance(repo, FirestoreProjectRepository):
+            await repo.client.collection("migrations").document("projects.updatedAt").delete()
+        await repo.save_project({"id": "repo-legacy", "name": "Old", "location": "X"})  # Saved before updatedAt existed
+        await repo.save_project({"id": "repo-stamped", "name": "New", "location": "X", "updatedAt": T0})
+        page, token = await repo.list_projects(10)
+        legacy = await repo.get_project("repo-legacy")
+        for project_id in ("repo-legacy", "repo-stamped"):
+            await repo.delete_project(project_id)
+        return page, legacy
+
+    page, legacy = run(scenario)
+    assert [project["id"] for project in page] == ["repo-legacy", "repo-stamped"]  # Stamped with its (later) save time
+    assert legacy["updatedAt"] > T0
+
+
+def _items(count):
+    return [{"id": f"item-{i}", "quantity": i, "unitPrice": 100, "totalCost": 100 * i, "quantityBreakdown": {"items": []}}
+            for i in range(count)]
+
+
+def test_item_saves_write_only_the_diff(run):
+    async def scenario(repo):
+        items = _items(60)
+        first = await repo.save_items("repo-d1", {"items": items})
+        edited = [dict(item) for item in items]
+        edited[3]["quantity"] = 30
+        edited[41]["unitPrice"] = 90
+        two_edits = await repo.save_items("repo-d1", {"items": edited})
+        unchanged = await repo.save_items("repo-d1", {"items": edited})
+        removed = await repo.save_items("repo-d1", {"items": edited[:-1]})
+        stored = await repo.get_items("repo-d1")
+        await repo.delete_project("repo-d1")
+        return first, two_edits, unchanged, removed, stored
+
+    first, two_edits, unchanged, removed, stored = run(scenario)
+    assert first == 61  # Every item and the parent document
+    assert two_edits == 2
+    assert unchanged == 0
+    assert removed == 2  # The item and the order in the parent
+    assert [item["id"] for item in stored["items"]] == [f"item-{i}" for i in range(59)]
+    assert stored["items"][3]["quantity"] == 30
+
+
+def test_concurrent_saves_leave_one_complete_version(run):
+    async def scenario(repo):
+        await repo.save_items("repo-c1", {"items": _items(10)})
+        first = {"items": [{**item, "quantity": 1} for item in _items(12)]}
+        second = {"items": _items(8)}
+        await asyncio.gather(repo.save_items("repo-c1", first), repo.save_items("repo-c1", second))
+        stored = await repo.get_items("repo-c1")
+        await repo.delete_project("repo-c1")
+        return stored, first, second
+
+    stored, first, second = run(scenario)
+    assert stored in (first, second)
+
+
+def test_concurrent_updates_all_apply(run):
+    def bump(index):
+        def update(data):
+            items = [dict(item) for item in data["items"]]
+            items[index]["quantity"] += 1
+            return {**data, "items": items}
+        return update
+
+    async def scenario(repo):
+        await repo.save_items("repo-u1", {"items": _items(4), "priceBookVersion": "builtin"})
+        await asyncio.gather(*(repo.update_items("repo-u1", bump(i % 4)) for i in range(8)))
+        stored = await repo.get_items("repo-u1")
+        await repo.delete_project("repo-u1")
+        return stored
+
+    stored = run(scenario)
+    assert [item["quantity"] for item in stored["items"]] == [item["quantity"] + 2 for item in _items(4)]
+    assert stored["priceBookVersion"] == "builtin"
+
+
+def test_saves_larger_than_one_batch(run):
+    async def scenario(repo):
+        items = _items(620)
+        await repo.save_items("repo-b1", {"items": items})
+        edited = [{**item, "unitPrice": 90} for item in items[:600]]  # 600 changes and 20 deletions
+        written = await repo.save_items("repo-b1", {"items": edited})
+        stored = await repo.get_items("repo-b1")
+        await repo.delete_project("repo-b1")
+        return edited, written, stored
+
+    edited, written, stored = run(scenario)
+    assert written == 621
+    assert stored == {"items": edited}
+
+
+def test_repeated_and_unsafe_item_ids_keep_their_order(run):
+    async def scenario(repo):
+        items = [{"id": "floor-klk", "n": 1}, {"id": "a/b"}, {"id": "floor-klk", "n": 2}, {"id": "__x__"}]
+        await repo.save_items("repo-d2", {"items": items})
+        stored = await repo.get_items("repo-d2")
+        await repo.delete_project("repo-d2")
+        return items, stored
+
+    items, stored = run(scenario)
+    assert stored == {"items": items}
+    assert item_keys(items) == ["floor-klk", "a%2Fb", "floor-klk~2", "%__x__"]
+
+
+@pytest.mark.skipif(not os.environ.get("FIRESTORE_EMULATOR_HOST"), reason="needs the Firestore emulator")
+def test_delete_reaches_nested_subcollections():
+    async def scenario():
+        repo = _emulator()
+        try:
+            await repo.save_project({"id": "repo-n1", "name": "N", "location": "X"})
+            await repo.save_items("repo-n1", {"items": _items(2)})
+            note = repo.projects.document("repo-n1").collection("notes").document("n1")
+            await note.set({"text": "a"})
+            await note.collection("replies").document("r1").set({"text": "b"})
+            deleted = await repo.delete_project("repo-n1")
+            return deleted, (await note.collection("replies").document("r1").get()).exists
+        finally:
+            await repo.close()
+
+    deleted, reply_exists = asyncio.run(scenario())
+    assert deleted == 6  # Project, cost_data, 2 items, note, reply
+    assert not reply_exists
+
+
+def test_single_document_items_are_read_and_migrated():
+    async def scenario(repo):
+        repo.cost_data["p1"] = {"items": _items(3), "plan": {"rooms": [], "summary": {}}}
+        legacy = await repo.get_items("p1")
+        written = await repo.save_items("p1", legacy)
+        return legacy, written, repo.cost_data["p1"], await repo.get_items("p1")
+
+    legacy, written, parent, migrated = asyncio.run(scenario(InMemoryProjectRepository()))
+    assert written == 4
+    assert parent == {"plan": {"rooms": [], "summary": {}}, "order": ["item-0", "item-1", "item-2"]}
+    assert migrated == legacy
+
+
+def test_close_shuts_the_grpc_channel():
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud.firestore_v1.async_client import AsyncClient
+
+    async def scenario():
+        unused = FirestoreProjectRepository(AsyncClient(project="test", credentials=AnonymousCredentials()))
+        await unused.close()  # Never connected: no channel to open just to close it
+        repo = FirestoreProjectRepository(AsyncClient(project="test", credentials=AnonymousCredentials()))
+        channel = repo.client._firestore_api.transport.grpc_channel
+        await repo.close()
+        return unused.client._firestore_api_internal, channel.get_state()
+
+    unused_api, state = asyncio.run(scenario())
+    assert unused_api is None
+    assert state.name == "SHUTDOWN"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "repository", InMemoryProjectRepository())
+    main.read_cache.clear()
+    return TestClient(main.app)
+
+
+def test_project_routes_use_the_repository(client):
+    project = {"id": "p1", "name": "Villa", "location": "Lund"}
+    assert client.post("/projects", json=project, headers=HEADERS).json() == {"status": "success", "id": "p1"}
+    saved = client.get("/projects/p1", headers=HEADERS).json()
+    assert saved["name"] == "Villa" and saved["updatedAt"]
+    assert [p["id"] for p in client.get("/projects", params={"fields": "name"}, headers=HEADERS).json()] == ["p1"]
+
+    assert client.post("/projects/p1/items", json=[{"id": "a", "phase": "ground", "elementName": "A", "description": "A",
+                                                     "quantity": 2, "unit": "m2", "unitPrice": 5, "totalCost": 10,
+                                                     "confidenceScore": 1}], headers=HEADERS).json()["count"] == 1
+    assert [item["id"] for item in client.get("/projects/p1/items", headers=HEADERS).json()] == ["a"]
+
+    client.delete("/projects/p1", headers=HEADERS)
+    assert client.get("/projects/p1", headers=HEADERS).status_code == 404
+    assert client.get("/projects/p1/items", headers=HEADERS).json() == []
+
+
+def test_project_listing_is_complete_unless_paged_and_validated(client, monkeypatch):
+    monkeypatch.setattr(main, "PROJECT_PAGE_MAX", 2)  # Several reads for the unpaged listing
+    for i in range(5):
+        asyncio.run(main.repository.save_project({"id": f"p{i}", "name": f"P{i}", "location": "X", "totalArea": "120",
+                                                  "internal": "not in the model", "updatedAt": T0 + timedelta(hours=i)}))
+
+    response = client.get("/projects", headers=HEADERS)
+    assert [p["id"] for p in response.json()] == ["p4", "p3", "p2", "p1", "p0"]
+    assert "X-Next-Page-Token" not in response.headers
+    project = response.json()[0]
+    assert "internal" not in project and project["totalArea"] == 120.0  # Validated against Project
+    assert set(project) == set(main.Project.model_fields)
+
+    page = client.get("/projects", params={"limit": 2, "fields": "name"}, headers=HEADERS)
+    assert [p["id"] for p in page.json()] == ["p4", "p3"]
+    assert set(page.json()[0]) == {"id", "updatedAt", "name"}
+    rest = client.get("/projects", params={"pageToken": page.headers["X-Next-Page-Token"]}, headers=HEADERS)
+    assert [p["id"] for p in rest.json()] == ["p2", "p1", "p0"]
+
+
+def test_reprice_round_trips_through_the_repository(client):
+    from pricing_engine import price_items
+
+    items = price_items(CASE["rooms"], CASE["summary"])
+    plan = {"rooms": CASE["rooms"], "summary": CASE["summary"]}
+    asyncio.run(main.repository.save_items("p1", {"items": items, "plan": plan}))
+    response = client.patch("/projects/p1/items", json={"inputs": {"byggyta": 120}}, headers=HEADERS)
+    assert response.status_code == 200
+    stored = asyncio.run(main.repository.get_items("p1"))
+    assert stored["items"] == price_items(CASE["rooms"], {**CASE["summary"], "byggyta": 120})
+    assert stored["plan"]["summary"]["byggyta"] == 120
+    assert stored["priceBookVersion"] == response.json()["priceBookVersion"] == "builtin"
+    assert client.patch("/projects/nope/items", json={"inputs": {"byggyta": 120}}, headers=HEADERS).status_code == 404
+
+
+def test_reprice_uses_the_book_the_items_were_priced_with(client):
+    from price_book import parse_price_book
+    from pricing_engine import BUILTIN_PRICE_BOOK, activate_price_book, price_items
+
+    plan = {"rooms": CASE["rooms"], "summary": CASE["summary"]}
+    items = price_items(CASE["rooms"], CASE["summary"], BUILTIN_PRICE_BOOK)
+    asyncio.run(main.repository.save_items("p1", {"items": items, "plan": plan, "priceBookVersion": "builtin"}))
+    asyncio.run(main.repository.save_items("p2", {"items": items, "plan": plan, "priceBookVersion": "2025-09"}))
+    activate_price_book(parse_price_book({"version": "2026-01", "pricing": {"roof_per_m2": 1}}))
+    try:
+        response = client.patch("/projects/p1/items", json={"inputs": {"byggyta": 120}}, headers=HEADERS)
+        assert response.json()["priceBookVersion"] == "builtin"
+        stored = asyncio.run(main.repository.get_items("p1"))
+        assert stored["items"] == price_items(CASE["rooms"], {**CASE["summary"], "byggyta": 120}, BUILTIN_PRICE_BOOK)
+
+        before = asyncio.run(main.repository.get_items("p2"))
+        response = client.patch("/projects/p2/items", json={"inputs": {"byggyta": 120}}, headers=HEADERS)
+        assert response.status_code == 409 and "2025-09" in response.json()["detail"]
+        assert asyncio.run(main.repository.get_items("p2")) == before  # Nothing written
+
+        client.post("/projects/p3/items", json=[], headers=HEADERS)
+        assert asyncio.run(main.repository.get_items("p3"))["priceBookVersion"] == "2026-01"
+    finally:
+        activate_price_book(BUILTIN_PRICE_BOOK)
+
+
+def test_health_pings_the_repository(client, monkeypatch):
+    monkeypatch.setattr(main, "_cached_health_response", None)
+    response = client.get("/health")
+    assert response.json()["checks"]["firestore"] == "ok"
@@ -0,0 +1,112 @@
+"""Incremental repricing: every delta leaves the estimate equal to a full reprice."""
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from helpers import load_json
+from pricing_engine import price_items
+from repricing import PricingModel, RepricingError, effective_total
+
+PLAN_CASES = [case for case in load_json("pricing_regression.json") if case["rooms"]]
+INPUT_EDITS = [
+    {"byggyta": 181.3},
+    {"byggyta": 0, "bta": 0},
+    {"boyta": 97.5},
+    {"boyta": 0, "bta": 140},
+]
+
+
+def by_id(items, item_id):
+    return next(item for item in items if item["id"] == item_id)
+
+
+@pytest.mark.parametrize("edit", INPUT_EDITS, ids=lambda edit: ",".join(edit))
+@pytest.mark.parametrize("case", PLAN_CASES, ids=lambda case: case["name"])
+def test_input_edits_match_full_reprice(case, edit):
+    model = PricingModel.from_plan(case["rooms"], case["summary"])
+    delta = model.apply(inputs=edit)
+    expected = price_items(case["rooms"], {**case["summary"], **edit})
+    assert model.items == expected
+    assert delta["totalCost"] == sum(item["totalCost"] for item in expected)
+
+    # And back: lines switched off by the edit reappear in place
+    restore = {name: case["summary"].get(name, 0) for name in edit}
+    model.apply(inputs=restore)
+    assert model.items == price_items(case["rooms"], case["summary"])
+
+
+def test_byggyta_reprices_only_its_dependents():
+    case = PLAN_CASES[0]
+    model = PricingModel.from_plan(case["rooms"], case["summary"])
+    delta = model.apply(inputs={"byggyta": case["summary"]["byggyta"] + 10})
+    changed = [item["id"] for item in delta["items"]]
+    assert {"ground-foundation", "ground-drainage", "structure-roof", "structure-facade"} <= set(changed)
+    assert changed[-2:] == ["admin-site-overhead", "admin-contingency"]
+    assert not any(item_id.startswith(("interior-", "plumbing-", "electrical-")) for item_id in changed)
+    assert delta["removed"] == []
+
+
+def test_override_changes_one_item_and_the_markups():
+    case = PLAN_CASES[0]
+    model = PricingModel.from_plan(case["rooms"], case["summary"])
+    roof = by_id(model.items, "structure-roof")
+    delta = model.apply(overrides={"structure-roof": {"customUnitPrice": roof["unitPrice"] + 100}})
+
+    assert [item["id"] for item in delta["items"]] == ["structure-roof", "admin-site-overhead", "admin-contingency"]
+    assert delta["items"][0]["totalCost"] == roof["quantity"] * (roof["unitPrice"] + 100)
+    subtotal = sum(item["totalCost"] for item in model.items if item["id"] not in ("admin-site-overhead", "admin-contingency"))
+    assert delta["subtotal"] == subtotal
+    assert delta["totalCost"] == sum(item["totalCost"] for item in model.items)
+
+    # Clearing the override restores the priced estimate
+    model.apply(overrides={"structure-roof": {"customUnitPrice": None}})
+    assert model.items == price_items(case["rooms"], case["summary"])
+
+
+def test_overrides_survive_input_edits():
+    case = PLAN_CASES[0]
+    model = PricingModel.from_plan(case["rooms"], case["summary"])
+    model.apply(overrides={"structure-roof": {"customQuantity": 200.0}})
+    model.apply(inputs={"byggyta": 120})
+    roof = by_id(model.items, "structure-roof")
+    assert roof["quantity"] == by_id(price_items(case["rooms"], {**case["summary"], "byggyta": 120}), "structure-roof")["quantity"]
+    assert roof["customQuantity"] == 200.0
+    assert roof["totalCost"] == effective_total(roof) == 200.0 * roof["unitPrice"]
+
+
+def test_deleted_lines_stay_deleted():
+    case = PLAN_CASES[0]
+    items = [item for item in price_items(case["rooms"], case["summary"]) if item["id"] != "structure-roof"]
+    model = PricingModel(items, case["rooms"], case["summary"])
+    delta = model.apply(inputs={"byggyta": 120})
+    assert "structure-roof" not in [item["id"] for item in model.items]
+    assert "structure-roof" not in [item["id"] for item in delta["items"]]
+
+
+def test_invalid_edits_change_nothing():
+    case = PLAN_CASES[0]
+    model = PricingModel.from_plan(case["rooms"], case["summary"])
+    before = list(model.items)
+    with pytest.raises(RepricingError, match="Unknown item"):
+        model.apply(overrides={"structure-roof": {"customQuantity": 1.0}, "nope": {"customQuantity": 1.0}})
+    with pytest.raises(RepricingError, match="Cannot override"):
+        model.apply(overrides={"structure-roof": {"unitPrice": 1.0}})
+    with pytest.raises(RepricingError, match="Unknown plan input"):
+        model.apply(inputs={"roof_pitch": 30})
+    assert model.items == before
+
+    without_plan = PricingModel(before)
+    with pytest.raises(RepricingError, match="need the plan"):
+        without_plan.apply(inputs={"byggyta": 120})
+
+
+def test_reprice_endpoint_needs_firestore():
+    client = TestClient(main.app)
+    response = client.patch(
+        "/projects/p1/items",
+        json={"changes": [{"id": "structure-roof", "customQuantity": 10}]},
+        headers={"X-API-Key": os.environ["API_KEY"]},
+    )
+    assert response.status_code == 503
@@ -0,0 +1,105 @@
+"""What-if scenario pricing: vectorized results match pricing each scenario on its own."""
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import pricing_engine  # noqa: E402
+import scenarios  # noqa: E402
+from helpers import load_json  # noqa: E402
+from ocr_service import WALL_THICKNESS_FACTOR  # noqa: E402
+from pricing_engine import JB_EFFICIENCY, PRICING, compile_price_book, price_items, pricing_context  # noqa: E402
+from scenarios import SCENARIO_PARAMETERS, ScenarioError, build_parameter_matrix, price_scenarios  # noqa: E402
+
+PLAN_CASES = [case for case in load_json("pricing_regression.json") if case["rooms"]]
+
+WHAT_IFS = [
+    {"roof_slope_factor": 1.15},
+    {"foundation_per_m2": 4200, "contingency_pct": 0.1},
+    {"roof_slope_factor": 1.0, "site_overhead_pct": 0.05, "wall_thickness_factor": 1.05},
+    {"wall_thickness_factor": 1.1},
+]
+
+
+def priced_one_by_one(monkeypatch, case, what_if):
+    """Totals from the scalar engine with the scenario's constants patched in."""
+    pricing = {**PRICING, "foundation_per_m2": what_if.get("foundation_per_m2", PRICING["foundation_per_m2"])}
+    efficiency = dict(JB_EFFICIENCY)
+    for name in ("site_overhead_pct", "contingency_pct"):
+        if name in what_if:
+            efficiency[name] = {**JB_EFFICIENCY[name], "jb_villan": what_if[name]}
+    book = compile_price_book("what-if", pricing, efficiency)
+    # The footprint scales with the wall thickness factor relative to the default
+    wall_factor = what_if.get("wall_thickness_factor", WALL_THICKNESS_FACTOR) / WALL_THICKNESS_FACTOR
+    summary = {**case["summary"], "byggyta": pricing_context(case["rooms"], case["summary"])["byggyta"] * wall_factor}
+    with monkeypatch.context() as patch:
+        patch.setattr(pricing_engine, "ROOF_SLOPE_FACTOR", what_if.get("roof_slope_factor", pricing_engine.ROOF_SLOPE_FACTOR))
+        return [item["totalCost"] for item in price_items(case["rooms"], summary, book)]
+
+
+@pytest.mark.parametrize("case", PLAN_CASES, ids=lambda case: case["name"])
+def test_scenarios_match_scalar_pricing(monkeypatch, case):
+    result = price_scenarios(case["rooms"], case["summary"], build_parameter_matrix(WHAT_IFS))
+    base = price_items(case["rooms"], case["summary"])
+    assert result.item_ids == [item["id"] for item in base]
+    assert result.totals[0].tolist() == [item["totalCost"] for item in base]
+    for row, what_if in enumerate(WHAT_IFS, start=1):
+        assert result.totals[row].tolist() == pytest.approx(priced_one_by_one(monkeypatch, case, what_if), abs=1)
+
+
+def test_sweep_prices_every_combination():
+    case = PLAN_CASES[0]
+    sweep = {"roof_slope_factor": [1.0, 1.08, 1.2], "contingency_pct": [0.04, 0.06]}
+    parameters = build_parameter_matrix(sweep=sweep)
+    assert parameters.shape == (7, len(SCENARIO_PARAMETERS))
+    roof = SCENARIO_PARAMETERS.index("roof_slope_factor")
+    contingency = SCENARIO_PARAMETERS.index("contingency_pct")
+    assert [tuple(row) for row in parameters[1:, [roof, contingency]]] == [
+        (1.0, 0.04), (1.0, 0.06), (1.08, 0.04), (1.08, 0.06), (1.2, 0.04), (1.2, 0.06),
+    ]
+
+    result = price_scenarios(case["rooms"], case["summary"], parameters)
+    assert result.total_cost[3] < result.total_cost[4] < result.total_cost[6]  # Steeper roof, more contingency
+    assert result.total_cost[4] == result.total_cost[0]  # Defaults appear again in the sweep
+
+
+def test_wall_thickness_moves_the_footprint_lines():
+    case = PLAN_CASES[0]
+    result = price_scenarios(case["rooms"], case["summary"], build_parameter_matrix(sweep={"wall_thickness_factor": [1.0, 1.1]}))
+    changed = {item_id for idx, item_id in enumerate(result.item_ids) if result.totals[1, idx] != result.totals[2, idx]}
+    assert {"ground-foundation", "structure-roof", "ground-drainage"} <= changed
+    assert not any(item_id.startswith("interior-floor-") for item_id in changed)  # Rooms keep their net areas
+    assert result.total_cost[1] < result.total_cost[0] < result.total_cost[2]
+
+
+def test_invalid_parameters_are_rejected(monkeypatch):
+    with pytest.raises(ScenarioError, match="Unknown scenario parameter"):
+        build_parameter_matrix([{"roof_pitch": 30}])
+    with pytest.raises(ScenarioError, match="fractions"):
+        build_parameter_matrix(sweep={"contingency_pct": [0.1, 6]})
+    with pytest.raises(ScenarioError, match="non-negative"):
+        build_parameter_matrix([{"foundation_per_m2": -1}])
+    monkeypatch.setattr(scenarios, "SCENARIO_MAX_COUNT", 100)
+    with pytest.raises(ScenarioError, match="at most 100"):
+        build_parameter_matrix(sweep={"roof_slope_factor": [1.0] * 10, "contingency_pct": [0.05] * 10})
+
+
+def test_scenarios_endpoint():
+    from fastapi.testclient import TestClient
+    import main
+
+    case = PLAN_CASES[0]
+    client = TestClient(main.app)
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    body = {"rooms": case["rooms"], "summary": case["summary"], "sweep": {"foundation_per_m2": [3000, 4000]}}
+    response = client.post("/projects/p1/scenarios", json=body, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["projectId"] == "p1"
+    assert len(data["scenarios"]) == len(data["totalCost"]) == len(data["items"]) == 3
+    assert data["totalCost"][0] == pytest.approx(sum(item["totalCost"] for item in price_items(case["rooms"], case["summary"])))
+    assert data["totalCost"][1] < data["totalCost"][0] < data["totalCost"][2]
+
+    response = client.post("/projects/p1/scenarios", json={**body, "sweep": {"pitch": [30]}}, headers=headers)
+    assert response.status_code == 400
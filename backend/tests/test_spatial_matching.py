@@ -0,0 +1,109 @@
+"""Spatial room/area matching: grid index vs. the all-pairs closest-first reference."""
+import random
+
+import pytest
+
+from helpers import EXPECTED_ROOMS
+import ocr_service
+from ocr_service import (
+    AreaGridIndex, is_plausible_size, iter_pairs_closest_first, label_distance,
+    parse_rooms_with_spatial_matching,
+)
+
+needs_assignment = pytest.mark.skipif(not ocr_service._assignment_available, reason="NumPy/SciPy not installed")
+
+def reference_pairs(room_blocks, area_blocks):
+    """Every plausible pair, sorted closest first (the matcher's original strategy)."""
+    pairs = []
+    for room_idx, room_block in enumerate(room_blocks):
+        for area_idx, area_block in enumerate(area_blocks):
+            if is_plausible_size(room_block["category"], area_block["area"]):
+                pairs.append((label_distance(room_block, area_block), room_idx, area_idx))
+    pairs.sort(key=lambda pair: pair[0])
+    return pairs
+
+
+def random_blocks(rng, rooms, areas, grid=None):
+    def coord():
+        value = rng.random()
+        return round(value / grid) * grid if grid else value
+    categories = ["bedroom", "bathroom", "living", "closet", "garage", "storage"]
+    room_blocks = [{"x": coord(), "y": coord(), "category": rng.choice(categories)} for _ in range(rooms)]
+    area_blocks = [{"x": coord(), "y": coord(), "area": round(rng.uniform(1, 60), 1)} for _ in range(areas)]
+    return room_blocks, area_blocks
+
+
+def test_spatial_matching_matches_printed_areas(plan_ocr):
+    plan, _, text_blocks = plan_ocr
+    rooms = parse_rooms_with_spatial_matching(text_blocks)
+    assert sorted((room["name"], room["area"]) for room in rooms) == sorted(map(tuple, EXPECTED_ROOMS[plan]))
+
+
+@pytest.mark.parametrize("grid", [None, 0.05, 0.01])
+def test_pairs_come_out_in_reference_order(grid):
+    rng = random.Random(7)
+    for _ in range(200):
+        room_blocks, area_blocks = random_blocks(rng, rng.randint(0, 30), rng.randint(0, 50), grid)
+        produced = list(iter_pairs_closest_first(room_blocks, area_blocks, used_rooms=set()))
+        assert produced == reference_pairs(room_blocks, area_blocks)
+
+
+def test_used_rooms_are_dropped():
+    rng = random.Random(11)
+    room_blocks, area_blocks = random_blocks(rng, 20, 40)
+    used_rooms = set()
+    for _, room_idx, _ in iter_pairs_closest_first(room_blocks, area_blocks, used_rooms):
+        assert room_idx not in used_rooms
+        used_rooms.add(room_idx)
+    expected = {room_idx for _, room_idx, _ in reference_pairs(room_blocks, area_blocks)}
+    assert used_rooms == expected
+
+
+def test_grid_ring_covers_all_cells():
+    rng = random.Random(3)
+    _, area_blocks = random_blocks(rng, 0, 100)
+    index = AreaGridIndex(area_blocks)
+    cell = index.cell_of({"x": 0.5, "y": 0.5})
+    found = []
+    for k in range(index.max_ring(cell) + 1):
+        found.extend(index.ring(cell, k))
+    assert sorted(found) == list(range(len(area_blocks)))
+
+
+@needs_assignment
+def test_optimal_matching_matches_printed_areas(plan_ocr):
+    plan, _, text_blocks = plan_ocr
+    rooms = parse_rooms_with_spatial_matching(text_blocks, matching="optimal")
+    assert sorted((room["name"], room["area"]) for room in rooms) == sorted(map(tuple, EXPECTED_ROOMS[plan]))
+
+
+@needs_assignment
+@pytest.mark.parametrize("grid", [None, 0.01])
+def test_distance_matrix_equals_label_distance(grid):
+    rng = random.Random(5)
+    for _ in range(50):
+        room_blocks, area_blocks = random_blocks(rng, rng.randint(1, 20), rng.randint(1, 30), grid)
+        matrix = ocr_service.label_distance_matrix(room_blocks, area_blocks)
+        mask = ocr_service.plausibility_mask(room_blocks, area_blocks)
+        for room_idx, room_block in enumerate(room_blocks):
+            for area_idx, area_block in enumerate(area_blocks):
+                assert matrix[room_idx, area_idx] == pytest.approx(label_distance(room_block, area_block), rel=1e-12)
+                assert mask[room_idx, area_idx] == is_plausible_size(room_block["category"], area_block["area"])
+
+
+@needs_assignment
+def test_optimal_minimizes_total_distance():
+    rng = random.Random(13)
+    for _ in range(100):
+        room_blocks, area_blocks = random_blocks(rng, rng.randint(1, 12), rng.randint(1, 15))
+        optimal = ocr_service.match_pairs_optimal(room_blocks, area_blocks)
+        greedy, used_rooms, used_areas = [], set(), set()
+        for pair in iter_pairs_closest_first(room_blocks, area_blocks, used_rooms):
+            if pair[2] in used_areas:
+                continue
+            greedy.append(pair)
+            used_rooms.add(pair[1])
+            used_areas.add(pair[2])
+        assert len(optimal) >= len(greedy)
+        if len(optimal) == len(greedy):
+            assert sum(d for d, _, _ in optimal) <= sum(d for d, _, _ in greedy) + 1e-9
@@ -0,0 +1,28 @@
+"""Text-based room parser: output pinned to the three-pass parser it replaced."""
+import pytest
+
+from helpers import OCR_FIXTURES, load_json
+from ocr_service import parse_rooms_from_text, summary_exclusion_zones
+
+# Rooms found by the previous (quadratic) parser, in output order. Sample plans
+# use their recorded OCR text; synthetic cases carry their own text.
+REGRESSION_CASES = load_json("text_parser_regression.json")
+
+
+@pytest.mark.parametrize("case", REGRESSION_CASES, ids=lambda case: case["name"])
+def test_text_parser_matches_previous_output(case):
+    text = case["text"] if "text" in case else OCR_FIXTURES[case["name"]]["text"]
+    rooms = parse_rooms_from_text(text)
+    assert [[room["name"], room["area"]] for room in rooms] == case["rooms"]
+
+
+def test_summary_exclusion_zones_are_merged():
+    text = "BOYTA: 130.7m² BTA: 184.9m²" + " " * 40 + "BIYTA: 34.0m²"
+    zones = summary_exclusion_zones(text)
+    assert zones == [(0, 50), (67, len(text))]
+
+
+def test_summary_areas_are_not_matched_to_rooms():
+    # 12.0 would otherwise be the kitchen's proximity match (30 chars before it)
+    assert parse_rooms_from_text("BOYTA: 12.0 m²" + " " * 20 + "KÖK") == []
+    assert parse_rooms_from_text("12.0 m²" + " " * 27 + "KÖK")[0]["area"] == 12.0
@@ -0,0 +1,68 @@
+"""Stage timing: spans, Server-Timing header and the stage histogram feed."""
+import os
+
+import pytest
+
+import timing
+from helpers import OCR_FIXTURE_DIR, REPO_ROOT
+from metrics import STAGE_DURATION
+from timing import RequestTimings, span
+
+
+@pytest.fixture
+def request_timings():
+    timings = timing.start_request_timings()
+    yield timings
+    timing.detach_request_timings()
+
+
+def test_spans_are_collected_per_request(request_timings):
+    with span("ocr"):
+        pass
+    with span("pricing"):
+        pass
+    with span("pricing"):
+        pass
+    assert [stage for stage, _ in request_timings.spans] == ["ocr", "pricing", "pricing"]
+    assert set(request_timings.as_dict()) == {"ocr", "pricing"}
+
+
+def test_disabled_timing_records_nothing(monkeypatch):
+    monkeypatch.setattr(timing, "TIMING_ENABLED", False)
+    assert timing.start_request_timings() is None
+    assert span("ocr") is span("pricing")  # Shared no-op
+    with span("disabled_stage"):
+        pass
+    assert ("disabled_stage",) not in STAGE_DURATION.values()
+
+
+def test_server_timing_header_sums_repeated_stages():
+    timings = RequestTimings()
+    timings.add("ocr", 800.04)
+    timings.add("pricing", 1.0)
+    timings.add("pricing", 1.25)
+    timings.add("bad stage;name", 0.5)
+    assert timings.server_timing_header() == "ocr;dur=800.0, pricing;dur=2.2, bad_stage_name;dur=0.5"
+
+
+def test_analyze_reports_server_timing():
+    from fastapi.testclient import TestClient
+    from fake_documentai import FakeDocumentProcessor
+    from ocr_service import set_documentai_async_client
+    import main
+
+    plan = os.path.join(REPO_ROOT, "1324.png")
+    set_documentai_async_client(FakeDocumentProcessor.from_fixture_dir(OCR_FIXTURE_DIR))
+    try:
+        with open(plan, "rb") as f:
+            response = TestClient(main.app).post(
+                "/analyze", files={"file": ("1324.png", f, "image/png")}, headers={"X-API-Key": os.environ["API_KEY"]}
+            )
+    finally:
+        set_documentai_async_client(None)
+
+    assert response.status_code == 200
+    stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert stages[0] == "ocr"
+    assert {"spatial_matching", "pricing"} <= set(stages)
+    assert 'stage="pricing"' in TestClient(main.app).get("/metrics").text
@@ -0,0 +1,99 @@
+"""Chunked upload reading and the per-route request body limits."""
+import io
+import os
+import asyncio
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request, UploadFile
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+import main
+from middleware import BodySizeLimitMiddleware
+from ocr_cache import hash_content
+from uploads import UPLOAD_CHUNK_SIZE, read_upload, sniff_content_type
+
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+def upload(contents: bytes, declared: str = "image/png") -> UploadFile:
+    return UploadFile(io.BytesIO(contents), filename="plan", headers=Headers({"content-type": declared}))
+
+
+def test_hash_is_computed_while_streaming():
+    contents = PNG + os.urandom(3 * UPLOAD_CHUNK_SIZE + 17)  # Several chunks and a partial one
+    result = asyncio.run(read_upload(upload(contents), len(contents), {"image/png"}))
+    assert result.content_hash == hash_content(contents)
+    assert (result.contents, result.size, result.content_type) == (contents, len(contents), "image/png")
+
+
+def test_uploads_over_the_cap_are_rejected():
+    contents = PNG + bytes(2 * UPLOAD_CHUNK_SIZE)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_upload(upload(contents), UPLOAD_CHUNK_SIZE + 1))
+    assert error.value.status_code == 413
+
+
+@pytest.mark.parametrize("contents, declared", [
+    (b"just some text", "image/png"),         # Unrecognised bytes
+    (b"PK\x03\x04zipped", "image/png"),       # A zip labelled as an image
+    (b"%PDF-1.7", "image/png"),               # Allowed type, but not this route's
+])
+def test_declared_type_is_not_trusted(contents, declared):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_upload(upload(contents, declared), 1024, {"image/png", "image/jpeg"}))
+    assert error.value.status_code == 400
+    assert sniff_content_type(contents) != declared
+
+
+def test_sniffed_type_wins_over_the_declared_one():
+    result = asyncio.run(read_upload(upload(b"\xff\xd8\xff\xe0jpeg", "image/png"), 1024, {"image/png", "image/jpeg"}))
+    assert result.content_type == "image/jpeg"
+    assert sniff_content_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+
+
+@pytest.fixture
+def limited_client():
+    """A route behind a 1KB body limit that reports how much body it read."""
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def receive_upload(request: Request):
+        return {"read": len(await request.body())}
+
+    @app.post("/unlimited")
+    async def unlimited(request: Request):
+        return {"read": len(await request.body())}
+
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/upload": 1024})
+    return TestClient(app)
+
+
+def test_body_limit_rejects_by_content_length(limited_client):
+    assert limited_client.post("/upload", content=bytes(1024)).json() == {"read": 1024}
+    response = limited_client.post("/upload", content=bytes(1025))
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("Request body too large")
+    assert limited_client.post("/unlimited", content=bytes(4096)).json() == {"read": 4096}
+
+
+def test_body_limit_counts_chunked_bodies(limited_client):
+    def chunks():
+        for _ in range(8):
+            yield bytes(256)
+
+    response = limited_client.post("/upload", content=chunks())  # No Content-Length
+    assert response.status_code == 413
+
+
+def test_analyze_rejects_oversized_and_mislabelled_uploads():
+    client = TestClient(main.app)
+    main.limiter.reset()
+    too_big = PNG + bytes(main.MAX_FILE_SIZE + main.MULTIPART_OVERHEAD)
+    response = client.post("/analyze", files={"file": ("plan.png", too_big, "image/png")}, headers=HEADERS)
+    assert response.status_code == 413
+
+    response = client.post("/analyze", files={"file": ("plan.png", b"MZ\x90\x00 not an image", "image/png")}, headers=HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid file type: unknown")
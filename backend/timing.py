@@ -0,0 +1,100 @@
+"""
+Timing Module
+=============
+Span-style stage timing for the analysis pipeline.
+
+Code wraps each step in `with span("ocr"): ...`. While a request is being
+timed (see StructuredLoggingMiddleware), finished spans are collected per
+request and reported three ways:
+
+1. A `Server-Timing` response header (visible in browser dev tools)
+2. A `timings_ms` field on the request's structured log line
+3. The per-stage latency histogram on /metrics (metrics.STAGE_DURATION)
+
+Spans opened outside a request (background jobs, benchmarks) still feed the
+histogram. With timing disabled, span() returns a shared no-op context
+manager, so instrumented code pays one global lookup per step.
+
+Configuration (environment):
+- TIMING_ENABLED: "false" disables stage timing (default: true)
+"""
+import os
+import re
+import time
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from metrics import STAGE_DURATION
+
+TIMING_ENABLED = os.environ.get("TIMING_ENABLED", "true").lower() != "false"
+
+_NOOP_SPAN = nullcontext()
+_TOKEN_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class RequestTimings:
+    """Spans finished while handling one request, in completion order."""
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []  # (stage, duration_ms)
+
+    def add(self, stage: str, duration_ms: float) -> None:
+        self.spans.append((stage, duration_ms))
+
+    def as_dict(self) -> Dict[str, float]:
+        """Total milliseconds per stage (a stage can run more than once, e.g. per batch file)."""
+        totals: Dict[str, float] = {}
+        for stage, duration_ms in self.spans:
+            totals[stage] = round(totals.get(stage, 0.0) + duration_ms, 2)
+        return totals
+
+    def server_timing_header(self) -> str:
+        """Render as a Server-Timing header value, e.g. `ocr;dur=812.4, pricing;dur=2.1`."""
+        return ", ".join(
+            f"{_TOKEN_UNSAFE.sub('_', stage)};dur={duration_ms:.1f}"
+            for stage, duration_ms in self.as_dict().items()
+        )
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def set_timing_enabled(enabled: bool) -> None:
+    """Switch stage timing on or off at runtime."""
+    global TIMING_ENABLED
+    TIMING_ENABLED = enabled
+
+
+def start_request_timings() -> Optional[RequestTimings]:
+    """Begin collecting spans for the current request (None when timing is off)."""
+    if not TIMING_ENABLED:
+        return None
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def detach_request_timings() -> None:
+    """Stop attributing spans in this context to a request (e.g. background workers)."""
+    _current.set(None)
+
+
+@contextmanager
+def _timed(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(stage, elapsed * 1000)
+
+
+def span(stage: str):
+    """Context manager timing one pipeline stage. A shared no-op when timing is off."""
+    if not TIMING_ENABLED:
+        return _NOOP_SPAN
+    return _timed(stage)
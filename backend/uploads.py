@@ -0,0 +1,89 @@
+"""
+Upload Handling Module
+======================
+Chunked reading of uploaded floor plans.
+
+Uploads are read in fixed-size chunks so the size cap is enforced as bytes
+arrive (never buffering more than the cap), the SHA-256 used for OCR caching
+and dedup is computed on the fly, and the real file type is sniffed from the
+leading magic bytes instead of trusting the client's Content-Type.
+"""
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Optional, Set
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Magic byte signatures -> content type
+_SIGNATURES = (
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"PK\x03\x04", "application/zip"),
+)
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Detect the file type from its first bytes. Returns None if unrecognised."""
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+@dataclass
+class UploadedFile:
+    """A fully read, validated upload."""
+    filename: Optional[str]
+    contents: bytes
+    content_type: Optional[str]  # Sniffed from magic bytes, None if unrecognised
+    content_hash: str            # SHA-256 hex digest
+    size: int
+
+
+async def read_upload(file: UploadFile, max_bytes: int, allowed_types: Optional[Set[str]] = None) -> UploadedFile:
+    """
+    Read an upload chunk by chunk, enforcing the size cap and sniffing its type.
+
+    Raises:
+        HTTPException 413 as soon as more than max_bytes have been read
+        HTTPException 400 if allowed_types is given and the sniffed type is not in it
+    """
+    hasher = hashlib.sha256()
+    buffer = bytearray()
+
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Max size: {max_bytes // (1024 * 1024)}MB"
+            )
+        hasher.update(chunk)
+        buffer.extend(chunk)
+
+    content_type = sniff_content_type(bytes(buffer[:16]))
+    if allowed_types is not None and content_type not in allowed_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type: {content_type or 'unknown'}. Allowed: {', '.join(sorted(allowed_types))}"
+        )
+    if content_type and file.content_type and file.content_type != content_type:
+        logger.warning(f"Upload {file.filename} declared as {file.content_type} but is {content_type}")
+
+    return UploadedFile(
+        filename=file.filename,
+        contents=bytes(buffer),
+        content_type=content_type,
+        content_hash=hasher.hexdigest(),
+        size=len(buffer),
+    )